@@ -7,4 +7,4 @@ set -o nounset
 
 python /app/manage.py collectstatic --noinput
 python /app/manage.py compilemessages
-/usr/local/bin/gunicorn config.wsgi -w 4 -b 0.0.0.0:5000 --chdir=/app
+/usr/local/bin/gunicorn config.wsgi --config=/app/config/gunicorn.py
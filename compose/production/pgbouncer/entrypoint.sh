@@ -0,0 +1,39 @@
+#!/usr/bin/env bash
+
+set -o errexit
+set -o pipefail
+
+# PgBouncer between django/celery and postgres, in transaction pooling mode. Every transaction gets a server
+# connection of the pool, so many persistent client connections share a few connections to postgres.
+# It runs with: docker-compose -f production.yml -f production.pgbouncer.yml, see docs/deploy.rst.
+
+# the official postgres image uses 'postgres' as default user if not set explictly.
+if [ -z "$POSTGRES_USER" ]; then
+    export POSTGRES_USER=postgres
+fi
+
+mkdir -p /etc/pgbouncer
+
+# postgres 9.6 checks md5 passwords, which are md5 of the password followed by the user name
+password_hash=$(echo -n "$POSTGRES_PASSWORD$POSTGRES_USER" | md5sum | cut -d ' ' -f 1)
+echo "\"$POSTGRES_USER\" \"md5$password_hash\"" > /etc/pgbouncer/userlist.txt
+
+cat > /etc/pgbouncer/pgbouncer.ini << END
+[databases]
+$POSTGRES_USER = host=postgres port=5432 dbname=$POSTGRES_USER
+
+[pgbouncer]
+listen_addr = 0.0.0.0
+listen_port = 6432
+auth_type = md5
+auth_file = /etc/pgbouncer/userlist.txt
+pool_mode = transaction
+; Connections of the clients, every gunicorn and celery worker keeps one open
+max_client_conn = ${PGBOUNCER_MAX_CLIENT_CONN:-1000}
+; Connections to postgres, keep them below its max_connections
+default_pool_size = ${PGBOUNCER_DEFAULT_POOL_SIZE:-20}
+reserve_pool_size = ${PGBOUNCER_RESERVE_POOL_SIZE:-5}
+END
+
+chown -R pgbouncer /etc/pgbouncer
+exec pgbouncer -u pgbouncer /etc/pgbouncer/pgbouncer.ini
@@ -0,0 +1,36 @@
+"""
+Gunicorn configuration of the django container, see docs/deploy.rst.
+
+GUNICORN_WORKER_CLASS selects the workers:
+
+* ``sync``: a worker handles one request at a time, a slow client or a slow call to the mail API blocks it.
+* ``gevent``: a worker handles up to GUNICORN_WORKER_CONNECTIONS requests at the same time in greenlets and
+  switches between them while they wait for the network. psycopg2 is made cooperative with psycogreen, so a
+  query waits like a socket instead of blocking the worker.
+
+The number of workers defaults to twice the number of CPUs plus one for sync workers and to the number of CPUs
+for gevent workers, because a gevent worker already keeps its CPU busy.
+"""
+import multiprocessing
+import os
+
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+if worker_class not in ("sync", "gevent"):
+    raise ValueError("GUNICORN_WORKER_CLASS must be sync or gevent, not {!r}".format(worker_class))
+
+cpus = multiprocessing.cpu_count()
+workers = int(os.environ.get("GUNICORN_WORKERS", cpus if worker_class == "gevent" else cpus * 2 + 1))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 100))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+# Restart the workers now and then, spread over time, so they don't all restart at once
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 5000))
+max_requests_jitter = max_requests // 10
+
+bind = "0.0.0.0:5000"
+chdir = "/app"
+
+
+def post_fork(server, worker):
+    if worker_class == "gevent":
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
@@ -8,6 +8,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/dev/ref/settings/
 """
 import environ
+from celery.schedules import crontab
 
 ROOT_DIR = environ.Path(__file__) - 3  # (oz_m_de/config/settings/base.py - 3 = oz_m_de/)
 APPS_DIR = ROOT_DIR.path('oz_m_de')
@@ -58,6 +59,7 @@ LOCAL_APPS = [
     # Your stuff: custom apps go here
     'oz_m_de.organizations.apps.OrganizationsConfig',
     'oz_m_de.common.apps.CommonConfig',
+    'oz_m_de.taskapp.celery.CeleryConfig',
 ]
 
 # See: https://docs.djangoproject.com/en/dev/ref/settings/#installed-apps
@@ -66,11 +68,14 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 # MIDDLEWARE CONFIGURATION
 # ------------------------------------------------------------------------------
 MIDDLEWARE = [
+    'oz_m_de.common.metrics.MetricsMiddleware',
+    'oz_m_de.common.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'oz_m_de.common.clock.ClockMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'oz_m_de.users.middleware.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -129,6 +134,9 @@ TIME_ZONE = 'Europe/Amsterdam'
 # See: https://docs.djangoproject.com/en/dev/ref/settings/#language-code
 LANGUAGE_CODE = 'de-DE'
 
+# Languages the opening hours of organizations are pre-rendered in, see organizations.summaries
+OPENING_HOURS_LANGUAGES = env.list('DJANGO_OPENING_HOURS_LANGUAGES', default=[LANGUAGE_CODE])
+
 # See: https://docs.djangoproject.com/en/dev/ref/settings/#site-id
 SITE_ID = 1
 
@@ -255,6 +263,15 @@ AUTHENTICATION_BACKENDS = [
     'allauth.account.auth_backends.AuthenticationBackend',
 ]
 
+# Seconds a signed in user is kept in the cache by CachedAuthenticationMiddleware, it is removed when it changes
+AUTH_USER_CACHE_TIMEOUT = env.int('DJANGO_AUTH_USER_CACHE_TIMEOUT', default=60 * 60)
+
+# SESSIONS
+# ------------------------------------------------------------------------------
+# See: https://docs.djangoproject.com/en/dev/ref/settings/#session-engine
+# Production keeps the sessions in the cache as well, so signed in requests don't query the session
+SESSION_ENGINE = env('DJANGO_SESSION_ENGINE', default='django.contrib.sessions.backends.db')
+
 # Some really nice defaults
 ACCOUNT_AUTHENTICATION_METHOD = 'username'
 ACCOUNT_EMAIL_REQUIRED = True
@@ -279,3 +296,43 @@ ADMIN_URL = r'^admin/'
 
 # Your common stuff: Below this line define 3rd party library settings
 # ------------------------------------------------------------------------------
+
+# HOME PAGE
+# ------------------------------------------------------------------------------
+# Number of seconds browsers and the proxy may use the home page before revalidating it
+HOMEPAGE_CACHE_MAX_AGE = env.int('DJANGO_HOMEPAGE_CACHE_MAX_AGE', default=60)
+
+# API
+# ------------------------------------------------------------------------------
+# Number of seconds clients and the proxy may use a page of the organizations API before revalidating it
+API_CACHE_MAX_AGE = env.int('DJANGO_API_CACHE_MAX_AGE', default=60)
+
+# SERVER TIMING
+# ------------------------------------------------------------------------------
+# Fraction of the requests that get a Server-Timing header and a timing log line, 0 disables the measurements
+SERVER_TIMING_SAMPLE_RATE = env.float('DJANGO_SERVER_TIMING_SAMPLE_RATE', default=0.0)
+
+# METRICS
+# ------------------------------------------------------------------------------
+# Record the response times, queries and cache reads of every request, served at /metrics/
+METRICS_ENABLED = env.bool('DJANGO_METRICS_ENABLED', default=False)
+# Redis in which all worker processes add up their metrics, without it every process keeps its own
+METRICS_REDIS_URL = env('DJANGO_METRICS_REDIS_URL', default=None)
+# Bearer token that lets Prometheus scrape the metrics without signing in
+METRICS_TOKEN = env('DJANGO_METRICS_TOKEN', default=None)
+
+# CELERY
+# ------------------------------------------------------------------------------
+CELERY_BROKER_URL = env('CELERY_BROKER_URL', default='redis://localhost:6379/1')
+CELERY_RESULT_BACKEND = CELERY_BROKER_URL
+CELERY_ACCEPT_CONTENT = ['json']
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_RESULT_SERIALIZER = 'json'
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    # Organizations that update their opening hours daily start every day without opening hours
+    'roll-over-opening-hours': {
+        'task': 'oz_m_de.organizations.tasks.roll_over_opening_hours',
+        'schedule': crontab(minute=0, hour=0),
+    },
+}
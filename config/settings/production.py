@@ -47,6 +47,9 @@ SECURE_CONTENT_TYPE_NOSNIFF = env.bool(
     'DJANGO_SECURE_CONTENT_TYPE_NOSNIFF', default=True)
 SECURE_BROWSER_XSS_FILTER = True
 SESSION_COOKIE_SECURE = True
+# Read the sessions from Redis, and write them to the database as well so they survive a flush of the cache.
+# Use django.contrib.sessions.backends.cache to keep them in Redis only.
+SESSION_ENGINE = env('DJANGO_SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
 SESSION_COOKIE_HTTPONLY = True
 SECURE_SSL_REDIRECT = env.bool('DJANGO_SECURE_SSL_REDIRECT', default=True)
 CSRF_COOKIE_SECURE = True
@@ -139,6 +142,20 @@ TEMPLATES[0]['OPTIONS']['loaders'] = [
 # Use the Heroku-style specification
 # Raises ImproperlyConfigured exception if DATABASE_URL not in os.environ
 DATABASES['default'] = env.db('DATABASE_URL')
+DATABASES['default']['ATOMIC_REQUESTS'] = True
+# Keep the connection of a worker open for this many seconds instead of connecting for every request,
+# 0 closes it after every request. Broken connections are closed at the start of a request by the health check
+# in oz_m_de.common.connections
+DATABASES['default']['CONN_MAX_AGE'] = env.int('DJANGO_CONN_MAX_AGE', default=60)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = env.bool('DJANGO_CONN_HEALTH_CHECKS', default=True)
+if env('GUNICORN_WORKER_CLASS', default='sync') == 'gevent':
+    # Every greenlet has its own connection and a greenlet handles one request, so a kept connection would never
+    # be used again. Connect through PgBouncer to make connecting for every request cheap
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+# Through PgBouncer in transaction pooling mode (production.pgbouncer.yml) every transaction gets a server
+# connection of its pool. Requests are one transaction with ATOMIC_REQUESTS, so they keep their server connection.
+# Session state doesn't survive between transactions, so avoid QuerySet.iterator(): Django 1.10 reads it with
+# a normal cursor, but from 1.11 on it uses a server-side cursor, which needs DISABLE_SERVER_SIDE_CURSORS there
 
 # CACHING
 # ------------------------------------------------------------------------------
@@ -157,6 +174,19 @@ CACHES = {
     }
 }
 
+# CELERY
+# ------------------------------------------------------------------------------
+# The broker and the results use their own Redis database, next to the cache
+CELERY_BROKER_URL = env('CELERY_BROKER_URL',
+                        default='{0}/{1}'.format(env('REDIS_URL', default='redis://127.0.0.1:6379'), 1))
+CELERY_RESULT_BACKEND = CELERY_BROKER_URL
+
+# METRICS
+# ------------------------------------------------------------------------------
+# The gunicorn workers add up their metrics in their own Redis database
+METRICS_REDIS_URL = env('DJANGO_METRICS_REDIS_URL',
+                        default='{0}/{1}'.format(env('REDIS_URL', default='redis://127.0.0.1:6379'), 2))
+
 
 # Sentry Configuration
 SENTRY_DSN = env('DJANGO_SENTRY_DSN')
@@ -201,6 +231,11 @@ LOGGING = {
             'handlers': ['console', ],
             'propagate': False,
         },
+        'oz_m_de.common.timing': {
+            'level': 'INFO',
+            'handlers': ['console', ],
+            'propagate': False,
+        },
         'django.security.DisallowedHost': {
             'level': 'ERROR',
             'handlers': ['console', 'sentry', ],
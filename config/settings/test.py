@@ -38,6 +38,12 @@ CACHES = {
     }
 }
 
+# CELERY
+# ------------------------------------------------------------------------------
+# Run tasks in the test process, so tests see their results
+CELERY_TASK_ALWAYS_EAGER = True
+CELERY_TASK_EAGER_PROPAGATES = True
+
 # TESTING
 # ------------------------------------------------------------------------------
 TEST_RUNNER = 'django.test.runner.DiscoverRunner'
@@ -5,11 +5,12 @@ from django.contrib import admin
 from django.views.generic import TemplateView
 from django.views import defaults as default_views
 
-from oz_m_de.common.views import HomePageView
+from oz_m_de.common.views import HomePageView, metrics
 
 urlpatterns = [
     url(r'^$', HomePageView.as_view(), name='home'),
     url(r'^about/$', TemplateView.as_view(template_name='pages/about.html'), name='about'),
+    url(r'^metrics/$', metrics, name='metrics'),
 
     # Django Admin, use {% url 'admin:index' %}
     url(settings.ADMIN_URL, admin.site.urls),
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class CommonConfig(AppConfig):
     name = 'oz_m_de.common'
+
+    def ready(self):
+        from . import signals  # noqa
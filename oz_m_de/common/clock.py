@@ -0,0 +1,67 @@
+"""The moment of the current request.
+
+ClockMiddleware reads the clock once at the start of every request. Everything that renders the request, like
+the models, views and template filters that show today's opening hours, asks get_clock() for the day instead of
+reading the time again. That way all organizations on a page agree on which day it is, even around midnight,
+and the local day and time are computed only once.
+
+Outside requests, get_clock() reads the time when it is called. Tests can fix the time with override_clock.
+"""
+import datetime
+import threading
+from contextlib import contextmanager
+
+from django.utils import timezone
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+_local = threading.local()
+
+
+class Clock(object):
+    """A moment in local time"""
+
+    def __init__(self, moment: datetime.datetime = None):
+        """
+        :param moment: Aware datetime, defaults to now
+        """
+        self.now = timezone.localtime(moment or timezone.now())
+        self.date = self.now.date()
+        # 3 letter day string in lowercase, e.g. "mon"
+        self.day = WEEKDAYS[self.now.weekday()]
+        self.minute_of_day = self.now.hour * 60 + self.now.minute
+        self.midnight = self.now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def get_clock() -> Clock:
+    """Get the clock of the current request, or the current time outside requests"""
+    clock = getattr(_local, "clock", None)
+    return clock if clock is not None else Clock()
+
+
+@contextmanager
+def override_clock(clock):
+    """Use a clock for everything within the block
+
+    :param clock: Clock, or an aware datetime
+    """
+    if not isinstance(clock, Clock):
+        clock = Clock(clock)
+    previous = getattr(_local, "clock", None)
+    _local.clock = clock
+    try:
+        yield clock
+    finally:
+        _local.clock = previous
+
+
+class ClockMiddleware(object):
+    """Read the clock once per request, it is available as request.clock and from get_clock()"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with override_clock(Clock()) as clock:
+            request.clock = clock
+            return self.get_response(request)
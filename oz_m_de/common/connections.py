@@ -0,0 +1,17 @@
+"""Health checks of persistent database connections.
+
+With CONN_MAX_AGE a connection is kept open between requests. When the database or PgBouncer restarts, or a
+firewall drops an idle connection, Django only notices when the next query fails, so one request per worker gets
+an error. A database with CONN_HEALTH_CHECKS is checked with a cheap query at the start of every request that
+reuses its connection, and a broken connection is closed, so the request opens a new one.
+"""
+from django.db import connections
+
+
+def check_connections(**kwargs):
+    """Close the persistent connections that no longer work, connected to request_started"""
+    for connection in connections.all():
+        if connection.connection is None or not connection.settings_dict.get("CONN_HEALTH_CHECKS"):
+            continue
+        if not connection.is_usable():
+            connection.close()
@@ -0,0 +1,95 @@
+"""Cached fragments of the home page.
+
+Every category page, and the list of categories, has a version number in the cache. The version is part of
+the key of the cached fragments, so bumping it makes all fragments of that page stale at once. The signals in
+common.signals bump the versions when the data shown on a page changes.
+Next to the version, the time of the last change is kept, for the Last-Modified header.
+"""
+import datetime
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+# Used instead of a category id for the page that lists the categories
+CATEGORIES = "categories"
+
+
+def page_id(category_id) -> str:
+    """The id of a category page, the same for the category id from the query string, e.g. "01", and the primary
+    key. None and an empty string are the list of categories
+    """
+    return CATEGORIES if category_id in (None, "") else str(int(category_id))
+
+
+def version_key(category_id) -> str:
+    return "homepage:version:{}".format(page_id(category_id))
+
+
+def modified_key(category_id) -> str:
+    return "homepage:modified:{}".format(page_id(category_id))
+
+
+def new_version() -> int:
+    """Versions start at the current time, so they don't repeat a version that has been evicted from the cache"""
+    return int(time.time() * 1000)
+
+
+def get_version(category_id) -> int:
+    """Get the version of a category page, or of the list of categories when category_id is None"""
+    key = version_key(category_id)
+    version = cache.get(key)
+    if version is None:
+        version = new_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def get_last_modified(category_id) -> datetime.datetime:
+    """Get the time of the last change of a category page, or of the list of categories when category_id is None"""
+    key = modified_key(category_id)
+    modified = cache.get(key)
+    if modified is None:
+        modified = time.time()
+        if not cache.add(key, modified, None):
+            modified = cache.get(key, modified)
+    return datetime.datetime.fromtimestamp(modified, tz=timezone.utc)
+
+
+def bump_versions(*category_ids):
+    """Make the cached fragments of the category pages stale. Use None for the list of categories.
+    Changes in a transaction should bump the versions once it is committed, see bump_versions_on_commit.
+    """
+    modified = time.time()
+    for category_id in set(category_ids):
+        try:
+            cache.incr(version_key(category_id))
+        except ValueError:
+            cache.set(version_key(category_id), new_version(), None)
+        cache.set(modified_key(category_id), modified, None)
+
+
+def bump_versions_on_commit(*category_ids):
+    """Bump the versions once the current transaction is committed. Until then other requests still read the
+    old rows, and would cache them with the new version
+    """
+    transaction.on_commit(partial(bump_versions, *category_ids))
+
+
+def fragment_key(category_id, day: str, language: str) -> str:
+    # The language is "de-DE" when no translation is active and "de-de" when it is activated
+    return "homepage:fragment:{}:{}:{}:{}".format(page_id(category_id), day, (language or "").lower(),
+                                                  get_version(category_id))
+
+
+def get_fragment(key: str) -> str:
+    return cache.get(key)
+
+
+def set_fragment(key: str, content: str):
+    cache.set(key, content, FRAGMENT_TIMEOUT)
@@ -1,5 +1,67 @@
 from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from .fragments import new_version
+
+ORGANIZATIONS_ADMIN_GROUP = "organizations_admin_group"
+
+ROLES_TIMEOUT = 60 * 60 * 24
+
+# Bumped when a group is changed, which can change the roles of every user
+GROUPS_VERSION_KEY = "memberships:version:groups"
+
+
+def user_version_key(user_id: int) -> str:
+    return "memberships:version:user:{}".format(user_id)
+
+
+def bump_user_versions(*user_ids):
+    """Make the cached roles of the users stale, after their group memberships changed"""
+    for user_id in user_ids:
+        _bump(user_version_key(user_id))
+
+
+def bump_groups_version():
+    """Make the cached roles of all users stale, after a group changed"""
+    _bump(GROUPS_VERSION_KEY)
+
+
+def _bump(key: str):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted, start over at a version that hasn't been used before
+        cache.set(key, new_version(), None)
+
+
+def roles_key(user_id: int) -> str:
+    keys = [user_version_key(user_id), GROUPS_VERSION_KEY]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version = new_version()
+            versions[key] = version if cache.add(key, version, None) else cache.get(key, version)
+    return "memberships:roles:{}:{}:{}".format(user_id, *[versions[key] for key in keys])
 
 
 def is_organizations_admin(user: User) -> bool:
-    return user.groups.filter(name="organizations_admin_group").exists()
+    """Check if the user is a member of the organizations admin group.
+    The answer is kept on the user object for the rest of the request, and in the cache across requests
+    until the group memberships of the user change.
+    """
+    if not user.is_authenticated:
+        return False
+
+    try:
+        return user._is_organizations_admin
+    except AttributeError:
+        pass
+
+    key = roles_key(user.pk)
+    is_admin = cache.get(key)
+    if is_admin is None:
+        is_admin = user.groups.filter(name=ORGANIZATIONS_ADMIN_GROUP).exists()
+        cache.set(key, is_admin, ROLES_TIMEOUT)
+
+    user._is_organizations_admin = is_admin
+    return is_admin
@@ -0,0 +1,197 @@
+"""Request metrics of all worker processes, in the Prometheus text format.
+
+MetricsMiddleware records every request, labeled with the name of the URL pattern that handled it:
+
+- django_http_request_duration_seconds, a histogram of the response times
+- django_http_responses_total, the number of responses per status code
+- django_db_queries_total, the number of SQL queries
+- django_cache_hits_total and django_cache_misses_total, the cache reads
+
+Gunicorn runs several worker processes, so the counters are kept in a Redis hash that all workers increment,
+settings.METRICS_REDIS_URL, with one round trip per request. Without it every process keeps its own counters,
+which is fine for runserver. The queries, templates and cache reads are measured by common.timing, which counts
+the queries with a wrapper around the cursors instead of the query log of the debug cursor.
+
+The metrics are served by the metrics view, to staff and to scrapers that send settings.METRICS_TOKEN.
+"""
+import logging
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+
+import redis
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .timing import measure
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY = "oz_m_de:metrics"
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICS = {
+    "django_http_request_duration_seconds": ("histogram", "Time from the start of a request to its response"),
+    "django_http_responses_total": ("counter", "Responses per status code"),
+    "django_db_queries_total": ("counter", "SQL queries executed while handling requests"),
+    "django_cache_hits_total": ("counter", "Cache reads that found a value"),
+    "django_cache_misses_total": ("counter", "Cache reads that found nothing"),
+}
+HISTOGRAM_SUFFIXES = ("_bucket", "_sum", "_count")
+
+LE_PATTERN = re.compile(r'le="([^"]+)"')
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def series(name: str, **labels) -> str:
+    """Get the name of a time series, e.g. django_db_queries_total{view="home"}.
+    The le label of histogram buckets is always the last label.
+    """
+    le = labels.pop("le", None)
+    pairs = ['{}="{}"'.format(label, escape(value)) for label, value in sorted(labels.items())]
+    if le is not None:
+        pairs.append('le="{}"'.format(le))
+    return "{}{{{}}}".format(name, ",".join(pairs))
+
+
+def format_number(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def observe(values: dict, name: str, value: float, buckets: tuple, **labels):
+    """Add an observation of a histogram to the values to increment.
+    The buckets are cumulative, so every bucket the value fits in is incremented.
+    """
+    for bound in buckets:
+        if value <= bound:
+            values[series(name + "_bucket", le=format_number(bound), **labels)] += 1
+    values[series(name + "_bucket", le="+Inf", **labels)] += 1
+    values[series(name + "_sum", **labels)] += value
+    values[series(name + "_count", **labels)] += 1
+
+
+def get_family(name: str) -> str:
+    for suffix in HISTOGRAM_SUFFIXES:
+        base = name[:-len(suffix)]
+        if name.endswith(suffix) and METRICS.get(base, ("",))[0] == "histogram":
+            return base
+    return name
+
+
+def sort_key(key: str) -> tuple:
+    """Sort the series by metric and labels, the buckets of a histogram by their bound"""
+    name, _, labels = key.partition("{")
+    match = LE_PATTERN.search(labels)
+    le = float(match.group(1).replace("+Inf", "inf")) if match else -math.inf
+    return get_family(name), LE_PATTERN.sub("", labels), name, le
+
+
+def render(values: dict) -> str:
+    """Render the values of time series in the Prometheus text format"""
+    lines = []
+    family = None
+    for key in sorted(values, key=sort_key):
+        name = get_family(key.partition("{")[0])
+        if name != family:
+            family = name
+            kind, help_text = METRICS.get(name, ("untyped", ""))
+            lines.append("# HELP {} {}".format(name, help_text))
+            lines.append("# TYPE {} {}".format(name, kind))
+        lines.append("{} {}".format(key, format_number(values[key])))
+    return "\n".join(lines) + "\n"
+
+
+class LocalStorage(object):
+    """Counters of the current process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = defaultdict(float)
+
+    def increment(self, values: dict):
+        with self.lock:
+            for key, amount in values.items():
+                self.values[key] += amount
+
+    def read(self) -> dict:
+        with self.lock:
+            return dict(self.values)
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+
+class RedisStorage(object):
+    """Counters shared by all processes, in a Redis hash"""
+
+    def __init__(self, url: str):
+        self.client = redis.StrictRedis.from_url(url)
+
+    def increment(self, values: dict):
+        pipeline = self.client.pipeline(transaction=False)
+        for key, amount in values.items():
+            pipeline.hincrbyfloat(REDIS_KEY, key, amount)
+        try:
+            pipeline.execute()
+        except redis.RedisError:
+            # Losing some metrics is better than failing the request
+            logger.warning("Could not store the metrics of a request", exc_info=True)
+
+    def read(self) -> dict:
+        return {key.decode("utf-8"): float(value) for key, value in self.client.hgetall(REDIS_KEY).items()}
+
+    def clear(self):
+        self.client.delete(REDIS_KEY)
+
+
+_storage = None
+
+
+def get_storage():
+    """Get the storage of the metrics, Redis when settings.METRICS_REDIS_URL is set"""
+    global _storage
+    if _storage is None:
+        _storage = RedisStorage(settings.METRICS_REDIS_URL) if settings.METRICS_REDIS_URL else LocalStorage()
+    return _storage
+
+
+def get_view_name(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else "<unresolved>"
+
+
+class MetricsMiddleware(object):
+    """Record the metrics of every request when settings.METRICS_ENABLED is on, see the module documentation"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.storage = get_storage()
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with measure() as timings:
+            response = self.get_response(request)
+            timings.finish()
+        duration = time.perf_counter() - started
+
+        view = get_view_name(request)
+        values = defaultdict(float)
+        observe(values, "django_http_request_duration_seconds", duration, DURATION_BUCKETS,
+                view=view, method=request.method)
+        values[series("django_http_responses_total", view=view, status=response.status_code)] += 1
+        values[series("django_db_queries_total", view=view)] += timings.db_queries
+        values[series("django_cache_hits_total", view=view)] += timings.cache_hits
+        values[series("django_cache_misses_total", view=view)] += timings.cache_misses
+        self.storage.increment(values)
+        return response
@@ -0,0 +1,75 @@
+"""Keyset (cursor) pagination.
+
+Instead of skipping rows with OFFSET, the next page starts after the values of the last row of the previous
+page, so every page costs the same, however deep it is. The ordering has to end with a unique field,
+like the primary key, so every row has a distinct position.
+"""
+import base64
+import json
+
+from django.db.models import Q, QuerySet
+
+
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, ordering: list) -> list:
+    """Decode a cursor made by encode_cursor
+
+    :raises ValueError: When the cursor is not valid for the ordering
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+    except (TypeError, UnicodeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def after(ordering: list, values: list) -> Q:
+    """Build the filter that selects the rows after the row with the given values.
+    For the ordering ["-is_member", "name", "id"] this is::
+
+        is_member < v0 OR (is_member = v0 AND name > v1) OR (is_member = v0 AND name = v1 AND id > v2)
+
+    :param ordering: Field names, prefixed with "-" for descending order
+    :param values: Values of the fields of the last row of the previous page
+    :return: Q object
+    """
+    lookup = Q()
+    for index, field in enumerate(ordering):
+        name = field.lstrip("-")
+        condition = Q(**{"{}__{}".format(name, "lt" if field.startswith("-") else "gt"): values[index]})
+        for previous, value in zip(ordering[:index], values[:index]):
+            condition &= Q(**{previous.lstrip("-"): value})
+        lookup |= condition
+    return lookup
+
+
+def get_value(row, name: str):
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+def paginate(queryset: QuerySet, ordering: list, cursor: str, per_page: int) -> tuple:
+    """Get a page of rows and the cursor of the next page
+
+    :param queryset: Queryset of model instances or of values() dicts, which contain the ordering fields
+    :param ordering: Field names, prefixed with "-" for descending order, the last one has to be unique
+    :param cursor: Cursor of the page to get, None for the first page
+    :param per_page: Number of rows per page
+    :raises ValueError: When the cursor is not valid for the ordering
+    :return: Tuple of a list of rows and the cursor of the next page, which is None on the last page
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(after(ordering, decode_cursor(cursor, ordering)))
+
+    # Get one row more than needed to find out if there is a next page
+    rows = list(queryset[:per_page + 1])
+    if len(rows) <= per_page:
+        return rows, None
+
+    rows = rows[:per_page]
+    return rows, encode_cursor([get_value(rows[-1], field.lstrip("-")) for field in ordering])
@@ -0,0 +1,44 @@
+"""Counting database queries outside of tests."""
+from collections import deque
+
+from django.db import connection
+
+
+class QueryCounter(object):
+    """Count the queries on the default connection, also when DEBUG is off.
+    The log of the connection doesn't drop queries while counting, but it is emptied whenever the queries
+    are counted, so call flush() regularly in long running commands to keep it small.
+
+    Usage::
+
+        with QueryCounter() as counter:
+            ...
+            counter.flush()
+        print(counter.count)
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.force_debug_cursor = None
+        self.queries_log = None
+
+    def __enter__(self):
+        self.force_debug_cursor = connection.force_debug_cursor
+        self.queries_log = connection.queries_log
+        connection.force_debug_cursor = True
+        connection.queries_log = deque()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+        connection.force_debug_cursor = self.force_debug_cursor
+        connection.queries_log = self.queries_log
+
+    def flush(self) -> int:
+        """Count the queries executed since the last flush
+
+        :return: Total number of queries so far
+        """
+        self.count += len(connection.queries_log)
+        connection.queries_log.clear()
+        return self.count
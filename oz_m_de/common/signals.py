@@ -0,0 +1,80 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from oz_m_de.organizations.models import Address, DayOpeningHours, Organization, OrganizationCategory
+from oz_m_de.organizations.schedule import SCHEDULE_DAYS
+from oz_m_de.organizations.signals import organizations_bulk_updated
+from .connections import check_connections
+from .fragments import bump_versions_on_commit
+from .memberships import bump_groups_version, bump_user_versions
+
+
+@receiver(post_save, sender=Organization)
+@receiver(post_delete, sender=Organization)
+def organization_changed(sender, instance: Organization, **kwargs):
+    # The previous category is remembered by organizations.signals.
+    # The list of categories only shows categories with active organizations, so it can change as well
+    bump_versions_on_commit(instance.category_id, getattr(instance, "_previous_category_id", None), None)
+
+
+@receiver(post_save, sender=Address)
+@receiver(post_delete, sender=Address)
+def address_changed(sender, instance: Address, **kwargs):
+    bump_versions_on_commit(*Organization.objects.filter(pk=instance.organization_id)
+                            .values_list("category_id", flat=True))
+
+
+@receiver(post_save, sender=DayOpeningHours)
+def opening_hours_changed(sender, instance: DayOpeningHours, **kwargs):
+    if kwargs.get("created"):
+        # New opening hours can't belong to an organization yet, saving the organization bumps the version
+        return
+
+    lookup = Q()
+    for day in SCHEDULE_DAYS:
+        lookup |= Q(**{day: instance})
+    bump_versions_on_commit(*Organization.objects.filter(lookup).values_list("category_id", flat=True))
+
+
+@receiver(organizations_bulk_updated)
+def organizations_bulk_changed(sender, category_ids, **kwargs):
+    bump_versions_on_commit(*category_ids, None)
+
+
+@receiver(post_save, sender=OrganizationCategory)
+@receiver(post_delete, sender=OrganizationCategory)
+def category_changed(sender, instance: OrganizationCategory, **kwargs):
+    bump_versions_on_commit(instance.pk, None)
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def group_memberships_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+
+    # Bump once the change is committed, other requests would cache the old memberships with the new version
+    if not reverse:
+        # The groups of a user changed
+        transaction.on_commit(partial(bump_user_versions, instance.pk))
+    elif pk_set is not None:
+        # The users of a group changed
+        transaction.on_commit(partial(bump_user_versions, *pk_set))
+    else:
+        # All users were removed from a group
+        transaction.on_commit(bump_groups_version)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance: Group, **kwargs):
+    transaction.on_commit(bump_groups_version)
+
+
+request_started.connect(check_connections, dispatch_uid="oz_m_de.common.check_connections")
@@ -0,0 +1,26 @@
+from celery import shared_task
+from django.conf import settings
+from django.utils import translation
+
+from oz_m_de.organizations.models import OrganizationCategory
+from .clock import get_clock
+from .views import get_homepage_content
+
+
+@shared_task
+def prewarm_homepage(day: str = None) -> int:
+    """Render the home page fragments that are not in the cache, so the first visitors of the day don't have to
+    wait for them
+
+    :param day: 3 letter day string in lowercase, defaults to the current day
+    :return: Number of fragments
+    """
+    if day is None:
+        day = get_clock().day
+
+    category_ids = [None] + list(OrganizationCategory.objects.has_active_organizations()
+                                 .values_list("pk", flat=True))
+    with translation.override(settings.LANGUAGE_CODE):
+        for category_id in category_ids:
+            get_homepage_content(category_id, day)
+    return len(category_ids)
@@ -0,0 +1,101 @@
+"""Query and latency budgets of the views.
+
+The directory is seeded with 10, 100 and 1000 organizations. At every size every view is requested once with
+an empty cache. The number of queries of a view must be the same at every size, so a template that queries per
+row fails here, and every request must stay below the latency budget of the view.
+
+The results are written to .benchmarks/budgets-<time>.json, or to the directory in the BUDGET_RESULTS_DIR
+environment variable, to compare them between runs.
+"""
+import datetime
+import json
+import os
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from test_plus.test import TestCase
+
+from oz_m_de.common.memberships import ORGANIZATIONS_ADMIN_GROUP
+from oz_m_de.organizations.models import Organization, OrganizationCategory
+
+SIZES = (10, 100, 1000)
+
+# Seconds a single request may take with the largest directory, generous enough for a busy CI machine
+LATENCY_BUDGETS = {
+    "home": 0.5,
+    "category": 2.0,
+    "organization list": 2.0,
+    "organization update": 0.5,
+    "opening hours": 0.5,
+    "user list": 1.0,
+}
+
+
+class TestBudgets(TestCase):
+
+    def setUp(self):
+        self.admin = self.make_user("admin")
+        Group.objects.create(name=ORGANIZATIONS_ADMIN_GROUP).user_set.add(self.admin)
+
+    def seed(self, size: int):
+        """Add organizations up to the size, all in one category, and an owner per 10 organizations"""
+        call_command("seed_directory", orgs=size - Organization.objects.count(), categories=1,
+                     owners=max(1, size // 10), stdout=StringIO())
+
+    def get_pages(self) -> dict:
+        category = OrganizationCategory.objects.get()
+        organization = Organization.objects.order_by("pk").first()
+        return {
+            "home": (reverse("home"), None),
+            "category": ("{}?category={}".format(reverse("home"), category.pk), None),
+            "organization list": (reverse("organizations:list"), self.admin),
+            "organization update": (reverse("organizations:update", kwargs={"pk": organization.pk}), self.admin),
+            "opening hours": (reverse("organizations:opening-hours", kwargs={"pk": organization.pk}), self.admin),
+            "user list": (reverse("users:list"), self.admin),
+        }
+
+    def measure(self, path: str, user) -> dict:
+        # Measure rendering, not the fragment and roles caches
+        cache.clear()
+        self.client.logout()
+        if user:
+            self.client.force_login(user)
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = self.client.get(path)
+            seconds = time.perf_counter() - started
+        self.assertEqual(response.status_code, 200, path)
+        return {"queries": len(queries), "seconds": seconds}
+
+    def test_views_stay_within_budget(self):
+        results = {}
+        for size in SIZES:
+            self.seed(size)
+            for name, (path, user) in self.get_pages().items():
+                results.setdefault(name, {})[size] = self.measure(path, user)
+        self.write_results(results)
+
+        for name, by_size in results.items():
+            with self.subTest(view=name):
+                self.assertEqual(len({result["queries"] for result in by_size.values()}), 1,
+                                 "The number of queries grows with the number of organizations: {}".format(
+                                     {size: result["queries"] for size, result in by_size.items()}))
+                self.assertLess(by_size[SIZES[-1]]["seconds"], LATENCY_BUDGETS[name])
+
+    def write_results(self, results: dict):
+        directory = os.environ.get("BUDGET_RESULTS_DIR", str(settings.ROOT_DIR.path(".benchmarks")))
+        os.makedirs(directory, exist_ok=True)
+        now = datetime.datetime.now()
+        path = os.path.join(directory, "budgets-{:%Y%m%d-%H%M%S}.json".format(now))
+        with open(path, "w") as f:
+            json.dump({"time": now.isoformat(), "database": connection.vendor, "sizes": SIZES, "views": results},
+                      f, indent=2, sort_keys=True)
@@ -0,0 +1,41 @@
+import datetime
+
+from django.test import RequestFactory
+from django.utils import timezone
+
+from test_plus.test import TestCase
+
+from ..clock import Clock, ClockMiddleware, get_clock, override_clock
+
+
+class TestClock(TestCase):
+
+    def test_uses_local_time(self):
+        # Sunday 23:30 UTC is already Monday in Amsterdam
+        clock = Clock(datetime.datetime(2017, 1, 1, 23, 30, tzinfo=timezone.utc))
+
+        self.assertEqual(clock.day, "mon")
+        self.assertEqual(clock.date, datetime.date(2017, 1, 2))
+        self.assertEqual(clock.minute_of_day, 30)
+        self.assertEqual(clock.midnight, timezone.make_aware(datetime.datetime(2017, 1, 2)))
+
+    def test_override(self):
+        moment = timezone.make_aware(datetime.datetime(2017, 1, 4, 12))
+        with override_clock(moment):
+            self.assertEqual(get_clock().day, "wed")
+            self.assertIs(get_clock(), get_clock())
+        self.assertIsNot(get_clock(), get_clock())
+
+    def test_middleware_reads_the_clock_once(self):
+        clocks = []
+
+        def get_response(request):
+            clocks.extend([request.clock, get_clock(), get_clock()])
+            return "response"
+
+        response = ClockMiddleware(get_response)(RequestFactory().get("/"))
+
+        self.assertEqual(response, "response")
+        self.assertIs(clocks[0], clocks[1])
+        self.assertIs(clocks[1], clocks[2])
+        self.assertIsNot(get_clock(), clocks[0])
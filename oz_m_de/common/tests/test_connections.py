@@ -0,0 +1,34 @@
+from unittest import mock
+
+from django.db import connection
+
+from test_plus.test import TestCase
+
+from ..connections import check_connections
+
+
+class TestCheckConnections(TestCase):
+
+    def setUp(self):
+        connection.ensure_connection()
+
+    def test_closes_broken_connections(self):
+        with mock.patch.dict(connection.settings_dict, CONN_HEALTH_CHECKS=True), \
+                mock.patch.object(connection, "is_usable", return_value=False), \
+                mock.patch.object(connection, "close") as close:
+            check_connections()
+
+        close.assert_called_once_with()
+
+    def test_keeps_working_connections(self):
+        with mock.patch.dict(connection.settings_dict, CONN_HEALTH_CHECKS=True), \
+                mock.patch.object(connection, "close") as close:
+            check_connections()
+
+        close.assert_not_called()
+
+    def test_without_health_checks(self):
+        with mock.patch.object(connection, "is_usable") as is_usable:
+            check_connections()
+
+        is_usable.assert_not_called()
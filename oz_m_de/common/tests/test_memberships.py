@@ -0,0 +1,89 @@
+import time
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser, Group
+from django.core.cache import cache
+
+from test_plus.test import TestCase
+
+from oz_m_de.users.models import User
+from ..memberships import GROUPS_VERSION_KEY, ORGANIZATIONS_ADMIN_GROUP, bump_groups_version, \
+    is_organizations_admin, roles_key
+from .transactions import run_commit_callbacks
+
+
+class TestIsOrganizationsAdmin(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = self.make_user()
+        self.group = Group.objects.create(name=ORGANIZATIONS_ADMIN_GROUP)
+
+    def fresh_user(self) -> User:
+        """The user as it would be loaded by the next request"""
+        return User.objects.get(pk=self.user.pk)
+
+    def test_member(self):
+        self.user.groups.add(self.group)
+        self.assertTrue(is_organizations_admin(self.fresh_user()))
+
+    def test_not_a_member(self):
+        self.assertFalse(is_organizations_admin(self.fresh_user()))
+
+    def test_anonymous_user(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(is_organizations_admin(AnonymousUser()))
+
+    def test_queries_once_per_request(self):
+        user = self.fresh_user()
+        is_organizations_admin(user)
+
+        cache.clear()
+        with self.assertNumQueries(0):
+            is_organizations_admin(user)
+
+    def test_cached_across_requests(self):
+        is_organizations_admin(self.fresh_user())
+
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            is_organizations_admin(user)
+
+    def test_adding_user_to_group_invalidates(self):
+        self.assertFalse(is_organizations_admin(self.fresh_user()))
+
+        with run_commit_callbacks():
+            self.user.groups.add(self.group)
+            # Until the change is committed, other requests read and cache the old memberships
+            self.assertFalse(is_organizations_admin(self.fresh_user()))
+
+        self.assertTrue(is_organizations_admin(self.fresh_user()))
+
+    def test_removing_user_from_group_invalidates(self):
+        self.group.user_set.add(self.user)
+        self.assertTrue(is_organizations_admin(self.fresh_user()))
+
+        with run_commit_callbacks():
+            self.group.user_set.remove(self.user)
+
+        self.assertFalse(is_organizations_admin(self.fresh_user()))
+
+    def test_renaming_group_invalidates(self):
+        self.user.groups.add(self.group)
+        self.assertTrue(is_organizations_admin(self.fresh_user()))
+
+        self.group.name = "former_admins"
+        with run_commit_callbacks():
+            self.group.save()
+
+        self.assertFalse(is_organizations_admin(self.fresh_user()))
+
+    def test_evicted_version_is_not_reused(self):
+        keys = {roles_key(self.user.pk)}
+        bump_groups_version()
+        keys.add(roles_key(self.user.pk))
+
+        cache.delete(GROUPS_VERSION_KEY)
+
+        with mock.patch("time.time", return_value=time.time() + 1):
+            self.assertNotIn(roles_key(self.user.pk), keys)
@@ -0,0 +1,82 @@
+from collections import defaultdict
+
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.http import HttpResponse, HttpResponseNotFound
+from django.test import RequestFactory, override_settings
+
+from test_plus.test import TestCase
+
+from oz_m_de.users.models import User
+from ..metrics import LocalStorage, MetricsMiddleware, get_storage, observe, render, series
+
+
+class TestRender(TestCase):
+
+    def test_histogram_buckets_are_cumulative_and_sorted(self):
+        storage = LocalStorage()
+        for duration in (0.05, 0.5):
+            values = defaultdict(float)
+            observe(values, "django_http_request_duration_seconds", duration, (0.1, 1), view="home")
+            storage.increment(values)
+
+        self.assertEqual(render(storage.read()).splitlines(), [
+            "# HELP django_http_request_duration_seconds Time from the start of a request to its response",
+            "# TYPE django_http_request_duration_seconds histogram",
+            'django_http_request_duration_seconds_bucket{view="home",le="0.1"} 1',
+            'django_http_request_duration_seconds_bucket{view="home",le="1"} 2',
+            'django_http_request_duration_seconds_bucket{view="home",le="+Inf"} 2',
+            'django_http_request_duration_seconds_count{view="home"} 2',
+            'django_http_request_duration_seconds_sum{view="home"} 0.55',
+        ])
+
+    def test_escapes_labels(self):
+        self.assertEqual(series("django_db_queries_total", view='a"b\\'), 'django_db_queries_total{view="a\\"b\\\\"}')
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN="secret")
+class TestMetrics(TestCase):
+
+    def setUp(self):
+        get_storage().clear()
+
+    def test_records_requests_per_view(self):
+        self.get("home")
+
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+
+        self.assertContains(response, 'django_http_responses_total{status="200",view="home"} 1')
+        self.assertContains(response, 'django_http_request_duration_seconds_count{method="GET",view="home"} 1')
+        self.assertContains(response, 'django_db_queries_total{view="home"}')
+        self.assertContains(response, 'django_cache_misses_total{view="home"}')
+
+    def test_does_not_log_queries(self):
+        def view(request):
+            self.assertFalse(connection.force_debug_cursor)
+            list(User.objects.all())
+            return HttpResponse()
+
+        logged = len(connection.queries_log)
+        request = RequestFactory().get("/")
+        MetricsMiddleware(view)(request)
+
+        self.assertEqual(len(connection.queries_log), logged)
+        self.assertIn('django_db_queries_total{view="<unresolved>"} 1', render(get_storage().read()))
+
+    def test_unresolved_requests(self):
+        request = RequestFactory().get("/nowhere/")
+        MetricsMiddleware(lambda request: HttpResponseNotFound())(request)
+
+        self.assertIn('django_http_responses_total{status="404",view="<unresolved>"} 1', render(get_storage().read()))
+
+    def test_only_for_staff_and_token(self):
+        self.get("metrics")
+        self.response_403()
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(response.status_code, 403)
+
+        user = self.make_user()
+        user.is_staff = True
+        user.save()
+        with self.login(user):
+            self.get_check_200("metrics")
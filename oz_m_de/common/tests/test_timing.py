@@ -0,0 +1,49 @@
+import re
+
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import override_settings
+
+from test_plus.test import TestCase
+
+from oz_m_de.organizations.models import OrganizationCategory
+
+
+class TestServerTimingMiddleware(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = OrganizationCategory.objects.create(name="Hotels")
+
+    def get_home(self):
+        return self.client.get(reverse("home"), {"category": self.category.pk})
+
+    def test_disabled_by_default(self):
+        self.assertNotIn("Server-Timing", self.get_home())
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_measures_sampled_requests(self):
+        with self.assertLogs("oz_m_de.common.timing", "INFO") as logs:
+            response = self.get_home()
+
+        self.assertRegex(response["Server-Timing"], r'^db;desc="[1-9]\d* queries";dur=[\d.]+, template;dur=[\d.]+, '
+                                                    r'cache;desc="\d+ hits, [1-9]\d* misses";dur=[\d.]+, total;dur=')
+        self.assertRegex(logs.output[0], r"method=GET path=/ status=200 .*db_queries=[1-9]")
+
+        # The fragment is cached now
+        self.assertRegex(self.get_home()["Server-Timing"], r'cache;desc="[1-9]\d* hits')
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_counts_queries_without_the_query_log(self):
+        # A full query log, which holds at most 9000 queries
+        connection.queries_log.extend({"sql": "", "time": "1"} for _ in range(connection.queries_limit))
+        self.addCleanup(connection.queries_log.clear)
+
+        response = self.get_home()
+
+        self.assertFalse(connection.force_debug_cursor)
+        queries = int(re.match(r'db;desc="(\d+) queries"', response["Server-Timing"]).group(1))
+        with self.assertNumQueries(queries):
+            cache.clear()
+            self.client.get(reverse("home"), {"category": self.category.pk})
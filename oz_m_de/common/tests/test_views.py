@@ -0,0 +1,188 @@
+import datetime
+
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+
+from test_plus.test import TestCase
+
+from oz_m_de.common.clock import get_clock
+from oz_m_de.common.tests.transactions import run_commit_callbacks
+from oz_m_de.organizations.models import Address, DayOpeningHours, Organization, OrganizationCategory
+
+
+class TestHomePageView(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = self.make_user()
+        self.category = OrganizationCategory.objects.create(name="Hotels")
+        # Get the 3 letter day string in lowercase
+        self.day = get_clock().day
+
+    def make_organizations(self, count):
+        for i in range(count):
+            organization = Organization.objects.create(name="Hotel {}".format(i), category=self.category,
+                                                       owner=self.user, phone_nr="0123456789", is_approved=True)
+            Address.objects.create(address="Kurfürstenstraße 1", postal_code="54531", city="Manderscheid",
+                                   country="DE", organization=organization)
+            setattr(organization, self.day, DayOpeningHours.objects.create(open_first=datetime.time(9),
+                                                                           close_first=datetime.time(17)))
+            organization.save()
+        return organization
+
+    def get_category_page(self):
+        return self.client.get(reverse("home"), {"category": self.category.pk})
+
+    def test_category_page_lists_organizations(self):
+        self.make_organizations(2)
+
+        response = self.get_category_page()
+
+        self.assertContains(response, "Hotel 0")
+        self.assertContains(response, "09:00 to 17:00", count=2)
+
+    def test_category_page_query_count_does_not_grow_with_organizations(self):
+        # The category, the organizations and their addresses
+        self.make_organizations(1)
+        with self.assertNumQueries(3):
+            self.get_category_page()
+
+        self.make_organizations(20)
+        cache.clear()
+        with self.assertNumQueries(3):
+            self.get_category_page()
+
+    def test_cached_category_page_does_not_query(self):
+        self.make_organizations(2)
+        self.get_category_page()
+
+        with self.assertNumQueries(0):
+            response = self.get_category_page()
+        self.assertContains(response, "Hotel 1")
+
+    def test_cached_categories_page_does_not_query(self):
+        self.make_organizations(1)
+        self.client.get(reverse("home"))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("home"))
+        self.assertContains(response, "Hotels")
+
+    def test_unknown_category(self):
+        self.assertEqual(self.client.get(reverse("home"), {"category": 999}).status_code, 404)
+
+    def test_saving_organization_invalidates_category_page(self):
+        organization = self.make_organizations(1)
+        self.get_category_page()
+
+        organization.name = "Renamed"
+        with run_commit_callbacks():
+            organization.save()
+            # Until the change is committed, other requests read and cache the old rows
+            self.assertNotContains(self.get_category_page(), "Renamed")
+
+        self.assertContains(self.get_category_page(), "Renamed")
+
+    def test_category_id_with_leading_zero_is_invalidated(self):
+        organization = self.make_organizations(1)
+        self.client.get(reverse("home"), {"category": "0{}".format(self.category.pk)})
+
+        organization.name = "Renamed"
+        with run_commit_callbacks():
+            organization.save()
+
+        self.assertContains(self.client.get(reverse("home"), {"category": "0{}".format(self.category.pk)}),
+                            "Renamed")
+
+    def test_moving_organization_invalidates_previous_category_page(self):
+        organization = self.make_organizations(1)
+        self.get_category_page()
+
+        organization.category = OrganizationCategory.objects.create(name="Restaurants")
+        with run_commit_callbacks():
+            organization.save()
+
+        self.assertNotContains(self.get_category_page(), "Hotel 0")
+
+    def test_saving_address_invalidates_category_page(self):
+        organization = self.make_organizations(1)
+        self.get_category_page()
+
+        address = organization.addresses.first()
+        address.city = "Daun"
+        with run_commit_callbacks():
+            address.save()
+
+        self.assertContains(self.get_category_page(), "Daun")
+
+    def test_saving_opening_hours_invalidates_category_page(self):
+        organization = self.make_organizations(1)
+        self.get_category_page()
+
+        opening_hours = getattr(organization, self.day)
+        opening_hours.close_first = datetime.time(18)
+        with run_commit_callbacks():
+            opening_hours.save()
+
+        self.assertContains(self.get_category_page(), "09:00 to 18:00")
+
+    def test_saving_category_invalidates_categories_page(self):
+        self.make_organizations(1)
+        self.client.get(reverse("home"))
+
+        self.category.name = "Guesthouses"
+        with run_commit_callbacks():
+            self.category.save()
+
+        self.assertContains(self.client.get(reverse("home")), "Guesthouses")
+
+
+class TestHomePageConditionalGet(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = OrganizationCategory.objects.create(name="Hotels")
+
+    def get_category_page(self, **headers):
+        return self.client.get(reverse("home"), {"category": self.category.pk}, **headers)
+
+    def test_validators(self):
+        response = self.get_category_page()
+
+        self.assertTrue(response.has_header("ETag"))
+        self.assertTrue(response.has_header("Last-Modified"))
+        self.assertIn("public", response["Cache-Control"])
+        self.assertIn("Cookie", response["Vary"])
+
+    def test_if_none_match(self):
+        etag = self.get_category_page()["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.get_category_page(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertIn("public", response["Cache-Control"])
+
+    def test_if_modified_since(self):
+        last_modified = self.get_category_page()["Last-Modified"]
+
+        response = self.get_category_page(HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_change_updates_etag(self):
+        etag = self.get_category_page()["ETag"]
+
+        self.category.name = "Guesthouses"
+        with run_commit_callbacks():
+            self.category.save()
+
+        response = self.get_category_page(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_signed_in_users_are_not_validated(self):
+        self.client.force_login(self.make_user())
+
+        response = self.get_category_page()
+
+        self.assertFalse(response.has_header("ETag"))
+        self.assertIn("private", response["Cache-Control"])
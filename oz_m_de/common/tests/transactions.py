@@ -0,0 +1,16 @@
+from contextlib import contextmanager
+from unittest import mock
+
+from django.db import transaction
+
+
+@contextmanager
+def run_commit_callbacks():
+    """Run the transaction.on_commit callbacks registered in the block at its end, as if the block was committed.
+    The transaction of a TestCase is rolled back, so they would never run otherwise.
+    """
+    callbacks = []
+    with mock.patch.object(transaction, "on_commit", side_effect=lambda func, using=None: callbacks.append(func)):
+        yield callbacks
+    for callback in callbacks:
+        callback()
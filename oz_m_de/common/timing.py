@@ -0,0 +1,241 @@
+"""Where the time of a request goes, measured in production.
+
+ServerTimingMiddleware measures a sample of the requests, settings.SERVER_TIMING_SAMPLE_RATE is the fraction of
+requests that is measured. For these requests it records the number and duration of the SQL queries, the time
+spent rendering templates and the cache hits and misses. It adds them to the response as a Server-Timing header,
+which browsers show in their developer tools::
+
+    Server-Timing: db;desc="12 queries";dur=8.1, template;dur=3.2, cache;desc="4 hits, 1 misses";dur=0.4,
+                   total;dur=14.9
+
+It also logs them as a single line of key=value pairs to the oz_m_de.common.timing logger.
+
+Django 1.10 has no hooks for queries, templates or the cache. The methods of the database, template and cache
+backend classes that make cursors, render templates and read the cache are wrapped, once, when measuring is
+enabled. Cursors made while a request is measured count and time their queries, without the query log of the
+debug cursor. When the sample rate is 0 the middleware removes itself and nothing is wrapped. The metrics
+middleware in common.metrics uses the same measurements.
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.template.backends.django import Template
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_instrumented = False
+
+# Returned by the wrapped backend instead of the default, to tell a miss from a cached default value
+MISSING = object()
+
+
+class Timings(object):
+    """Measurements of a single request, durations in milliseconds"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.db_queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache = 0.0
+        # Templates render other templates, only the outermost render is counted
+        self.template_depth = 0
+
+    def finish(self):
+        """Set the total time up to now"""
+        self.total = elapsed(self.started)
+
+    def header(self) -> str:
+        return ", ".join([
+            'db;desc="{} queries";dur={:.1f}'.format(self.db_queries, self.db),
+            "template;dur={:.1f}".format(self.template),
+            'cache;desc="{} hits, {} misses";dur={:.1f}'.format(self.cache_hits, self.cache_misses, self.cache),
+            "total;dur={:.1f}".format(self.total),
+        ])
+
+    def as_dict(self) -> dict:
+        return {"total_ms": round(self.total, 1), "db_queries": self.db_queries, "db_ms": round(self.db, 1),
+                "template_ms": round(self.template, 1), "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses, "cache_ms": round(self.cache, 1)}
+
+
+def get_timings() -> Timings:
+    """Get the measurements of the current request, or None when it is not measured"""
+    return getattr(_local, "timings", None)
+
+
+def elapsed(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+
+@contextmanager
+def measure():
+    """Measure everything within the block, call finish() on the Timings to set the total.
+    Within another measurement, the Timings of that measurement are used.
+    """
+    timings = get_timings()
+    if timings is not None:
+        yield timings
+        return
+
+    instrument()
+    timings = _local.timings = Timings()
+    try:
+        yield timings
+    finally:
+        _local.timings = None
+
+
+class TimedCursor(object):
+    """Count and time the queries of a cursor, around the cursor wrapper of Django"""
+
+    def __init__(self, cursor, timings: Timings):
+        self.cursor = cursor
+        self.timings = timings
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self.cursor.__exit__(exc_type, exc_value, traceback)
+
+    def execute(self, sql, params=None):
+        started = time.perf_counter()
+        try:
+            return self.cursor.execute(sql, params)
+        finally:
+            self.timings.db_queries += 1
+            self.timings.db += elapsed(started)
+
+    def executemany(self, sql, param_list):
+        started = time.perf_counter()
+        try:
+            return self.cursor.executemany(sql, param_list)
+        finally:
+            self.timings.db_queries += 1
+            self.timings.db += elapsed(started)
+
+
+def time_cursor(make_cursor):
+    @wraps(make_cursor)
+    def timed_make_cursor(self, cursor):
+        timings = get_timings()
+        wrapper = make_cursor(self, cursor)
+        return wrapper if timings is None else TimedCursor(wrapper, timings)
+    return timed_make_cursor
+
+
+def time_template(render):
+    @wraps(render)
+    def timed_render(self, *args, **kwargs):
+        timings = get_timings()
+        if timings is None:
+            return render(self, *args, **kwargs)
+
+        started = time.perf_counter()
+        timings.template_depth += 1
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            timings.template_depth -= 1
+            if not timings.template_depth:
+                timings.template += elapsed(started)
+    return timed_render
+
+
+def time_cache_get(get):
+    @wraps(get)
+    def timed_get(self, key, default=None, *args, **kwargs):
+        timings = get_timings()
+        if timings is None:
+            return get(self, key, default, *args, **kwargs)
+
+        started = time.perf_counter()
+        value = get(self, key, MISSING, *args, **kwargs)
+        timings.cache += elapsed(started)
+        if value is MISSING:
+            timings.cache_misses += 1
+            return default
+        timings.cache_hits += 1
+        return value
+    return timed_get
+
+
+def time_cache_get_many(get_many):
+    @wraps(get_many)
+    def timed_get_many(self, keys, *args, **kwargs):
+        timings = get_timings()
+        if timings is None:
+            return get_many(self, keys, *args, **kwargs)
+
+        keys = list(keys)
+        started = time.perf_counter()
+        values = get_many(self, keys, *args, **kwargs)
+        timings.cache += elapsed(started)
+        timings.cache_hits += len(values)
+        timings.cache_misses += len(keys) - len(values)
+        return values
+    return timed_get_many
+
+
+def instrument():
+    """Wrap the methods that make cursors, the render method of Django templates and the read methods of the
+    default cache backend
+    """
+    global _instrumented
+    if _instrumented:
+        return
+    BaseDatabaseWrapper.make_cursor = time_cursor(BaseDatabaseWrapper.make_cursor)
+    BaseDatabaseWrapper.make_debug_cursor = time_cursor(BaseDatabaseWrapper.make_debug_cursor)
+    Template.render = time_template(Template.render)
+    backend = type(caches[DEFAULT_CACHE_ALIAS])
+    backend.get = time_cache_get(backend.get)
+    backend.get_many = time_cache_get_many(backend.get_many)
+    _instrumented = True
+
+
+class ServerTimingMiddleware(object):
+    """Measure a sample of the requests, see the module documentation"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.SERVER_TIMING_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        instrument()
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        with measure() as timings:
+            response = self.get_response(request)
+            timings.finish()
+
+        server_timing = timings.header()
+        if response.has_header("Server-Timing"):
+            server_timing = "{}, {}".format(response["Server-Timing"], server_timing)
+        response["Server-Timing"] = server_timing
+
+        logger.info(" ".join("{}={}".format(name, value) for name, value in [
+            ("method", request.method), ("path", request.path), ("status", response.status_code)] +
+            sorted(timings.as_dict().items())), extra={"timings": timings.as_dict()})
+        return response
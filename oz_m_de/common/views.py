@@ -1,35 +1,131 @@
-from django.utils import timezone
-from django.views.generic import TemplateView
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
+from django.utils import translation
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import condition
+from django.views.generic import TemplateView
 
 from oz_m_de.organizations.models import Organization, OrganizationCategory
+from .clock import get_clock
+from .fragments import fragment_key, get_fragment, get_last_modified, set_fragment
+from .metrics import get_storage, render as render_metrics
+
+CONTENT_TEMPLATE_NAME = "pages/home_content.html"
 
 
 def getkey(item: OrganizationCategory) -> str:
     return item.name
 
 
+def is_shared_homepage(request) -> bool:
+    """Anonymous visitors without pending messages all get the same home page, so it can be validated and
+    cached by the proxy. Signed in users see their own menu.
+    """
+    category_id = request.GET.get("category")
+    return not request.user.is_authenticated and "messages" not in request.COOKIES \
+        and (not category_id or category_id.isdigit())
+
+
+def homepage_etag(request, *args, **kwargs) -> str:
+    """The ETag is based on the version of the page, the day and the language, so the page doesn't need to be
+    rendered to compute it
+    """
+    if not is_shared_homepage(request):
+        return None
+    key = fragment_key(request.GET.get("category"), get_clock().day, translation.get_language())
+    return hashlib.md5(key.encode("utf-8")).hexdigest()
+
+
+def homepage_last_modified(request, *args, **kwargs) -> datetime.datetime:
+    """The page changes when its data changes, and at midnight, because it shows today's opening hours"""
+    if not is_shared_homepage(request):
+        return None
+    return max(get_last_modified(request.GET.get("category")), get_clock().midnight)
+
+
+# The page is read only, and a cached page should not need a database connection at all
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
 class HomePageView(TemplateView):
     template_name = "pages/home.html"
 
+    def dispatch(self, request, *args, **kwargs):
+        response = super(HomePageView, self).dispatch(request, *args, **kwargs)
+
+        if is_shared_homepage(request):
+            patch_cache_control(response, public=True, max_age=settings.HOMEPAGE_CACHE_MAX_AGE)
+        else:
+            patch_cache_control(response, private=True, max_age=0)
+        patch_vary_headers(response, ["Cookie"])
+        return response
+
+    @method_decorator(condition(etag_func=homepage_etag, last_modified_func=homepage_last_modified))
     def get(self, request, *args, **kwargs):
         category_id = request.GET.get("category")
-        category = None
-        if category_id:
-            category = get_object_or_404(OrganizationCategory, pk=category_id)
-            organizations = Organization.objects.is_active_and_category(category)
-            categories = None
-        else:
-            organizations = None
-            categories = OrganizationCategory.objects.has_active_organizations()
+        day = get_clock().day
+
+        if category_id and not category_id.isdigit():
+            # Not a valid category, let render_homepage_content raise the error and don't cache anything
+            return self.render_to_response({"content": render_homepage_content(category_id, day, request)})
+
+        return self.render_to_response({"content": get_homepage_content(category_id, day, request)})
+
+
+def render_homepage_content(category_id, day: str, request=None) -> str:
+    """Render the part of the home page below the jumbotron: the list of categories, or the organizations of
+    a category
+
+    :param category_id: Primary key of the category, or None for the list of categories
+    :param day: 3 letter day string in lowercase, e.g. "mon"
+    :param request: Request the content is rendered for, None when the content is rendered in advance
+    :return: HTML
+    """
+    category = None
+    if category_id:
+        category = get_object_or_404(OrganizationCategory, pk=category_id)
+        organizations = Organization.objects.for_listing(category)
+        categories = None
+    else:
+        organizations = None
+        categories = OrganizationCategory.objects.has_active_organizations()
+
+    ctx = {
+        "category": category,
+        "organizations": organizations,
+        "day": day,
+        "organization_types": categories
+    }
+
+    return render_to_string(CONTENT_TEMPLATE_NAME, ctx, request=request)
+
+
+def get_homepage_content(category_id, day: str, request=None) -> str:
+    """Get the content of the home page from the fragment cache, render and cache it when it is missing"""
+    key = fragment_key(category_id, day, translation.get_language())
+    content = get_fragment(key)
+    if content is None:
+        content = render_homepage_content(category_id, day, request)
+        set_fragment(key, content)
+    return content
 
-        day = timezone.now().strftime("%a").lower
 
-        ctx = {
-            "category": category,
-            "organizations": organizations,
-            "day": day,
-            "organization_types": categories
-        }
+@never_cache
+def metrics(request):
+    """Metrics of all worker processes in the Prometheus text format, for staff and for scrapers that send
+    settings.METRICS_TOKEN as bearer token
+    """
+    authorization = request.META.get("HTTP_AUTHORIZATION", "")
+    has_token = settings.METRICS_TOKEN and constant_time_compare(authorization, "Bearer " + settings.METRICS_TOKEN)
+    if not has_token and not request.user.is_staff:
+        raise PermissionDenied
 
-        return self.render_to_response(ctx)
+    return HttpResponse(render_metrics(get_storage().read()), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class OrganizationsConfig(AppConfig):
     name = 'oz_m_de.organizations'
+
+    def ready(self):
+        from . import signals  # noqa
@@ -1,14 +1,21 @@
+from collections import OrderedDict
+from functools import lru_cache
+
 from django import forms
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.db.models import ObjectDoesNotExist
 from django.forms import modelform_factory
 from django.forms.widgets import HiddenInput
 from django.utils.translation import ugettext as _
 
 from crispy_forms.helper import FormHelper
-from crispy_forms.layout import Layout, Div, HTML
+from crispy_forms.layout import Layout, Div, HTML, Submit
 
-from .models import Organization, Address, DayOpeningHours
+from .models import Organization, OrganizationCategory, Address, DayOpeningHours
+from .opening_hours import apply_opening_hours, create_opening_hours, update_in_bulk
+from .schedule import DayHours, TIME_FIELDS, replace_day
+from .summaries import build_summaries
 
 
 class AddressForm(forms.ModelForm):
@@ -48,15 +55,52 @@ OrganizationAdminForm = modelform_factory(Organization, form=OrganizationForm,
                                           exclude=["today", "mon", "tue", "wed",
                                                    "thu", "fri", "sat", "sun"])
 
-DAYS = {
-    "mon": _("Monday"),
-    "tue": _("Tuesday"),
-    "wed": _("wednesday"),
-    "thu": _("Thursday"),
-    "fri": _("Friday"),
-    "sat": _("Saturday"),
-    "sun": _("Sunday")
-}
+
+@lru_cache(maxsize=None)
+def opening_hours_helper(day: str) -> FormHelper:
+    """Get the helper of the opening hours form of a day.
+    The helper doesn't depend on the form it renders, so it is built once per day and shared by all forms.
+
+    :param day: Name of the day, shown in front of the fields
+    """
+    helper = FormHelper()
+    helper.layout = Layout(
+        Div(Div(HTML(day), css_class="col-md-1"),
+            Div(
+                Div(
+                    Div(
+                        Div("open_first", css_class="col-md-6"),
+                        Div("close_first", css_class="col-md-6"),
+                        css_class="col-md-6"
+                    ),
+                    Div(
+                        Div("open_second", css_class="col-md-6"),
+                        Div("close_second", css_class="col-md-6"),
+                        css_class="col-md-6"
+                    ),
+                    css_class="col-md-6"
+                ),
+                css_class="col-md-11"
+            )
+            ),
+    )
+
+    helper.disable_csrf = True
+    helper.form_show_labels = False
+    helper.form_tag = False
+    return helper
+
+
+# In the order of the week, dicts don't keep their order before Python 3.6
+DAYS = OrderedDict([
+    ("mon", _("Monday")),
+    ("tue", _("Tuesday")),
+    ("wed", _("Wednesday")),
+    ("thu", _("Thursday")),
+    ("fri", _("Friday")),
+    ("sat", _("Saturday")),
+    ("sun", _("Sunday")),
+])
 
 
 class OpeningHoursForm(forms.ModelForm):
@@ -66,32 +110,7 @@ class OpeningHoursForm(forms.ModelForm):
 
     def __init__(self, day, *args, **kwargs):
         super(OpeningHoursForm, self).__init__(*args, **kwargs)
-        self.helper = FormHelper(self)
-
-        self.helper.layout = Layout(
-            Div(Div(HTML(day), css_class="col-md-1"),
-                Div(
-                    Div(
-                        Div(
-                            Div("open_first", css_class="col-md-6"),
-                            Div("close_first", css_class="col-md-6"),
-                            css_class="col-md-6"
-                        ),
-                        Div(
-                            Div("open_second", css_class="col-md-6"),
-                            Div("close_second", css_class="col-md-6"),
-                            css_class="col-md-6"
-                        ),
-                        css_class="col-md-6"
-                    ),
-                    css_class="col-md-11"
-                )
-                ),
-        )
-
-        self.helper.disable_csrf = True
-        self.helper.form_show_labels = False
-        self.helper.form_tag = False
+        self.helper = opening_hours_helper(day)
 
     def clean(self):
         open_first_value = self.cleaned_data.get("open_first") is not None
@@ -106,3 +125,159 @@ class OpeningHoursForm(forms.ModelForm):
             raise ValidationError(_("Opening time requires a closing time"))
         if not open_second_value and close_second_value:
             raise ValidationError(_("Closing time requires an opening time"))
+
+
+class OpeningHoursFormSet(object):
+    """The opening hours forms of all days of an organization: today for organizations that update their
+    opening hours daily, all days of the week for the others.
+    Days without opening hours get a form for new opening hours, which are only created when the form is saved.
+    """
+
+    def __init__(self, organization: Organization, data=None):
+        self.organization = organization
+        if organization.update_opening_hours_daily:
+            days = {"today": _("Today")}
+        else:
+            days = DAYS
+
+        self.forms = [OpeningHoursForm(prefix=day, day=name, data=data,
+                                       instance=getattr(organization, day) or DayOpeningHours())
+                      for day, name in days.items()]
+
+    def __iter__(self):
+        return iter(self.forms)
+
+    def is_valid(self) -> bool:
+        # Validate all forms, so all of them show their errors
+        return all([form.is_valid() for form in self.forms])
+
+    def save(self) -> int:
+        """Create the opening hours of the days that didn't have any, update the changed ones and save the
+        organization once, when anything changed
+
+        :return: Number of days that changed
+        """
+        created, created_days, updated, updated_fields = [], [], [], set()
+        schedule = self.organization.schedule
+        for form in self.forms:
+            if not form.has_changed():
+                continue
+            schedule = replace_day(schedule, form.prefix, form.instance)
+            if form.instance.pk is None:
+                created.append(form.instance)
+                created_days.append(form.prefix)
+            else:
+                updated.append(form.instance)
+                updated_fields.update(form.changed_data)
+
+        if not created and not updated:
+            return 0
+
+        with transaction.atomic():
+            create_opening_hours(created)
+            update_in_bulk(updated, sorted(updated_fields))
+
+            # Link the new opening hours. The updated ones don't send post_save, so they are packed here
+            for form in self.forms:
+                if form.instance.pk is not None:
+                    setattr(self.organization, form.prefix, form.instance)
+            self.organization.schedule = schedule
+            self.organization.summaries = build_summaries(schedule)
+            self.organization.save(update_fields=created_days + ["schedule", "summaries"])
+        return len(created) + len(updated)
+
+
+class OrganizationFilterForm(forms.Form):
+    """Filters of the list of organizations of owners and admins"""
+    STATUSES = {
+        "active": {"is_active": True},
+        "inactive": {"is_active": False},
+        "approved": {"is_approved": True},
+        "unapproved": {"is_approved": False},
+        "blocked": {"is_blocked": True},
+    }
+
+    name = forms.CharField(required=False, label=_("Name starts with"))
+    category = forms.ModelChoiceField(OrganizationCategory.objects.order_by("name"), required=False,
+                                      label=_("Category"))
+    status = forms.ChoiceField(required=False, label=_("Status"),
+                               choices=[("", _("All")), ("active", _("Active")), ("inactive", _("Not active")),
+                                        ("approved", _("Approved")), ("unapproved", _("Not approved")),
+                                        ("blocked", _("Blocked"))])
+
+    def __init__(self, *args, **kwargs):
+        super(OrganizationFilterForm, self).__init__(*args, **kwargs)
+        self.helper = FormHelper(self)
+        self.helper.form_method = "get"
+        self.helper.form_class = "form-inline"
+        self.helper.field_template = "bootstrap4/layout/inline_field.html"
+        self.helper.add_input(Submit("filter", _("Filter"), css_class="btn-default"))
+
+    def filter(self, organizations):
+        """Apply the filters, invalid filters are ignored"""
+        if not self.is_valid():
+            return organizations
+
+        if self.cleaned_data["name"]:
+            organizations = organizations.filter(name__istartswith=self.cleaned_data["name"])
+        if self.cleaned_data["category"]:
+            organizations = organizations.filter(category=self.cleaned_data["category"])
+        if self.cleaned_data["status"]:
+            organizations = organizations.filter(**self.STATUSES[self.cleaned_data["status"]])
+        return organizations
+
+
+class BulkOpeningHoursForm(forms.Form):
+    """Select organizations and the days of which the opening hours are replaced.
+    The new opening hours are entered in one OpeningHoursForm per day, with the day as prefix.
+    """
+    category = forms.ModelChoiceField(OrganizationCategory.objects.order_by("name"), required=False,
+                                      label=_("Category"))
+    organizations = forms.ModelMultipleChoiceField(Organization.objects.sorted_by_name(), required=False,
+                                                   label=_("Organizations"),
+                                                   help_text=_("Leave empty to change all organizations of "
+                                                               "the category"))
+    days = forms.MultipleChoiceField(choices=tuple(DAYS.items()), widget=forms.CheckboxSelectMultiple,
+                                     label=_("Days"),
+                                     help_text=_("The opening hours of these days are replaced, "
+                                                 "days left empty are closed"))
+
+    def __init__(self, *args, **kwargs):
+        super(BulkOpeningHoursForm, self).__init__(*args, **kwargs)
+        self.helper = FormHelper(self)
+        self.helper.form_tag = False
+        self.helper.disable_csrf = True
+
+        self.day_forms = [OpeningHoursForm(prefix=day, day=name, data=kwargs.get("data"))
+                          for day, name in DAYS.items()]
+
+    def clean(self):
+        cleaned_data = super(BulkOpeningHoursForm, self).clean()
+        if not cleaned_data.get("category") and not cleaned_data.get("organizations"):
+            raise ValidationError(_("Select a category or organizations"))
+        return cleaned_data
+
+    def is_valid(self) -> bool:
+        # Validate all forms, so all of them show their errors
+        return all([super(BulkOpeningHoursForm, self).is_valid()] +
+                   [form.is_valid() for form in self.day_forms])
+
+    def get_organizations(self):
+        organizations = self.cleaned_data["organizations"]
+        if not organizations:
+            organizations = Organization.objects.filter(category=self.cleaned_data["category"])
+        elif self.cleaned_data["category"]:
+            organizations = organizations.filter(category=self.cleaned_data["category"])
+        return organizations
+
+    def save(self) -> int:
+        """Replace the opening hours of the selected days of the selected organizations
+
+        :return: Number of rows changed
+        """
+        opening_hours = {}
+        for form in self.day_forms:
+            if form.prefix in self.cleaned_data["days"]:
+                hours = DayHours(*(form.cleaned_data.get(field) for field in TIME_FIELDS))
+                opening_hours[form.prefix] = hours if any(hours) else None
+        return apply_opening_hours(self.get_organizations(), opening_hours)
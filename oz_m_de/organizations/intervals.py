@@ -0,0 +1,270 @@
+"""In-memory index of the opening hours of all active organizations.
+
+The opening hours are converted to minute-of-week intervals, where minute 0 is Monday 00:00, and kept
+in a sorted list per category. Questions like "which organizations are open at T" are answered by
+bisecting that list instead of scanning all organizations.
+
+Every process keeps its own index. It is built on first use and updated incrementally by the signals
+in organizations.signals, once the transaction that made the change is committed. Changes made by other
+processes are picked up through a version number in the cache; when it differs from the version the index
+was built for, the index is rebuilt.
+"""
+import bisect
+import datetime
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from oz_m_de.common.clock import get_clock
+from .schedule import SCHEDULE_DAYS, unpack_day
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+WEEK_DAYS = SCHEDULE_DAYS[1:]
+
+VERSION_CACHE_KEY = "organizations:opening_hours_index:version"
+
+
+def minute_of_week(moment: datetime.datetime) -> int:
+    return moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+
+
+def minute_of_day(value: datetime.time) -> int:
+    return value.hour * 60 + value.minute
+
+
+def schedule_intervals(schedule: str, update_opening_hours_daily: bool, weekday: int) -> list:
+    """Convert a packed schedule to sorted minute-of-week intervals.
+    Organizations that update their opening hours daily only have today's opening hours,
+    which are placed on the given weekday. Opening hours that close after midnight continue on the next day,
+    and intervals that run past Sunday midnight are split at the end of the week.
+
+    :param schedule: Packed schedule
+    :param update_opening_hours_daily: Read the opening hours of today instead of those of the weekdays
+    :param weekday: Day of the week of today, Monday is 0
+    :return: List of (start, end) tuples
+    """
+    if update_opening_hours_daily:
+        days = [(weekday, "today")]
+    else:
+        days = enumerate(WEEK_DAYS)
+
+    intervals = []
+    for index, day in days:
+        opening_hours = unpack_day(schedule, day)
+        if opening_hours is None:
+            continue
+
+        for opens, closes in ((opening_hours.open_first, opening_hours.close_first),
+                              (opening_hours.open_second, opening_hours.close_second)):
+            if opens is None or closes is None:
+                continue
+            length = (minute_of_day(closes) - minute_of_day(opens)) % MINUTES_PER_DAY
+            if not length:
+                continue
+            start = index * MINUTES_PER_DAY + minute_of_day(opens)
+            end = start + length
+            if end > MINUTES_PER_WEEK:
+                intervals.append((0, end - MINUTES_PER_WEEK))
+                end = MINUTES_PER_WEEK
+            intervals.append((start, end))
+    return sorted(intervals)
+
+
+class CategoryIntervals(object):
+    """Sorted (start, end, organization_id) intervals of the organizations of a single category"""
+
+    def __init__(self):
+        self.intervals = []
+        # Upper bound of the length of the intervals, an interval that contains a minute
+        # starts at most this many minutes before it
+        self.max_length = 0
+
+    def add(self, organization_id: int, intervals: list):
+        for start, end in intervals:
+            bisect.insort(self.intervals, (start, end, organization_id))
+            self.max_length = max(self.max_length, end - start)
+
+    def extend(self, organization_id: int, intervals: list):
+        """Add intervals without keeping the list sorted, call sort() when done"""
+        for start, end in intervals:
+            self.intervals.append((start, end, organization_id))
+            self.max_length = max(self.max_length, end - start)
+
+    def sort(self):
+        self.intervals.sort()
+
+    def remove(self, organization_id: int, intervals: list):
+        for start, end in intervals:
+            position = bisect.bisect_left(self.intervals, (start, end, organization_id))
+            if position < len(self.intervals) and self.intervals[position] == (start, end, organization_id):
+                del self.intervals[position]
+
+    def containing(self, minute: int) -> list:
+        """Intervals that contain the minute"""
+        low = bisect.bisect_left(self.intervals, (minute - self.max_length + 1,))
+        high = bisect.bisect_right(self.intervals, (minute, MINUTES_PER_WEEK + 1))
+        return [interval for interval in self.intervals[low:high] if interval[1] > minute]
+
+    def next_start(self, minute: int) -> int:
+        """First start after the minute, wrapping around to next week.
+        The result can be larger than MINUTES_PER_WEEK, or None if there are no intervals at all
+        """
+        if not self.intervals:
+            return None
+        position = bisect.bisect_right(self.intervals, (minute, MINUTES_PER_WEEK + 1))
+        if position < len(self.intervals):
+            return self.intervals[position][0]
+        return self.intervals[0][0] + MINUTES_PER_WEEK
+
+
+class OpeningHoursIndex(object):
+
+    def __init__(self):
+        self.categories = {}
+        # Organization id -> (category id, intervals), needed to remove an organization
+        self.organizations = {}
+        self.version = None
+        self.date = None
+
+    def clear(self):
+        self.categories = {}
+        self.organizations = {}
+        self.version = None
+        self.date = None
+
+    def build(self, today: datetime.date):
+        """Load the opening hours of all active organizations"""
+        from .models import Organization
+
+        self.categories = {}
+        self.organizations = {}
+        # Start the version, so the first change of this process doesn't look like a change of another one
+        cache.add(VERSION_CACHE_KEY, 0, None)
+        self.version = cache.get(VERSION_CACHE_KEY)
+        self.date = today
+
+        organizations = Organization.objects.is_active() \
+            .values_list("pk", "category_id", "schedule", "update_opening_hours_daily")
+        for pk, category_id, schedule, update_opening_hours_daily in organizations.iterator():
+            intervals = schedule_intervals(schedule, update_opening_hours_daily, today.weekday())
+            self.organizations[pk] = (category_id, intervals)
+            self.categories.setdefault(category_id, CategoryIntervals()).extend(pk, intervals)
+
+        for category in self.categories.values():
+            category.sort()
+
+    def add(self, organization_id: int, category_id: int, intervals: list):
+        self.organizations[organization_id] = (category_id, intervals)
+        self.categories.setdefault(category_id, CategoryIntervals()).add(organization_id, intervals)
+
+    def remove(self, organization_id: int):
+        category_id, intervals = self.organizations.pop(organization_id, (None, []))
+        if category_id in self.categories:
+            self.categories[category_id].remove(organization_id, intervals)
+
+    def update(self, organization):
+        """Replace the intervals of a single organization after it has been saved, once the transaction is
+        committed. Until then other processes could rebuild their index from the old rows.
+        """
+        listed = organization.is_active and not organization.is_blocked and organization.is_approved
+        transaction.on_commit(partial(self.replace, organization.pk, organization.category_id,
+                                      organization.schedule if listed else None,
+                                      organization.update_opening_hours_daily))
+
+    def delete(self, organization):
+        """Remove a single organization after it has been deleted, once the transaction is committed"""
+        transaction.on_commit(partial(self.remove_outdated, organization.pk))
+
+    def replace(self, organization_id: int, category_id: int, schedule: str, update_opening_hours_daily: bool):
+        """Replace the intervals of an organization
+
+        :param organization_id: Primary key of the organization
+        :param category_id: Primary key of its category
+        :param schedule: Packed schedule, None if the organization is not listed
+        :param update_opening_hours_daily: Read the opening hours of today instead of those of the weekdays
+        """
+        self.remove_outdated(organization_id)
+        if self.date is not None and schedule is not None:
+            self.add(organization_id, category_id,
+                     schedule_intervals(schedule, update_opening_hours_daily, self.date.weekday()))
+
+    def remove_outdated(self, organization_id: int):
+        """Remove the intervals of an organization that is about to change.
+        The version in the cache is bumped, so other processes rebuild their index.
+        """
+        version = bump_version()
+        if self.version != version - 1:
+            # Another process changed the opening hours in the meantime, rebuild on next use
+            self.clear()
+            return
+
+        self.version = version
+        self.remove(organization_id)
+
+    def get_category(self, category_id: int, moment: datetime.datetime) -> CategoryIntervals:
+        if self.date != moment.date() or self.version != cache.get(VERSION_CACHE_KEY):
+            self.build(moment.date())
+        return self.categories.get(category_id, CategoryIntervals())
+
+    def open_at(self, category_id: int, moment: datetime.datetime = None) -> set:
+        """Get the organizations of a category that are open at a moment
+
+        :param category_id: Primary key of the category
+        :param moment: Defaults to now
+        :return: Set of organization ids
+        """
+        moment = timezone.localtime(moment) if moment else get_clock().now
+        category = self.get_category(category_id, moment)
+        return {organization_id for _, _, organization_id in category.containing(minute_of_week(moment))}
+
+    def opens_next_at(self, category_id: int, moment: datetime.datetime = None) -> datetime.datetime:
+        """Get the first moment after a moment at which an organization of a category opens
+
+        :param category_id: Primary key of the category
+        :param moment: Defaults to now
+        :return: Datetime, or None if no organization of the category has opening hours
+        """
+        moment = timezone.localtime(moment) if moment else get_clock().now
+        category = self.get_category(category_id, moment)
+        minute = minute_of_week(moment)
+        start = category.next_start(minute)
+        if start is None:
+            return None
+        return moment.replace(second=0, microsecond=0) + datetime.timedelta(minutes=start - minute)
+
+    def closing_within(self, category_id: int, minutes: int, moment: datetime.datetime = None) -> set:
+        """Get the organizations of a category that are open at a moment and close within a number of minutes
+
+        :param category_id: Primary key of the category
+        :param minutes: Number of minutes
+        :param moment: Defaults to now
+        :return: Set of organization ids
+        """
+        moment = timezone.localtime(moment) if moment else get_clock().now
+        category = self.get_category(category_id, moment)
+        minute = minute_of_week(moment)
+
+        closing = set()
+        for _, end, organization_id in category.containing(minute):
+            if end == MINUTES_PER_WEEK:
+                # Opening hours that run past Sunday midnight continue at the start of the week
+                end += max([e for _, e, pk in category.containing(0) if pk == organization_id] or [0])
+            if end - minute <= minutes:
+                closing.add(organization_id)
+        return closing
+
+
+def bump_version() -> int:
+    cache.add(VERSION_CACHE_KEY, 0, None)
+    try:
+        return cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        # The key was evicted between add and incr
+        cache.set(VERSION_CACHE_KEY, 1, None)
+        return 1
+
+
+opening_hours_index = OpeningHoursIndex()
@@ -0,0 +1,44 @@
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from oz_m_de.organizations.intervals import MINUTES_PER_DAY, MINUTES_PER_WEEK, CategoryIntervals
+
+
+class Command(BaseCommand):
+    help = "Measure the lookup cost of the opening hours index as the number of organizations grows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="100,1000,10000,100000",
+                            help="Comma separated numbers of organizations")
+        parser.add_argument("--lookups", type=int, default=1000, help="Number of lookups per size")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        lookups = options["lookups"]
+        minutes = [rng.randrange(MINUTES_PER_WEEK) for _ in range(lookups)]
+
+        self.stdout.write("{:>10} {:>14} {:>14} {:>14}".format("orgs", "open at (us)", "next (us)", "build (ms)"))
+        for size in [int(size) for size in options["sizes"].split(",")]:
+            category = CategoryIntervals()
+            build = timeit.timeit(lambda: self.fill(category, size, rng), number=1)
+
+            open_at = timeit.timeit(lambda: [category.containing(minute) for minute in minutes], number=1)
+            next_start = timeit.timeit(lambda: [category.next_start(minute) for minute in minutes], number=1)
+
+            self.stdout.write("{:>10} {:>14.2f} {:>14.2f} {:>14.1f}".format(
+                size, open_at / lookups * 10 ** 6, next_start / lookups * 10 ** 6, build * 1000))
+
+    def fill(self, category: CategoryIntervals, size: int, rng: random.Random):
+        """Give every organization opening hours of 4 to 10 hours, starting between 06:00 and 12:00,
+        on 5 to 7 days of the week
+        """
+        for organization_id in range(size):
+            intervals = []
+            for day in rng.sample(range(7), rng.randint(5, 7)):
+                start = day * MINUTES_PER_DAY + rng.randrange(6 * 60, 12 * 60, 15)
+                intervals.append((start, start + rng.randrange(4 * 60, 10 * 60, 15)))
+            category.extend(organization_id, intervals)
+        category.sort()
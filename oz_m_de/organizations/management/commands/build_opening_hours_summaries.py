@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from oz_m_de.common.fragments import bump_versions
+from oz_m_de.organizations.models import Organization
+from oz_m_de.organizations.opening_hours import set_in_bulk
+from oz_m_de.organizations.summaries import build_summaries
+
+
+class Command(BaseCommand):
+    help = "Render the opening hours of all organizations in every language of settings.OPENING_HOURS_LANGUAGES. " \
+           "Run it after the migration that adds the summaries and after changing the languages or translations."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Number of organizations per batch")
+
+    def handle(self, *args, **options):
+        organizations = Organization.objects.order_by("pk").values_list("pk", "schedule", "summaries")
+        build_summaries.cache_clear()
+
+        started = time.perf_counter()
+        last_pk, total, changed = 0, 0, 0
+        while True:
+            batch = list(organizations.filter(pk__gt=last_pk)[:options["batch_size"]])
+            if not batch:
+                break
+            summaries = {pk: build_summaries(schedule) for pk, schedule, _ in batch}
+            with transaction.atomic():
+                changed += set_in_bulk(Organization, "summaries", {pk: summaries[pk] for pk, _, current in batch
+                                                                   if summaries[pk] != current})
+            total += len(batch)
+            last_pk = batch[-1][0]
+
+        if changed:
+            # The home page shows the summaries
+            bump_versions(None, *Organization.objects.values_list("category_id", flat=True).distinct())
+        self.stdout.write(self.style.SUCCESS("Built the summaries of {} of {} organizations in {:.2f}s".format(
+            changed, total, time.perf_counter() - started)))
@@ -0,0 +1,90 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from oz_m_de.common.clock import get_clock
+from oz_m_de.organizations.models import Organization, OrganizationCategory
+from oz_m_de.organizations.schedule import EMPTY_DAY, SCHEDULE_DAYS
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Print the query plans of the organization querysets against a synthetic dataset, which is rolled back"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orgs", type=int, default=5000, help="Number of synthetic organizations")
+        parser.add_argument("--categories", type=int, default=10, help="Number of synthetic categories")
+        parser.add_argument("--owners", type=int, default=100, help="Number of synthetic owners")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                categories, owners = self.create_dataset(random.Random(options["seed"]), options["orgs"],
+                                                         options["categories"], options["owners"])
+                for name, queryset in self.get_querysets(categories[0], owners[0]):
+                    self.explain(name, queryset)
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def create_dataset(self, rng: random.Random, orgs: int, categories: int, owners: int):
+        prefix = "explain-{}".format(timezone.now().strftime("%Y%m%d%H%M%S"))
+        categories = [OrganizationCategory.objects.create(name="{} {}".format(prefix, i)[:30])
+                      for i in range(categories)]
+        owners = [get_user_model().objects.create(username="{}-{}".format(prefix, i)) for i in range(owners)]
+
+        organizations = []
+        for i in range(orgs):
+            schedule = "".join(rng.choice([EMPTY_DAY, "09001700--------", "0800120013001800"])
+                               for _ in SCHEDULE_DAYS)
+            organizations.append(Organization(name="{} {}".format(prefix, i), category=rng.choice(categories),
+                                              owner=rng.choice(owners), phone_nr="0", order=rng.randint(0, 100),
+                                              is_member=rng.random() < 0.8, is_active=rng.random() < 0.9,
+                                              is_approved=rng.random() < 0.9, is_blocked=rng.random() < 0.05,
+                                              schedule=schedule))
+        Organization.objects.bulk_create(organizations)
+
+        # Give the planner statistics about the new rows
+        if connection.vendor in ("postgresql", "sqlite"):
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE organizations_organization")
+                cursor.execute("ANALYZE organizations_organizationcategory")
+        return categories, owners
+
+    def get_querysets(self, category: OrganizationCategory, owner):
+        day = get_clock().day
+        return [
+            ("is_active", Organization.objects.is_active()),
+            ("is_active_and_category", Organization.objects.is_active_and_category(category)),
+            ("for_listing", Organization.objects.for_listing(category)),
+            ("opened_today", Organization.objects.opened_today(category, day)),
+            ("sorted_by_name", Organization.objects.sorted_by_name()),
+            ("sorted_by_order", Organization.objects.sorted_by_order()),
+            ("sorted_by_name_for_owner", Organization.objects.sorted_by_name_for_owner(owner)),
+            ("has_active_organizations", OrganizationCategory.objects.has_active_organizations()),
+        ]
+
+    def explain(self, name: str, queryset):
+        if connection.vendor == "postgresql":
+            explain = "EXPLAIN ANALYZE "
+        elif connection.vendor == "sqlite":
+            explain = "EXPLAIN QUERY PLAN "
+        else:
+            explain = "EXPLAIN "
+
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(explain + sql, params)
+            rows = cursor.fetchall()
+
+        self.stdout.write(self.style.MIGRATE_HEADING(name))
+        for row in rows:
+            self.stdout.write("    " + " ".join(str(column) for column in row))
+        self.stdout.write("")
@@ -0,0 +1,39 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from oz_m_de.common.queries import QueryCounter
+from oz_m_de.organizations.transfer import FORMATS, export_rows, write_rows
+
+
+class Command(BaseCommand):
+    help = "Export all organizations with their category, owner, first address and opening hours"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", help="File to write, defaults to standard output")
+        parser.add_argument("--format", choices=FORMATS, default="csv",
+                            help="csv, or json for one JSON object per line")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        # Keep standard output clean for the exported rows
+        report = self.stdout if path else self.stderr
+        self.rows = 0
+
+        started = time.perf_counter()
+        with QueryCounter() as queries:
+            if path:
+                with open(path, "w", newline="", encoding="utf-8") as stream:
+                    write_rows(self.counted(export_rows()), stream, options["format"])
+            else:
+                write_rows(self.counted(export_rows()), sys.stdout, options["format"])
+        elapsed = time.perf_counter() - started
+
+        report.write(self.style.SUCCESS("Exported {} organizations in {:.2f}s ({:.0f} rows/s, {} queries)".format(
+            self.rows, elapsed, self.rows / elapsed if elapsed else 0, queries.count)))
+
+    def counted(self, rows):
+        for row in rows:
+            self.rows += 1
+            yield row
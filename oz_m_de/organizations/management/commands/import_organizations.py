@@ -0,0 +1,47 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from oz_m_de.common.queries import QueryCounter
+from oz_m_de.organizations.transfer import FORMATS, Importer, read_rows
+
+
+class Command(BaseCommand):
+    help = "Create or update organizations from a file made by export_organizations. " \
+           "Organizations are matched on category and name"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to read")
+        parser.add_argument("--format", choices=FORMATS, default="csv",
+                            help="csv, or json for one JSON object per line")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Number of rows written at once")
+        parser.add_argument("--owner", help="Username of the owner of rows without a known owner")
+
+    def handle(self, *args, **options):
+        default_owner = None
+        if options["owner"]:
+            try:
+                default_owner = get_user_model().objects.get(username=options["owner"])
+            except get_user_model().DoesNotExist:
+                raise CommandError("Unknown user {}".format(options["owner"]))
+
+        started = time.perf_counter()
+        with QueryCounter() as queries, open(options["path"], newline="", encoding="utf-8") as stream:
+            importer = Importer(batch_size=options["batch_size"], default_owner=default_owner,
+                                report=lambda message: self.stderr.write(message))
+            result = importer.run(self.counted(read_rows(stream, options["format"]), queries))
+        elapsed = time.perf_counter() - started
+
+        rows = result.created + result.updated + result.skipped
+        self.stdout.write(self.style.SUCCESS(
+            "Imported {} rows in {:.2f}s ({:.0f} rows/s, {} queries): {} created, {} updated, {} skipped".format(
+                rows, elapsed, rows / elapsed if elapsed else 0, queries.count, result.created, result.updated,
+                result.skipped)))
+
+    @staticmethod
+    def counted(rows, queries: QueryCounter):
+        for row in rows:
+            # Count the queries of the previous batch, so the log doesn't grow with the file
+            queries.flush()
+            yield row
@@ -0,0 +1,180 @@
+import functools
+import http.cookiejar
+import math
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+
+from oz_m_de.organizations.models import Organization, OrganizationCategory
+
+
+def percentile(values: list, percent: float) -> float:
+    """Get a percentile of values with the nearest-rank method
+
+    :param values: Sorted values
+    :param percent: Percentile, e.g. 95
+    """
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+class Command(BaseCommand):
+    help = "Request the home page, a category page, the list of organizations of an owner and the opening hours " \
+           "editor many times, and sign in with --password, and report the latency percentiles and the throughput " \
+           "of every step. " \
+           "Without --url the requests are handled in this process, fill the directory with seed_directory first."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", help="Base URL of a running site, e.g. http://localhost:8000, which uses the "
+                                          "same database, the requests are handled in this process without it")
+        parser.add_argument("--requests", type=int, default=200, help="Number of requests per step")
+        parser.add_argument("--concurrency", type=int, default=1, help="Number of requests at the same time")
+        parser.add_argument("--warmup", type=int, default=5, help="Number of requests per step that are not measured")
+        parser.add_argument("--owner", help="Username of the owner, defaults to the owner of most organizations")
+        parser.add_argument("--password", help="Password of the owner, adds a step that opens the sign in page and "
+                                               "signs in with it")
+
+    def handle(self, *args, **options):
+        owner = self.get_owner(options["owner"])
+        category = OrganizationCategory.objects.order_by("-active_organization_count", "pk").first()
+        organization = Organization.objects.filter(owner=owner).order_by("pk").first()
+        if category is None or organization is None:
+            raise CommandError("There are no organizations, add them with: manage.py seed_directory")
+
+        steps = [
+            ("home", functools.partial(self.fetch, reverse("home"), False)),
+            ("category", functools.partial(self.fetch, "{}?category={}".format(reverse("home"), category.pk), False)),
+            ("owner list", functools.partial(self.fetch, reverse("organizations:list"), True)),
+            ("opening hours editor", functools.partial(
+                self.fetch, reverse("organizations:opening-hours", kwargs={"pk": organization.pk}), True)),
+        ]
+        if options["password"]:
+            steps.append(("sign in", functools.partial(self.sign_in, owner.username, options["password"])))
+
+        # A session of the owner, which is shared with the site at --url through the database
+        client = Client()
+        client.force_login(owner)
+        self.session = client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.url = options["url"]
+        self.local = threading.local()
+
+        self.stdout.write("{:<22} {:>8} {:>7} {:>9} {:>9} {:>9} {:>9}".format(
+            "step", "requests", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms"))
+        for name, fetch in steps:
+            for _ in range(options["warmup"]):
+                fetch()
+
+            latencies, errors, elapsed = self.run_step(fetch, options["requests"], options["concurrency"])
+            self.stdout.write("{:<22} {:>8} {:>7} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f}".format(
+                name, len(latencies), errors, len(latencies) / elapsed if elapsed else 0,
+                percentile(latencies, 50), percentile(latencies, 95), percentile(latencies, 99)))
+
+    def get_owner(self, username: str):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError("There is no user {!r}".format(username))
+        owner = User.objects.annotate(organization_count=Count("organizations")) \
+            .order_by("-organization_count", "pk").first()
+        if owner is None:
+            raise CommandError("There are no users, add them with: manage.py seed_directory")
+        return owner
+
+    def run_step(self, fetch, requests: int, concurrency: int) -> tuple:
+        """Send the requests, spread over the threads
+
+        :param fetch: Function that sends a request and returns the status code
+
+        :return: Tuple of the sorted latencies in milliseconds, the number of errors and the seconds it took
+        """
+        latencies, errors = [], []
+
+        def work(count):
+            try:
+                for _ in range(count):
+                    started = time.perf_counter()
+                    status = fetch()
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    if status >= 400:
+                        errors.append(status)
+            finally:
+                if threading.current_thread() is not threading.main_thread():
+                    connection.close()
+
+        counts = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+        started = time.perf_counter()
+        if concurrency == 1:
+            work(requests)
+        else:
+            threads = [threading.Thread(target=work, args=(count,)) for count in counts]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return sorted(latencies), len(errors), time.perf_counter() - started
+
+    def fetch(self, path: str, signed_in: bool) -> int:
+        """Request a page, as the owner or anonymously
+
+        :return: Status code
+        """
+        if self.url:
+            headers = {"Cookie": "{}={}".format(settings.SESSION_COOKIE_NAME, self.session)} if signed_in else {}
+            try:
+                with urllib.request.urlopen(urllib.request.Request(self.url.rstrip("/") + path, headers=headers)) \
+                        as response:
+                    response.read()
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+
+        # Every thread needs its own test clients
+        if not hasattr(self.local, "clients"):
+            self.local.clients = {False: Client(), True: Client()}
+            self.local.clients[True].cookies[settings.SESSION_COOKIE_NAME] = self.session
+        return self.local.clients[signed_in].get(path).status_code
+
+    def sign_in(self, username: str, password: str) -> int:
+        """Open the sign in page and post the credentials of the owner, with a new session every time
+
+        :return: Status code, 401 if the owner wasn't signed in
+        """
+        path = reverse("account_login")
+        credentials = {"login": username, "password": password}
+        if self.url:
+            url = self.url.rstrip("/") + path
+            cookies = http.cookiejar.CookieJar()
+            opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(cookies))
+            try:
+                with opener.open(url) as response:
+                    response.read()
+                credentials["csrfmiddlewaretoken"] = next(
+                    (cookie.value for cookie in cookies if cookie.name == settings.CSRF_COOKIE_NAME), "")
+                # The redirect after signing in is followed
+                with opener.open(urllib.request.Request(url, data=urllib.parse.urlencode(credentials).encode(),
+                                                        headers={"Referer": url})) as response:
+                    response.read()
+                    return 401 if urllib.parse.urlparse(response.geturl()).path == path else response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+
+        client = Client()
+        status = client.get(path).status_code
+        if status >= 400:
+            return status
+        response = client.post(path, credentials)
+        # The form is shown again when signing in failed
+        return 401 if response.status_code == 200 else response.status_code
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from oz_m_de.common.fragments import bump_versions
+from oz_m_de.organizations.models import OrganizationCategory
+
+
+class Command(BaseCommand):
+    help = "Recompute the number of active and opened today organizations of every category"
+
+    def handle(self, *args, **options):
+        changed = OrganizationCategory.objects.update_counts()
+        if changed:
+            # The list of categories shows the counts
+            bump_versions(None)
+        self.stdout.write(self.style.SUCCESS("Updated the counts of {} categories".format(changed)))
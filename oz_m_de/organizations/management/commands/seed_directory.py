@@ -0,0 +1,120 @@
+import datetime
+import random
+import time
+
+from allauth.account.models import EmailAddress
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from oz_m_de.organizations.models import Address, DayOpeningHours, Organization, OrganizationCategory
+from oz_m_de.organizations.opening_hours import create_opening_hours
+from oz_m_de.organizations.schedule import SCHEDULE_DAYS, pack_schedule
+from oz_m_de.organizations.signals import organizations_bulk_updated
+from oz_m_de.organizations.summaries import build_summaries
+
+
+class Command(BaseCommand):
+    help = "Add synthetic organizations with addresses and opening hours to the directory, with bulk inserts. " \
+           "The same seed gives the same organizations."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orgs", type=int, default=1000, help="Number of organizations to add")
+        parser.add_argument("--categories", type=int, default=10, help="Number of categories to spread them over")
+        parser.add_argument("--owners", type=int, default=100, help="Number of owners to spread them over")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Number of organizations per batch")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--password", help="Password of the owners, which lets them sign in with a verified email "
+                                               "address. Without it they have no password")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        # Continue the names after the organizations that are already there
+        self.sequence = Organization.objects.count()
+
+        started = time.perf_counter()
+        categories = [OrganizationCategory.objects.get_or_create(name="Category {}".format(i))[0]
+                      for i in range(options["categories"])]
+        owners = self.get_owners(options["owners"], options["password"])
+
+        created, category_ids = 0, set()
+        while created < options["orgs"]:
+            size = min(options["batch_size"], options["orgs"] - created)
+            with transaction.atomic():
+                organizations = self.create_batch(rng, size, categories, owners)
+            category_ids.update(organization.category_id for organization in organizations)
+            created += size
+
+        organizations_bulk_updated.send(sender=Organization, category_ids=category_ids)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS("Added {} organizations in {:.2f}s ({:.0f} organizations/s)".format(
+            created, elapsed, created / elapsed if elapsed else 0)))
+
+    def get_owners(self, count: int, password: str = None) -> list:
+        usernames = ["owner-{}".format(i) for i in range(count)]
+        User = get_user_model()
+        existing = set(User.objects.filter(username__in=usernames).values_list("username", flat=True))
+        # Without a password, the load test signs them in without one
+        User.objects.bulk_create([User(username=username, email="{}@example.com".format(username),
+                                       password=make_password(None))
+                                  for username in usernames if username not in existing])
+        owners = User.objects.filter(username__in=usernames)
+        if password:
+            # Hashing is slow on purpose, all owners share the hash
+            owners.update(password=make_password(password))
+            verified = set(EmailAddress.objects.filter(user__in=owners).values_list("user_id", flat=True))
+            EmailAddress.objects.bulk_create([EmailAddress(user=owner, email=owner.email, verified=True, primary=True)
+                                              for owner in owners if owner.pk not in verified])
+        return list(owners)
+
+    def create_batch(self, rng: random.Random, size: int, categories: list, owners: list) -> list:
+        organizations, opening_hours = [], []
+        for _ in range(size):
+            organization = self.build_organization(rng, categories, owners)
+            for day in SCHEDULE_DAYS:
+                if day == "today" and not organization.update_opening_hours_daily or rng.random() < 0.2:
+                    continue
+                hours = self.build_opening_hours(rng)
+                opening_hours.append(hours)
+                setattr(organization, day, hours)
+            organizations.append(organization)
+
+        create_opening_hours(opening_hours)
+        for organization in organizations:
+            # Set the primary keys the opening hours got
+            for day in SCHEDULE_DAYS:
+                setattr(organization, day, getattr(organization, day))
+            organization.schedule = pack_schedule(organization)
+            organization.summaries = build_summaries(organization.schedule)
+        Organization.objects.bulk_create(organizations)
+
+        if any(organization.pk is None for organization in organizations):
+            # Only PostgreSQL sets the primary keys of bulk inserted rows, the names are unique
+            pks = dict(Organization.objects.filter(name__in=[organization.name for organization in organizations])
+                       .values_list("name", "pk"))
+            for organization in organizations:
+                organization.pk = pks[organization.name]
+        Address.objects.bulk_create([Address(address="Kurfürstenstraße {}".format(rng.randint(1, 200)),
+                                             postal_code="54531", city="Manderscheid", country="DE",
+                                             organization=organization)
+                                     for organization in organizations])
+        return organizations
+
+    def build_organization(self, rng: random.Random, categories: list, owners: list) -> Organization:
+        name = "Organization {}".format(self.sequence)
+        self.sequence += 1
+        return Organization(name=name, category=rng.choice(categories), owner=rng.choice(owners),
+                            phone_nr="0{:09d}".format(self.sequence), order=rng.randint(0, 100),
+                            website="https://www.example.com/{}".format(name.lower().replace(" ", "-")),
+                            description="{} in the Vulkaneifel".format(name), is_approved=True,
+                            is_member=rng.random() < 0.8, update_opening_hours_daily=rng.random() < 0.05)
+
+    def build_opening_hours(self, rng: random.Random) -> DayOpeningHours:
+        """Opened four hours from between 6 and 10 o'clock, and four more hours after a break on some days"""
+        opening_hours = DayOpeningHours(open_first=datetime.time(rng.randint(6, 10)))
+        opening_hours.close_first = datetime.time(opening_hours.open_first.hour + 4)
+        if rng.random() < 0.3:
+            opening_hours.open_second = datetime.time(opening_hours.close_first.hour + 1)
+            opening_hours.close_second = datetime.time(opening_hours.open_second.hour + 4)
+        return opening_hours
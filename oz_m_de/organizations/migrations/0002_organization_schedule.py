@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+# A frozen copy of the packing in oz_m_de.organizations.schedule, so changes there don't change this migration
+SCHEDULE_DAYS = ("today", "mon", "tue", "wed", "thu", "fri", "sat", "sun")
+TIME_FIELDS = ("open_first", "close_first", "open_second", "close_second")
+EMPTY_TIME = "----"
+EMPTY_SCHEDULE = EMPTY_TIME * len(TIME_FIELDS) * len(SCHEDULE_DAYS)
+
+
+def pack_day(opening_hours) -> str:
+    if opening_hours is None:
+        return EMPTY_TIME * len(TIME_FIELDS)
+    return "".join(getattr(opening_hours, field).strftime("%H%M") if getattr(opening_hours, field) else EMPTY_TIME
+                   for field in TIME_FIELDS)
+
+
+def pack_schedule(organization) -> str:
+    return "".join(pack_day(getattr(organization, day)) for day in SCHEDULE_DAYS)
+
+
+def pack_schedules(apps, schema_editor):
+    """Pack the opening hours of all existing organizations, in batches ordered by primary key"""
+    Organization = apps.get_model("organizations", "Organization")
+    organizations = Organization.objects.select_related(*SCHEDULE_DAYS).order_by("pk")
+
+    last_pk = 0
+    while True:
+        batch = list(organizations.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        for organization in batch:
+            schedule = pack_schedule(organization)
+            if schedule != EMPTY_SCHEDULE:
+                Organization.objects.filter(pk=organization.pk).update(schedule=schedule)
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organization',
+            name='schedule',
+            field=models.CharField(default='-' * 128, editable=False, max_length=128, verbose_name='Schedule'),
+        ),
+        migrations.RunPython(pack_schedules, migrations.RunPython.noop),
+    ]
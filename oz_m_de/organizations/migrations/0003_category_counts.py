@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# A frozen copy of the layout of the packed schedule in oz_m_de.organizations.schedule, so changes there don't
+# change this migration: 16 characters per day, starting with open_first
+SCHEDULE_DAYS = ("today", "mon", "tue", "wed", "thu", "fri", "sat", "sun")
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+DAY_WIDTH = 16
+EMPTY_TIME = "----"
+
+
+def is_open(schedule: str, day: str) -> bool:
+    offset = SCHEDULE_DAYS.index(day) * DAY_WIDTH
+    open_first = schedule[offset:offset + len(EMPTY_TIME)]
+    return bool(open_first) and open_first != EMPTY_TIME
+
+
+def count_organizations(apps, schema_editor):
+    """Fill the counts of all categories, reconcile_category_counts does the same for existing databases"""
+    Organization = apps.get_model("organizations", "Organization")
+    OrganizationCategory = apps.get_model("organizations", "OrganizationCategory")
+    # The local day, independent of the locale
+    day = WEEKDAYS[timezone.localtime(timezone.now()).weekday()]
+
+    active_counts, open_today_counts = Counter(), Counter()
+    organizations = Organization.objects.filter(is_active=True, is_blocked=False, is_approved=True) \
+        .values_list("category_id", "schedule", "update_opening_hours_daily")
+    for category_id, schedule, update_opening_hours_daily in organizations.iterator():
+        active_counts[category_id] += 1
+        if is_open(schedule, "today" if update_opening_hours_daily else day):
+            open_today_counts[category_id] += 1
+
+    for category_id, count in active_counts.items():
+        OrganizationCategory.objects.filter(pk=category_id).update(active_organization_count=count,
+                                                                   open_today_count=open_today_counts[category_id])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0002_organization_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organizationcategory',
+            name='active_organization_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Active organizations'),
+        ),
+        migrations.AddField(
+            model_name='organizationcategory',
+            name='open_today_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Organizations opened today'),
+        ),
+        migrations.RunPython(count_organizations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# Only the organizations that are shown on the website, see OrganizationQuerySet.is_active.
+# Other databases get a full index: SQLite can't match a partial index against bound parameters,
+# and MySQL has no partial indexes.
+ACTIVE_PREDICATES = {
+    "postgresql": " WHERE is_active AND NOT is_blocked AND is_approved",
+}
+
+
+def create_indexes(apps, schema_editor):
+    predicate = ACTIVE_PREDICATES.get(schema_editor.connection.vendor, "")
+    schema_editor.execute('CREATE INDEX organizations_organization_listing '
+                          'ON organizations_organization (category_id, is_member DESC, "order", name)' + predicate)
+    schema_editor.execute('CREATE INDEX organizations_organization_owner_name '
+                          'ON organizations_organization (owner_id, name)')
+
+
+def drop_indexes(apps, schema_editor):
+    schema_editor.execute('DROP INDEX organizations_organization_listing')
+    schema_editor.execute('DROP INDEX organizations_organization_owner_name')
+
+
+class Migration(migrations.Migration):
+    """Indexes for the public listing of a category and the list of organizations of an owner"""
+
+    dependencies = [
+        ('organizations', '0003_category_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Pre-rendered opening hours, fill them with the build_opening_hours_summaries command"""
+
+    dependencies = [
+        ('organizations', '0004_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organization',
+            name='summaries',
+            field=models.TextField(default='', editable=False, verbose_name='Opening hours summaries'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    schema_editor.execute('CREATE INDEX organizations_organization_order_name '
+                          'ON organizations_organization ("order", name, id)')
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute('DROP INDEX organizations_organization_order_name')
+
+
+class Migration(migrations.Migration):
+    """Index for the pages of the list of all organizations, which are ordered by order, name and id"""
+
+    dependencies = [
+        ('organizations', '0005_organization_summaries'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
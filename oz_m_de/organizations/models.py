@@ -1,11 +1,19 @@
 import operator
+from collections import defaultdict
 
 from django.contrib.auth.models import User
-from django.db import models
-from django.db.models import QuerySet
-from django.utils import timezone
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, QuerySet, Value, When
+from django.db.models.functions import Greatest, Substr
 from django.utils.translation import ugettext as _
 
+from oz_m_de.common.clock import get_clock
+from .schedule import DayHours, EMPTY_SCHEDULE, EMPTY_TIME, SCHEDULE_LENGTH, TIME_WIDTH, day_offset, unpack_day
+from .summaries import decode_summaries, get_summary, render_day
+
+# Columns of the list of organizations of owners and admins
+MANAGEMENT_FIELDS = ("name", "order", "rooms_available", "category__name", "category__rooms_available_applies")
+
 COUNTRIES = (("NL", _("Netherlands")),
              ("DE", _("Germany")),
              ("BE", _("Belgium")))
@@ -30,17 +38,74 @@ class OrganizationCategoryQuerySet(models.QuerySet):
 
         :return: Queryset containing Categories
         """
-        categories = self.filter(organizations__is_active=True,
-                                 organizations__is_blocked=False,
-                                 organizations__is_approved=True).distinct()
+        categories = self.filter(active_organization_count__gt=0)
         categories = categories.order_by("name")
         return categories
 
+    def update_counts(self, day: str = None) -> int:
+        """Recompute active_organization_count and open_today_count of the categories in the queryset.
+        Changes of single organizations are counted with add_to_counts, this is for the daily recount and
+        for repairs
+
+        :param day: 3 letter day string in lowercase, defaults to the current day
+        :return: Number of categories of which the counts changed
+        """
+        with transaction.atomic():
+            # Locking the categories makes concurrent recounts wait for each other,
+            # so the last one sees the changes of all others
+            categories = list(self.select_for_update().values_list("pk", "active_organization_count",
+                                                                   "open_today_count"))
+            category_ids = [pk for pk, _, _ in categories]
+
+            active = Organization.objects.is_active().filter(category__in=category_ids)
+            active_counts = dict(active.order_by().values_list("category").annotate(Count("pk")))
+            open_today = Organization.objects.opened_today(day=day).filter(category__in=category_ids)
+            open_today_counts = dict(open_today.order_by().values_list("category").annotate(Count("pk")))
+
+            changed = 0
+            for pk, active_organization_count, open_today_count in categories:
+                counts = (active_counts.get(pk, 0), open_today_counts.get(pk, 0))
+                if counts != (active_organization_count, open_today_count):
+                    self.model.objects.filter(pk=pk).update(active_organization_count=counts[0],
+                                                            open_today_count=counts[1])
+                    changed += 1
+        return changed
+
+    def add_to_counts(self, previous: tuple, current: tuple) -> int:
+        """Move a single organization in the counts, from its previous to its current Organization.category_counts,
+        with ``UPDATE ... SET count = count + 1``. Only the categories of which a count changes are updated.
+
+        :param previous: category_counts before the organization changed, None for a new organization
+        :param current: category_counts after the organization changed, None for a deleted organization
+        :return: Number of categories of which the counts changed
+        """
+        deltas = defaultdict(lambda: {"active_organization_count": 0, "open_today_count": 0})
+        for counts, sign in ((previous, -1), (current, 1)):
+            if counts is not None and counts[0] is not None:
+                category_id, active, open_today = counts
+                deltas[category_id]["active_organization_count"] += sign * active
+                deltas[category_id]["open_today_count"] += sign * open_today
+
+        changed = 0
+        for category_id, fields in deltas.items():
+            # Counts that drifted, e.g. around midnight before the daily recount, never go below zero
+            values = {field: Greatest(F(field) + delta, 0, output_field=models.PositiveIntegerField())
+                      for field, delta in fields.items() if delta}
+            if values:
+                changed += self.filter(pk=category_id).update(**values)
+        return changed
+
 
 class OrganizationCategoryManager(models.Manager):
     def has_active_organizations(self) -> QuerySet:
         return self.get_queryset().has_active_organizations()
 
+    def add_to_counts(self, previous: tuple, current: tuple) -> int:
+        return self.get_queryset().add_to_counts(previous, current)
+
+    def update_counts(self, day: str = None) -> int:
+        return self.get_queryset().update_counts(day)
+
     def get_queryset(self) -> OrganizationCategoryQuerySet:
         return OrganizationCategoryQuerySet(self.model)
 
@@ -57,9 +122,23 @@ class OrganizationCategory(models.Model):
                                                   help_text=_(
                                                       "Does rooms available apply to this organization category?"))
 
+    # Counts of the organizations in this category, kept up to date by the signals in organizations.signals
+    # and the reconcile_category_counts command
+    active_organization_count = models.PositiveIntegerField(default=0, editable=False,
+                                                            verbose_name=_("Active organizations"))
+    open_today_count = models.PositiveIntegerField(default=0, editable=False,
+                                                   verbose_name=_("Organizations opened today"))
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Don't overwrite the counts with the values that were loaded, they may have changed since
+        if self.pk and not kwargs.get("update_fields") and not kwargs.get("force_insert"):
+            kwargs["update_fields"] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.editable]
+        super(OrganizationCategory, self).save(*args, **kwargs)
+
 
 class DayOpeningHours(models.Model):
     open_first = models.TimeField(blank=True, null=True)
@@ -78,20 +157,51 @@ class OrganizationQuerySet(models.QuerySet):
     def is_active_and_category(self, category: OrganizationCategory) -> QuerySet:
         return self.is_active().filter(category=category).order_by("-is_member", "order", "name")
 
-    def opened_today(self, category: OrganizationCategory = None) -> list:
+    def for_listing(self, category: OrganizationCategory) -> QuerySet:
+        """Get the active organizations of a category, ready to be shown in a listing.
+        The addresses are fetched along with the organizations and the opening hours are read from
+        the packed schedule, so the number of queries does not grow with the number of organizations.
+
+        :param category: category object
+        :return: Queryset of organizations of the specified category
+        """
+        return self.is_active_and_category(category).prefetch_related("addresses")
+
+    def with_open_today(self, day: str) -> QuerySet:
+        """Annotate the organizations with ``is_open_today``, which is computed by the database.
+        Organizations that update their opening hours daily are open when today's opening hours have a value
+        in open_first, all others when the opening hours of the given day have a value in open_first.
+        Both are read from the packed schedule, so no joins are needed.
+
+        :param day: 3 letter day string in lowercase, e.g. "mon"
+        :return: Queryset of organizations annotated with is_open_today
+        """
+        # Substr is 1-based
+        todays_open_first = Case(When(update_opening_hours_daily=True,
+                                      then=Substr("schedule", day_offset("today") + 1, TIME_WIDTH)),
+                                 default=Substr("schedule", day_offset(day) + 1, TIME_WIDTH),
+                                 output_field=models.CharField())
+        return self.annotate(todays_open_first=todays_open_first) \
+            .annotate(is_open_today=Case(When(~Q(todays_open_first=EMPTY_TIME), then=Value(True)),
+                                         default=Value(False),
+                                         output_field=models.BooleanField()))
+
+    def opened_today(self, category: OrganizationCategory = None, day: str = None) -> QuerySet:
         """Get a queryset containing all organizations of a certain category that are opened today
 
         :param category: category object
+        :param day: 3 letter day string in lowercase, defaults to the current day
         :return: Queryset of organizations of the specified category that are opened today
         """
+        if day is None:
+            day = get_clock().day
+
         if category:
             organizations = self.is_active_and_category(category)
         else:
             organizations = self.is_active()
 
-        if organizations:
-            return [o for o in organizations if o.open_today]
-        return []
+        return organizations.with_open_today(day).filter(is_open_today=True)
 
     def sorted_by_name(self) -> QuerySet:
         """
@@ -99,6 +209,14 @@ class OrganizationQuerySet(models.QuerySet):
         """
         return self.order_by("name")
 
+    def for_management(self) -> QuerySet:
+        """Get the organizations with only the columns the list of organizations of owners and admins shows,
+        along with their category
+
+        :return: Queryset of organizations
+        """
+        return self.select_related("category").only(*MANAGEMENT_FIELDS)
+
     def sorted_by_order(self) -> QuerySet:
         """Sort all organizations by order, next by name
 
@@ -125,12 +243,21 @@ class OrganizationManager(models.Manager):
     def is_active_and_category(self, category: OrganizationCategory) -> QuerySet:
         return self.get_queryset().is_active_and_category(category)
 
-    def opened_today(self, branch=None):
-        return self.get_queryset().opened_today(branch)
+    def for_listing(self, category: OrganizationCategory) -> QuerySet:
+        return self.get_queryset().for_listing(category)
+
+    def with_open_today(self, day: str) -> QuerySet:
+        return self.get_queryset().with_open_today(day)
+
+    def opened_today(self, category: OrganizationCategory = None, day: str = None) -> QuerySet:
+        return self.get_queryset().opened_today(category, day)
 
     def sorted_by_name(self):
         return self.get_queryset().sorted_by_name()
 
+    def for_management(self) -> QuerySet:
+        return self.get_queryset().for_management()
+
     def sorted_by_name_for_owner(self, owner: User):
         return self.get_queryset().sorted_by_name_for_owner(owner)
 
@@ -177,6 +304,12 @@ class Organization(models.Model):
     sun = models.OneToOneField(DayOpeningHours, blank=True, null=True,
                                verbose_name=_("Sunday"), related_name="organization_sun")
 
+    # Packed copy of the opening hours above, kept up to date by the signals in organizations.signals
+    schedule = models.CharField(max_length=SCHEDULE_LENGTH, default=EMPTY_SCHEDULE, editable=False,
+                                verbose_name=_("Schedule"))
+    # The opening hours of every day rendered in every language, see organizations.summaries
+    summaries = models.TextField(default="", editable=False, verbose_name=_("Opening hours summaries"))
+
     is_active = models.BooleanField(default=True, verbose_name=_("Active"),
                                     help_text=_("Show the organization on the website"))
     is_approved = models.BooleanField(default=False, verbose_name=_("Approved"),
@@ -195,23 +328,55 @@ class Organization(models.Model):
     @property
     def open_today(self) -> bool:
         """Check if the organization is open today, based on the value in open_first"""
-        # Get the 3 letter day string in lowercase
-        now = timezone.now().strftime("%a").lower()
+        opening_hours = self.todays_opening_hours
+        return True if opening_hours and opening_hours.open_first else False
 
-        try:
-            # If the organization has to enter the opening hours every day manually
-            if self.update_opening_hours_daily:
-                return True if self.today.open_first else False
-            return True if getattr(self, now).open_first else False
-        except AttributeError:
-            return False
+    @property
+    def category_counts(self) -> tuple:
+        """How the organization counts in the counts of its category
+
+        :return: Tuple of the category id and whether it counts as active and as opened today, as 0 or 1
+        """
+        active = self.is_active and not self.is_blocked and self.is_approved
+        return self.category_id, int(active), int(active and self.open_today)
 
     @property
-    def todays_opening_hours(self) -> DayOpeningHours:
-        # Get the 3 letter day string in lowercase
-        now = timezone.now().strftime("%a").lower()
+    def todays_opening_hours(self) -> DayHours:
+        return self.get_opening_hours(self.todays_day)
 
-        if self.update_opening_hours_daily:
-            return self.today
-        else:
-            return getattr(self, now)
+    @property
+    def todays_day(self) -> str:
+        return "today" if self.update_opening_hours_daily else get_clock().day
+
+    @property
+    def todays_opening_hours_summary(self) -> str:
+        """Get today's opening hours rendered in the active language"""
+        return self.get_opening_hours_summary(self.todays_day)
+
+    @property
+    def decoded_summaries(self) -> dict:
+        """The summaries, decoded once and kept on the object until they change"""
+        decoded = getattr(self, "_decoded_summaries", None)
+        if decoded is None or decoded[0] is not self.summaries:
+            decoded = self._decoded_summaries = (self.summaries, decode_summaries(self.summaries))
+        return decoded[1]
+
+    def get_opening_hours_summary(self, day: str) -> str:
+        """Get the opening hours of a day rendered in the active language, as stored when the schedule was saved.
+        They are rendered on the fly when the summaries of the organization have not been built yet.
+
+        :param day: "today" or a 3 letter day string in lowercase, e.g. "mon"
+        :return: HTML
+        """
+        summary = get_summary(self.decoded_summaries, day)
+        if summary is None:
+            summary = render_day(self.get_opening_hours(day))
+        return summary
+
+    def get_opening_hours(self, day: str) -> DayHours:
+        """Get the opening hours of a day from the packed schedule, without querying the database
+
+        :param day: "today" or a 3 letter day string in lowercase, e.g. "mon"
+        :return: DayHours, or None if no opening hours have been entered for the day
+        """
+        return unpack_day(self.schedule, day)
@@ -0,0 +1,153 @@
+"""Set-based writes of opening hours.
+
+Saving opening hours one row at a time costs a query per row, plus the queries of the signals of every row.
+These helpers write many rows in a few statements instead. Bulk writes don't send the signals of the rows
+they write, so save the organizations the opening hours belong to afterwards, which repacks their schedules
+and invalidates the caches.
+"""
+from django.db import connection, transaction
+from django.db.models import Case, QuerySet, Value, When
+
+from .models import DayOpeningHours, Organization
+from .schedule import TIME_FIELDS, day_offset, pack_day
+from .signals import organizations_bulk_updated
+from .summaries import build_summaries
+
+# Number of rows per UPDATE, which keeps the CASE expressions and the number of parameters reasonable
+UPDATE_BATCH_SIZE = 500
+
+
+def create_opening_hours(objects: list) -> list:
+    """Insert new DayOpeningHours and set their primary keys.
+    Backends that don't return the primary keys of a bulk insert get one INSERT per row.
+
+    :param objects: Unsaved DayOpeningHours objects
+    :return: The same objects, with primary keys
+    """
+    if connection.features.can_return_ids_from_bulk_insert:
+        return DayOpeningHours.objects.bulk_create(objects)
+
+    for opening_hours in objects:
+        opening_hours.save(force_insert=True)
+    return objects
+
+
+def update_in_bulk(objects: list, fields: list) -> int:
+    """Write the values of some fields of saved objects of a single model, with one UPDATE per batch::
+
+        UPDATE ... SET field = CASE WHEN id IN (1, 3) THEN ... WHEN id = 2 THEN ... END WHERE id IN (1, 2, 3)
+
+    Rows with the same value share a WHEN, and a field that has the same value in all rows is set without CASE.
+
+    :param objects: Saved model instances
+    :param fields: Names of the fields to write
+    :return: Number of rows updated
+    """
+    if not objects or not fields:
+        return 0
+
+    model = type(objects[0])
+    updated = 0
+    for start in range(0, len(objects), UPDATE_BATCH_SIZE):
+        batch = objects[start:start + UPDATE_BATCH_SIZE]
+        values = {}
+        for name in fields:
+            field = model._meta.get_field(name)
+            values[field.attname] = case_by_pk(field, {obj.pk: getattr(obj, field.attname) for obj in batch})
+        updated += model.objects.filter(pk__in=[obj.pk for obj in batch]).update(**values)
+    return updated
+
+
+def case_by_pk(field, values: dict):
+    """Build an expression that has a value per primary key
+
+    :param field: Model field the values are for
+    :param values: Dict of primary key -> value
+    :return: Value or Case
+    """
+    pks_by_value = {}
+    for pk, value in values.items():
+        pks_by_value.setdefault(value, []).append(pk)
+
+    if len(pks_by_value) == 1:
+        return Value(next(iter(pks_by_value)), output_field=field)
+    return Case(*[When(pk__in=pks, then=Value(value, output_field=field)) for value, pks in pks_by_value.items()],
+                output_field=field)
+
+
+def set_in_bulk(model, field: str, values: dict) -> int:
+    """Set a single field to a different value per row, with one UPDATE per batch
+
+    :param model: Model class
+    :param field: Name of the field to write
+    :param values: Dict of primary key -> value
+    :return: Number of rows updated
+    """
+    output_field = model._meta.get_field(field)
+    pks = list(values)
+    updated = 0
+    for start in range(0, len(pks), UPDATE_BATCH_SIZE):
+        batch = pks[start:start + UPDATE_BATCH_SIZE]
+        value = case_by_pk(output_field, {pk: values[pk] for pk in batch})
+        updated += model.objects.filter(pk__in=batch).update(**{output_field.attname: value})
+    return updated
+
+
+def set_schedules(schedules: dict) -> int:
+    """Write the packed schedules of organizations along with their summaries, with one UPDATE per batch
+
+    :param schedules: Dict of primary key -> packed schedule
+    :return: Number of rows updated
+    """
+    schedule_field = Organization._meta.get_field("schedule")
+    summaries_field = Organization._meta.get_field("summaries")
+    pks = list(schedules)
+    updated = 0
+    for start in range(0, len(pks), UPDATE_BATCH_SIZE):
+        batch = {pk: schedules[pk] for pk in pks[start:start + UPDATE_BATCH_SIZE]}
+        updated += Organization.objects.filter(pk__in=list(batch)).update(
+            schedule=case_by_pk(schedule_field, batch),
+            summaries=case_by_pk(summaries_field, {pk: build_summaries(schedule) for pk, schedule in batch.items()}))
+    return updated
+
+
+def apply_opening_hours(organizations: QuerySet, opening_hours: dict) -> int:
+    """Give many organizations the same opening hours on some days, in a single transaction.
+    Per day, the existing opening hours of all organizations are changed with one UPDATE, the missing ones are
+    inserted and linked, and the packed schedules of the organizations are rewritten with one UPDATE.
+
+    :param organizations: Queryset of the organizations to change
+    :param opening_hours: Dict of day -> DayHours, or None to clear the opening hours of the day
+    :return: Number of rows changed
+    """
+    days = list(opening_hours)
+    changed = 0
+    with transaction.atomic():
+        rows = list(organizations.select_for_update().order_by("pk")
+                    .values_list("pk", "category_id", "schedule", *["{}_id".format(day) for day in days]))
+        if not rows:
+            return 0
+
+        schedules = {pk: schedule for pk, _, schedule, *_ in rows}
+        for index, day in enumerate(days):
+            hours = opening_hours[day]
+            values = {field: getattr(hours, field) if hours else None for field in TIME_FIELDS}
+
+            existing = [row[3 + index] for row in rows if row[3 + index] is not None]
+            changed += DayOpeningHours.objects.filter(pk__in=existing).update(**values)
+
+            missing = [row[0] for row in rows if row[3 + index] is None]
+            if hours and missing:
+                created = create_opening_hours([DayOpeningHours(**values) for _ in missing])
+                changed += len(created)
+                changed += set_in_bulk(Organization, day, {pk: obj.pk for pk, obj in zip(missing, created)})
+
+            offset = day_offset(day)
+            packed = pack_day(hours)
+            for pk, schedule in schedules.items():
+                schedules[pk] = schedule[:offset] + packed + schedule[offset + len(packed):]
+
+        changed += set_schedules({pk: schedules[pk] for pk, _, schedule, *_ in rows if schedules[pk] != schedule})
+
+        organizations_bulk_updated.send(sender=Organization, category_ids={row[1] for row in rows})
+    return changed
@@ -0,0 +1,137 @@
+"""Compact storage of the weekly opening hours of an organization.
+
+The opening hours of ``today`` and of every day of the week are packed into a single fixed-width string,
+which is stored on the organization row. Every day takes up 16 characters, four characters for every time
+in the order open_first, close_first, open_second, close_second. A time is stored as "HHMM",
+a time without a value as "----".
+
+Example of a day that is opened from 09:00 to 12:00 and from 13:00 to 17:00::
+
+    "0900120013001700"
+"""
+import datetime
+from collections import namedtuple
+
+SCHEDULE_DAYS = ("today", "mon", "tue", "wed", "thu", "fri", "sat", "sun")
+TIME_FIELDS = ("open_first", "close_first", "open_second", "close_second")
+
+TIME_FORMAT = "%H%M"
+TIME_WIDTH = 4
+DAY_WIDTH = TIME_WIDTH * len(TIME_FIELDS)
+SCHEDULE_LENGTH = DAY_WIDTH * len(SCHEDULE_DAYS)
+
+EMPTY_TIME = "-" * TIME_WIDTH
+EMPTY_DAY = EMPTY_TIME * len(TIME_FIELDS)
+EMPTY_SCHEDULE = EMPTY_DAY * len(SCHEDULE_DAYS)
+
+
+class DayHours(namedtuple("DayHours", TIME_FIELDS)):
+    """Opening hours of a single day, read from a packed schedule.
+    It has the same attributes as DayOpeningHours, so it can be used in its place when reading.
+    """
+    __slots__ = ()
+
+
+def day_offset(day: str) -> int:
+    """Get the position of a day in a packed schedule
+
+    :param day: "today" or a 3 letter day string in lowercase, e.g. "mon"
+    :return: Zero based offset of the first character of the day
+    """
+    return SCHEDULE_DAYS.index(day) * DAY_WIDTH
+
+
+def pack_time(value: datetime.time) -> str:
+    return value.strftime(TIME_FORMAT) if value else EMPTY_TIME
+
+
+def unpack_time(value: str) -> datetime.time:
+    if value == EMPTY_TIME:
+        return None
+    return datetime.time(int(value[:2]), int(value[2:]))
+
+
+def pack_day(opening_hours) -> str:
+    """Pack the opening hours of a single day
+
+    :param opening_hours: DayOpeningHours, DayHours or None
+    :return: String of DAY_WIDTH characters
+    """
+    if opening_hours is None:
+        return EMPTY_DAY
+    return "".join(pack_time(getattr(opening_hours, field)) for field in TIME_FIELDS)
+
+
+def pack_schedule(organization) -> str:
+    """Pack the opening hours of all days of an organization.
+    Days that have not been fetched along with the organization are fetched from the database.
+
+    :param organization: Organization object
+    :return: String of SCHEDULE_LENGTH characters
+    """
+    return "".join(pack_day(getattr(organization, day)) for day in SCHEDULE_DAYS)
+
+
+def replace_day(schedule: str, day: str, opening_hours) -> str:
+    """Replace the opening hours of a single day in a packed schedule
+
+    :param schedule: Packed schedule
+    :param day: "today" or a 3 letter day string in lowercase, e.g. "mon"
+    :param opening_hours: DayOpeningHours, DayHours or None
+    :return: New packed schedule
+    """
+    offset = day_offset(day)
+    return schedule[:offset] + pack_day(opening_hours) + schedule[offset + DAY_WIDTH:]
+
+
+def unpack_day(schedule: str, day: str) -> DayHours:
+    """Read the opening hours of a single day from a packed schedule
+
+    :param schedule: Packed schedule
+    :param day: "today" or a 3 letter day string in lowercase, e.g. "mon"
+    :return: DayHours, or None if no opening hours have been entered for the day
+    """
+    offset = day_offset(day)
+    packed = schedule[offset:offset + DAY_WIDTH]
+    if not packed or packed == EMPTY_DAY:
+        return None
+    return DayHours(*(unpack_time(packed[i:i + TIME_WIDTH]) for i in range(0, DAY_WIDTH, TIME_WIDTH)))
+
+
+def format_day(opening_hours) -> str:
+    """Format the opening hours of a single day for people, e.g. "09:00-12:00,13:00-17:00"
+
+    :param opening_hours: DayOpeningHours, DayHours or None
+    :return: String, empty if the day has no opening hours
+    """
+    if opening_hours is None:
+        return ""
+    periods = []
+    for opens, closes in ((opening_hours.open_first, opening_hours.close_first),
+                          (opening_hours.open_second, opening_hours.close_second)):
+        if opens and closes:
+            periods.append("{:%H:%M}-{:%H:%M}".format(opens, closes))
+    return ",".join(periods)
+
+
+def parse_day(value: str) -> DayHours:
+    """Parse opening hours formatted by format_day
+
+    :param value: String like "09:00-12:00,13:00-17:00"
+    :raises ValueError: When the value is not formatted like format_day does
+    :return: DayHours, or None if the value is empty
+    """
+    value = (value or "").strip()
+    if not value:
+        return None
+
+    periods = value.split(",")
+    if len(periods) > 2:
+        raise ValueError("More than two periods: {}".format(value))
+
+    times = []
+    for period in periods:
+        opens, closes = period.split("-")
+        times.extend(datetime.datetime.strptime(time.strip(), "%H:%M").time() for time in (opens, closes))
+    times.extend([None] * (len(TIME_FIELDS) - len(times)))
+    return DayHours(*times)
@@ -0,0 +1,100 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .intervals import bump_version, opening_hours_index
+from .models import DayOpeningHours, Organization, OrganizationCategory
+from .schedule import SCHEDULE_DAYS, pack_schedule, replace_day
+from .summaries import build_summaries
+
+DAY_ID_FIELDS = tuple("{}_id".format(day) for day in SCHEDULE_DAYS)
+# Fields of the previous state of a saved organization
+PREVIOUS_FIELDS = ("category_id", "is_active", "is_blocked", "is_approved", "update_opening_hours_daily",
+                   "schedule", "summaries") + DAY_ID_FIELDS
+
+# Sent after organizations have been changed with set-based updates, which don't send post_save
+organizations_bulk_updated = Signal(providing_args=["category_ids"])
+
+
+@receiver(pre_save, sender=Organization)
+def remember_previous_state(sender, instance: Organization, **kwargs):
+    """Remember the category the organization was in, so that category can be updated as well, the opening
+    hours it linked to, its stored schedule and how it counted in the counts of its category
+    """
+    previous = Organization.objects.filter(pk=instance.pk).values(*PREVIOUS_FIELDS).first() if instance.pk else None
+    instance._previous_schedule = (previous["schedule"], previous["summaries"]) if previous else None
+    instance._previous_category_id = previous["category_id"] if previous else None
+    instance._previous_day_ids = {day: previous[field] for day, field in zip(SCHEDULE_DAYS, DAY_ID_FIELDS)} \
+        if previous else None
+    instance._previous_category_counts = Organization(**previous).category_counts if previous else None
+
+
+@receiver(pre_save, sender=Organization)
+def pack_organization_schedule(sender, instance: Organization, **kwargs):
+    """Repack the days of the schedule that link to other opening hours, and its summaries.
+    A full save starts from the stored schedule instead of the one of the instance, which is outdated when opening
+    hours changed after the organization was loaded; changed opening hours repack the stored schedule when they
+    are saved, see update_organization_schedule. A save with update_fields that include the schedule keeps the
+    schedule of the instance, which the caller packed itself.
+    """
+    previous_day_ids = instance._previous_day_ids
+    if previous_day_ids is not None and kwargs.get("update_fields") is None:
+        instance.schedule, instance.summaries = instance._previous_schedule
+
+    schedule = instance.schedule
+    for day, field in zip(SCHEDULE_DAYS, DAY_ID_FIELDS):
+        if previous_day_ids is None or previous_day_ids[day] != getattr(instance, field):
+            schedule = replace_day(schedule, day, getattr(instance, day))
+    if previous_day_ids is None or schedule != instance.schedule:
+        instance.schedule = schedule
+        instance.summaries = build_summaries(schedule)
+
+
+@receiver(post_save, sender=DayOpeningHours)
+def update_organization_schedule(sender, instance: DayOpeningHours, **kwargs):
+    """Repack the schedule of the organization the saved opening hours belong to"""
+    if kwargs.get("created"):
+        # New opening hours can't belong to an organization yet
+        return
+
+    lookup = Q()
+    for day in SCHEDULE_DAYS:
+        lookup |= Q(**{day: instance})
+
+    for organization in Organization.objects.select_related(*SCHEDULE_DAYS).filter(lookup):
+        previous_category_counts = organization.category_counts
+        organization.schedule = pack_schedule(organization)
+        organization.summaries = build_summaries(organization.schedule)
+        Organization.objects.filter(pk=organization.pk).update(schedule=organization.schedule,
+                                                               summaries=organization.summaries)
+        opening_hours_index.update(organization)
+        OrganizationCategory.objects.add_to_counts(previous_category_counts, organization.category_counts)
+
+
+@receiver(post_save, sender=Organization)
+def update_opening_hours_index(sender, instance: Organization, **kwargs):
+    opening_hours_index.update(instance)
+
+
+@receiver(post_delete, sender=Organization)
+def remove_from_opening_hours_index(sender, instance: Organization, **kwargs):
+    opening_hours_index.delete(instance)
+
+
+@receiver(post_save, sender=Organization)
+def update_category_counts(sender, instance: Organization, **kwargs):
+    OrganizationCategory.objects.add_to_counts(getattr(instance, "_previous_category_counts", None),
+                                               instance.category_counts)
+
+
+@receiver(post_delete, sender=Organization)
+def remove_from_category_counts(sender, instance: Organization, **kwargs):
+    OrganizationCategory.objects.add_to_counts(instance.category_counts, None)
+
+
+@receiver(organizations_bulk_updated)
+def bulk_update_category_counts(sender, category_ids, **kwargs):
+    # The changed organizations are not known, so other processes and this one rebuild their index
+    transaction.on_commit(bump_version)
+    OrganizationCategory.objects.filter(pk__in=category_ids).update_counts()
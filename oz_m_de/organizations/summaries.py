@@ -0,0 +1,82 @@
+"""Pre-rendered opening hours of an organization.
+
+The home page shows today's opening hours of every organization as HTML, like "09:00 to 17:00". Rendering them
+translates and formats four times per organization on every page view, so they are rendered once, whenever the
+packed schedule changes, for every day and every language in settings.OPENING_HOURS_LANGUAGES. They are stored
+on the organization row as JSON::
+
+    {"de-de": ["<today>", "<mon>", ..., "<sun>"]}
+
+Everything that writes the schedule writes the summaries as well. Rows written before the summaries existed are
+filled by the build_opening_hours_summaries command, until then the opening hours are rendered on the fly.
+"""
+import json
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils import translation
+from django.utils.translation import ugettext as _
+
+from .schedule import SCHEDULE_DAYS, unpack_day
+
+
+def render_day(opening_hours) -> str:
+    """Render the opening hours of a single day in the active language
+
+    :param opening_hours: DayOpeningHours, DayHours or None
+    :return: HTML
+    """
+    if opening_hours is None or not opening_hours.open_first or not opening_hours.close_first:
+        return _("<div class=\"homepage-opened-today\">Closed today</div>")
+
+    period = _("<div class=\"homepage-opened-today\">{} to {}</div>")
+    rendered = period.format("{:%H:%M}".format(opening_hours.open_first),
+                             "{:%H:%M}".format(opening_hours.close_first))
+    if opening_hours.open_second and opening_hours.close_second:
+        rendered += period.format("{:%H:%M}".format(opening_hours.open_second),
+                                  "{:%H:%M}".format(opening_hours.close_second))
+    return rendered
+
+
+def language_key(language: str) -> str:
+    return (language or settings.LANGUAGE_CODE).lower()
+
+
+@lru_cache(maxsize=1024)
+def build_summaries(schedule: str) -> str:
+    """Render the opening hours of every day of a packed schedule in every language.
+    Many organizations share a schedule, so the result is cached per schedule.
+
+    :param schedule: Packed schedule
+    :return: JSON
+    """
+    summaries = {}
+    for language in settings.OPENING_HOURS_LANGUAGES:
+        with translation.override(language):
+            summaries[language_key(language)] = [render_day(unpack_day(schedule, day)) for day in SCHEDULE_DAYS]
+    return json.dumps(summaries, separators=(",", ":"), sort_keys=True)
+
+
+@lru_cache(maxsize=1024)
+def decode_summaries(summaries: str) -> dict:
+    """Decode stored summaries. Organizations with the same schedule store the same summaries, so they share the
+    decoded value, which must not be changed.
+
+    :param summaries: JSON made by build_summaries
+    :return: Dict of language -> tuple of the HTML of every day, empty if the summaries have not been built
+    """
+    if not summaries:
+        return {}
+    return {language: tuple(days) for language, days in json.loads(summaries).items()}
+
+
+def get_summary(summaries: dict, day: str, language: str = None) -> str:
+    """Get the rendered opening hours of a day from decoded summaries
+
+    :param summaries: Summaries decoded by decode_summaries
+    :param day: "today" or a 3 letter day string in lowercase, e.g. "mon"
+    :param language: Defaults to the active language
+    :return: HTML, or None if the summaries have not been built for the language
+    """
+    rendered = summaries.get(language_key(language or translation.get_language()))
+    return rendered[SCHEDULE_DAYS.index(day)] if rendered else None
@@ -0,0 +1,41 @@
+from celery import shared_task
+from django.db import models, transaction
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
+
+from oz_m_de.common.tasks import prewarm_homepage
+from .models import DayOpeningHours, Organization, OrganizationCategory
+from .opening_hours import set_in_bulk
+from .schedule import DAY_WIDTH, EMPTY_DAY, TIME_FIELDS
+from .signals import organizations_bulk_updated
+from .summaries import build_summaries
+
+
+@shared_task
+def roll_over_opening_hours() -> int:
+    """Start the day: clear today's opening hours of the organizations that update their opening hours daily,
+    recount the organizations that are opened today and prewarm the home page.
+    Runs at local midnight.
+
+    :return: Number of organizations of which today's opening hours were cleared
+    """
+    with transaction.atomic():
+        organizations = Organization.objects.filter(update_opening_hours_daily=True) \
+            .exclude(schedule__startswith=EMPTY_DAY)
+        rows = list(organizations.select_for_update().values_list("pk", "category_id"))
+        pks = [pk for pk, _ in rows]
+
+        if pks:
+            DayOpeningHours.objects.filter(organization__in=pks).update(**{field: None for field in TIME_FIELDS})
+            # Today is the first day of the packed schedule
+            Organization.objects.filter(pk__in=pks).update(
+                schedule=Concat(Value(EMPTY_DAY), Substr("schedule", DAY_WIDTH + 1), output_field=models.CharField()))
+            schedules = Organization.objects.filter(pk__in=pks).values_list("pk", "schedule")
+            set_in_bulk(Organization, "summaries", {pk: build_summaries(schedule) for pk, schedule in schedules})
+
+    # The organizations that are opened today change with the day in all categories
+    OrganizationCategory.objects.update_counts()
+    organizations_bulk_updated.send(sender=Organization, category_ids={category_id for _, category_id in rows})
+
+    prewarm_homepage.delay()
+    return len(pks)
@@ -0,0 +1,54 @@
+import datetime
+
+import factory
+import factory.fuzzy
+
+from oz_m_de.users.tests.factories import UserFactory
+
+
+class OrganizationCategoryFactory(factory.django.DjangoModelFactory):
+    name = factory.Sequence(lambda n: 'Category {0}'.format(n))
+
+    class Meta:
+        model = 'organizations.OrganizationCategory'
+        django_get_or_create = ('name', )
+
+
+class DayOpeningHoursFactory(factory.django.DjangoModelFactory):
+    open_first = factory.fuzzy.FuzzyChoice([datetime.time(hour) for hour in range(6, 11)])
+    close_first = factory.LazyAttribute(lambda o: datetime.time(o.open_first.hour + 4))
+    # Some days have a second opening
+    open_second = factory.Maybe(
+        factory.fuzzy.FuzzyChoice([True, False, False]),
+        yes_declaration=factory.LazyAttribute(lambda o: datetime.time(o.close_first.hour + 1)),
+        no_declaration=None,
+    )
+    close_second = factory.LazyAttribute(lambda o: datetime.time(o.open_second.hour + 4) if o.open_second else None)
+
+    class Meta:
+        model = 'organizations.DayOpeningHours'
+
+
+class OrganizationFactory(factory.django.DjangoModelFactory):
+    name = factory.Sequence(lambda n: 'Organization {0}'.format(n))
+    category = factory.SubFactory(OrganizationCategoryFactory)
+    owner = factory.SubFactory(UserFactory)
+    phone_nr = factory.Sequence(lambda n: '0{0:09d}'.format(n))
+    order = factory.fuzzy.FuzzyInteger(0, 100)
+    website = factory.LazyAttribute(lambda o: 'https://www.example.com/{0}'.format(o.name.lower().replace(' ', '-')))
+    description = factory.LazyAttribute(lambda o: '{0} in the Vulkaneifel'.format(o.name))
+    is_approved = True
+
+    class Meta:
+        model = 'organizations.Organization'
+
+
+class AddressFactory(factory.django.DjangoModelFactory):
+    address = factory.Sequence(lambda n: 'Kurfürstenstraße {0}'.format(n % 200 + 1))
+    postal_code = '54531'
+    city = 'Manderscheid'
+    country = 'DE'
+    organization = factory.SubFactory(OrganizationFactory)
+
+    class Meta:
+        model = 'organizations.Address'
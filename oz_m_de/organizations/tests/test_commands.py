@@ -0,0 +1,187 @@
+import datetime
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from allauth.account.models import EmailAddress
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from oz_m_de.common.clock import get_clock
+from ..models import Organization, OrganizationCategory
+from .factories import AddressFactory, DayOpeningHoursFactory, OrganizationCategoryFactory, OrganizationFactory
+from .test_models import BaseOrganizationTestCase
+
+
+class TestExplainOrganizationQueries(TestCase):
+
+    def test_prints_plans_and_rolls_back(self):
+        out = StringIO()
+        call_command("explain_organization_queries", orgs=50, categories=2, owners=2, stdout=out)
+
+        self.assertIn("for_listing", out.getvalue())
+        self.assertIn("sorted_by_name_for_owner", out.getvalue())
+        self.assertFalse(Organization.objects.exists())
+
+
+class TestExportImportOrganizations(BaseOrganizationTestCase):
+
+    def setUp(self):
+        super(TestExportImportOrganizations, self).setUp()
+        self.path = os.path.join(tempfile.mkdtemp(), "organizations")
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.path))
+
+    def export(self, format: str):
+        call_command("export_organizations", self.path, format=format, stdout=StringIO())
+
+    def import_(self, format: str, **options) -> str:
+        out = StringIO()
+        call_command("import_organizations", self.path, format=format, stdout=out, stderr=StringIO(), **options)
+        return out.getvalue()
+
+    def test_round_trip(self):
+        for format in ("csv", "json"):
+            Organization.objects.all().delete()
+            organization = self.make_organization("Hotel", order=3, is_member=False)
+            self.make_opening_hours(organization, "mon")
+
+            self.export(format)
+            Organization.objects.all().delete()
+            self.assertIn("1 created, 0 updated, 0 skipped", self.import_(format))
+
+            organization = Organization.objects.select_related("mon").get()
+            self.assertEqual((organization.name, organization.category, organization.owner),
+                             ("Hotel", self.category, self.user))
+            self.assertEqual((organization.order, organization.is_member), (3, False))
+            self.assertEqual(organization.addresses.get().city, "Manderscheid")
+            self.assertEqual(organization.mon.close_first, datetime.time(17))
+            self.assertEqual(organization.get_opening_hours("mon").close_first, datetime.time(17))
+
+    def test_updates_existing_organizations(self):
+        organization = self.make_organization("Hotel")
+        self.make_opening_hours(organization, "mon")
+        with open(self.path, "w") as f:
+            f.write("name,category,owner,city,mon,tue\n"
+                    "Hotel,Hotels,,Daun,10:00-16:00,08:00-12:00\n"
+                    "New hotel,Hotels,,Daun,,\n"
+                    "New hotel,Hotels,,Gerolstein,,\n"
+                    ",Hotels,,,,\n")
+
+        self.assertIn("1 created, 1 updated, 1 skipped", self.import_("csv", owner=self.user.username))
+
+        organization = Organization.objects.select_related("mon").get(pk=organization.pk)
+        self.assertEqual(organization.mon.open_first, datetime.time(10))
+        self.assertEqual(organization.get_opening_hours("tue").close_first, datetime.time(12))
+        # Columns that are not in the file are kept
+        self.assertEqual(organization.addresses.get().city, "Daun")
+        self.assertEqual(organization.addresses.get().address, "Kurfürstenstraße 1")
+        self.assertTrue(organization.is_approved)
+        self.assertEqual(Organization.objects.get(name="New hotel").addresses.get().city, "Gerolstein")
+        self.assertEqual(OrganizationCategory.objects.get(pk=self.category.pk).open_today_count,
+                         1 if self.day in ("mon", "tue") else 0)
+
+    def test_number_of_queries_does_not_grow_with_rows(self):
+        with open(self.path, "w") as f:
+            f.write("name,category,mon\n")
+            for i in range(200):
+                f.write("Hotel {},Hotels,09:00-17:00\n".format(i))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.import_("csv", owner=self.user.username, batch_size=100)
+        # SQLite doesn't return the primary keys of bulk inserts, so new opening hours are inserted one by one
+        self.assertLess(len(queries) - 200, 40)
+
+
+class TestBuildOpeningHoursSummaries(BaseOrganizationTestCase):
+
+    def test_fills_missing_summaries(self):
+        organization = self.make_organization()
+        self.make_opening_hours(organization, "mon")
+        summaries = Organization.objects.get(pk=organization.pk).summaries
+        Organization.objects.update(summaries="")
+
+        out = StringIO()
+        call_command("build_opening_hours_summaries", stdout=out)
+
+        self.assertIn("1 of 1 organizations", out.getvalue())
+        self.assertEqual(Organization.objects.get(pk=organization.pk).summaries, summaries)
+
+
+class TestReconcileCategoryCounts(TestCase):
+
+    def test_recomputes_counts(self):
+        category = OrganizationCategoryFactory()
+        AddressFactory.create_batch(3, organization__category=category)
+        OrganizationFactory(category=category, is_active=False)
+        OrganizationFactory(category=category, **{get_clock().day: DayOpeningHoursFactory()})
+        OrganizationCategory.objects.update(active_organization_count=0, open_today_count=0)
+
+        out = StringIO()
+        call_command("reconcile_category_counts", stdout=out)
+
+        self.assertIn("Updated the counts of 1 categories", out.getvalue())
+        category.refresh_from_db()
+        self.assertEqual((category.active_organization_count, category.open_today_count), (4, 1))
+
+
+class TestSeedDirectory(TestCase):
+
+    def seed(self, **options):
+        call_command("seed_directory", stdout=StringIO(), **options)
+
+    def test_adds_organizations_with_addresses_and_opening_hours(self):
+        self.seed(orgs=30, categories=3, owners=4, batch_size=20)
+
+        self.assertEqual(Organization.objects.count(), 30)
+        self.assertEqual(Organization.objects.filter(addresses__isnull=False).distinct().count(), 30)
+        self.assertEqual(OrganizationCategory.objects.count(), 3)
+        organization = Organization.objects.select_related("mon").exclude(mon=None).first()
+        self.assertEqual(organization.get_opening_hours("mon").open_first, organization.mon.open_first)
+        self.assertEqual(sum(OrganizationCategory.objects.values_list("active_organization_count", flat=True)), 30)
+
+        # Seeding again adds organizations with new names
+        self.seed(orgs=5, categories=3, owners=4)
+        self.assertEqual(Organization.objects.values("name").distinct().count(), 35)
+
+    def test_same_seed_gives_same_organizations(self):
+        self.seed(orgs=10, seed=1)
+        first = list(Organization.objects.order_by("pk").values_list("name", "schedule", "order"))
+        Organization.objects.all().delete()
+        self.seed(orgs=10, seed=1)
+
+        self.assertEqual(list(Organization.objects.order_by("pk").values_list("name", "schedule", "order")), first)
+
+    def test_owners_with_password(self):
+        self.seed(orgs=2, owners=2, password="secret")
+
+        self.assertTrue(self.client.login(username="owner-1", password="secret"))
+        self.assertEqual(EmailAddress.objects.filter(user__username__startswith="owner-", verified=True).count(), 2)
+
+
+class TestLoadTest(TestCase):
+
+    def test_reports_percentiles_of_every_step(self):
+        call_command("seed_directory", orgs=20, categories=2, owners=2, stdout=StringIO())
+        out = StringIO()
+
+        call_command("load_test", requests=3, warmup=1, stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertIn("p99 ms", lines[0])
+        self.assertEqual([line[:22].strip() for line in lines[1:]],
+                         ["home", "category", "owner list", "opening hours editor"])
+        # No errors
+        self.assertTrue(all(line.split()[-5] == "0" for line in lines[1:]))
+
+    def test_signs_in_with_password(self):
+        call_command("seed_directory", orgs=2, categories=1, owners=1, password="secret", stdout=StringIO())
+        out = StringIO()
+
+        call_command("load_test", requests=2, warmup=0, password="secret", stdout=out)
+
+        line = out.getvalue().splitlines()[-1]
+        self.assertEqual(line[:22].strip(), "sign in")
+        self.assertEqual(line.split()[-5], "0")
@@ -0,0 +1,131 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from oz_m_de.common.tests.transactions import run_commit_callbacks
+from ..intervals import MINUTES_PER_WEEK, CategoryIntervals, bump_version, opening_hours_index, schedule_intervals
+from ..schedule import EMPTY_DAY, EMPTY_SCHEDULE
+from .test_models import BaseOrganizationTestCase
+
+# Monday
+MONDAY = datetime.datetime(2017, 11, 13)
+
+
+def moment(days=0, hour=0, minute=0):
+    return timezone.make_aware(MONDAY + datetime.timedelta(days=days, hours=hour, minutes=minute))
+
+
+class TestScheduleIntervals(SimpleTestCase):
+
+    def test_weekdays(self):
+        schedule = EMPTY_DAY + "0900120013001700" + EMPTY_DAY + "10001800--------" + EMPTY_DAY * 4
+        self.assertEqual(schedule_intervals(schedule, False, 0),
+                         [(540, 720), (780, 1020), (2 * 1440 + 600, 2 * 1440 + 1080)])
+
+    def test_today_is_placed_on_weekday(self):
+        schedule = "09001700--------" + EMPTY_SCHEDULE[16:]
+        self.assertEqual(schedule_intervals(schedule, True, 3), [(3 * 1440 + 540, 3 * 1440 + 1020)])
+
+    def test_closing_after_midnight_continues_next_day(self):
+        schedule = EMPTY_DAY + "20000200--------" + EMPTY_DAY * 6
+        self.assertEqual(schedule_intervals(schedule, False, 0), [(1200, 1560)])
+
+    def test_closing_after_sunday_midnight_is_split(self):
+        schedule = EMPTY_DAY * 7 + "20000200--------"
+        self.assertEqual(schedule_intervals(schedule, False, 0),
+                         [(0, 120), (6 * 1440 + 1200, MINUTES_PER_WEEK)])
+
+
+class TestCategoryIntervals(SimpleTestCase):
+
+    def setUp(self):
+        self.category = CategoryIntervals()
+        self.category.add(1, [(540, 1020)])
+        self.category.add(2, [(600, 660), (720, 1080)])
+
+    def test_containing(self):
+        self.assertEqual(sorted(pk for _, _, pk in self.category.containing(630)), [1, 2])
+        self.assertEqual(sorted(pk for _, _, pk in self.category.containing(690)), [1])
+        self.assertEqual(self.category.containing(1080), [])
+
+    def test_next_start(self):
+        self.assertEqual(self.category.next_start(540), 600)
+        self.assertEqual(self.category.next_start(1100), 540 + MINUTES_PER_WEEK)
+
+    def test_remove(self):
+        self.category.remove(2, [(600, 660), (720, 1080)])
+        self.assertEqual([pk for _, _, pk in self.category.containing(630)], [1])
+
+
+class TestOpeningHoursIndex(BaseOrganizationTestCase):
+
+    def setUp(self):
+        super(TestOpeningHoursIndex, self).setUp()
+        cache.clear()
+        opening_hours_index.clear()
+        self.organization = self.make_organization()
+        self.make_opening_hours(self.organization, "mon")
+
+    def test_open_at(self):
+        self.assertEqual(opening_hours_index.open_at(self.category.pk, moment(hour=12)), {self.organization.pk})
+        self.assertEqual(opening_hours_index.open_at(self.category.pk, moment(hour=17)), set())
+        self.assertEqual(opening_hours_index.open_at(self.category.pk, moment(days=1, hour=12)), set())
+
+    def test_opens_next_at(self):
+        self.assertEqual(opening_hours_index.opens_next_at(self.category.pk, moment(hour=8, minute=30)),
+                         moment(hour=9))
+        self.assertEqual(opening_hours_index.opens_next_at(self.category.pk, moment(days=2)),
+                         moment(days=7, hour=9))
+
+    def test_closing_within(self):
+        self.assertEqual(opening_hours_index.closing_within(self.category.pk, 30, moment(hour=16, minute=45)),
+                         {self.organization.pk})
+        self.assertEqual(opening_hours_index.closing_within(self.category.pk, 30, moment(hour=12)), set())
+
+    def test_lookup_does_not_query_once_built(self):
+        opening_hours_index.open_at(self.category.pk, moment(hour=12))
+        with self.assertNumQueries(0):
+            opening_hours_index.open_at(self.category.pk, moment(hour=13))
+
+    def test_saving_organization_updates_index(self):
+        opening_hours_index.open_at(self.category.pk, moment(hour=12))
+
+        self.organization.is_blocked = True
+        with run_commit_callbacks():
+            self.organization.save()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(opening_hours_index.open_at(self.category.pk, moment(hour=12)), set())
+
+    def test_saving_opening_hours_updates_index(self):
+        opening_hours_index.open_at(self.category.pk, moment(hour=12))
+
+        self.organization.mon.close_first = datetime.time(11)
+        with run_commit_callbacks():
+            self.organization.mon.save()
+
+        self.assertEqual(opening_hours_index.open_at(self.category.pk, moment(hour=12)), set())
+
+    def test_index_is_not_updated_before_commit(self):
+        opening_hours_index.open_at(self.category.pk, moment(hour=12))
+        version = opening_hours_index.version
+
+        with run_commit_callbacks() as callbacks:
+            self.organization.is_blocked = True
+            self.organization.save()
+
+            self.assertEqual(opening_hours_index.open_at(self.category.pk, moment(hour=12)), {self.organization.pk})
+            self.assertEqual(opening_hours_index.version, version)
+            # A rolled back transaction drops the callbacks
+            callbacks.clear()
+
+        self.assertEqual(opening_hours_index.open_at(self.category.pk, moment(hour=12)), {self.organization.pk})
+
+    def test_changes_by_other_processes_rebuild_index(self):
+        opening_hours_index.open_at(self.category.pk, moment(hour=12))
+        bump_version()
+
+        with self.assertNumQueries(1):
+            opening_hours_index.open_at(self.category.pk, moment(hour=12))
@@ -0,0 +1,220 @@
+import datetime
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from test_plus.test import TestCase
+
+from oz_m_de.common.clock import get_clock
+from ..models import Address, DayOpeningHours, Organization, OrganizationCategory
+from ..summaries import decode_summaries
+
+
+class BaseOrganizationTestCase(TestCase):
+
+    def setUp(self):
+        # Cached roles, counts and versions of earlier tests may refer to rows with the same primary keys
+        cache.clear()
+        self.user = self.make_user()
+        self.category = OrganizationCategory.objects.create(name="Hotels")
+        # Get the 3 letter day string in lowercase
+        self.day = get_clock().day
+
+    def make_organization(self, name="Hotel", **kwargs):
+        kwargs.setdefault("is_approved", True)
+        organization = Organization.objects.create(name=name, category=self.category, owner=self.user,
+                                                   phone_nr="0123456789", **kwargs)
+        Address.objects.create(address="Kurfürstenstraße 1", postal_code="54531", city="Manderscheid",
+                               country="DE", organization=organization)
+        return organization
+
+    def make_opening_hours(self, organization, day):
+        opening_hours = DayOpeningHours.objects.create(open_first=datetime.time(9), close_first=datetime.time(17))
+        setattr(organization, day, opening_hours)
+        organization.save()
+        return opening_hours
+
+
+class TestOrganizationQuerySetForListing(BaseOrganizationTestCase):
+
+    def test_excludes_inactive_organizations(self):
+        active = self.make_organization("Active")
+        self.make_organization("Blocked", is_blocked=True)
+        self.make_organization("Not approved", is_approved=False)
+
+        self.assertEqual(list(Organization.objects.for_listing(self.category)), [active])
+
+    def test_query_count_does_not_grow_with_organizations(self):
+        for i in range(10):
+            organization = self.make_organization("Hotel {}".format(i))
+            self.make_opening_hours(organization, self.day)
+
+        # Organizations and the prefetched addresses, the opening hours are read from the schedule
+        with self.assertNumQueries(2):
+            for organization in Organization.objects.for_listing(self.category):
+                list(organization.addresses.all())
+                organization.todays_opening_hours.open_first
+
+
+class TestOrganizationQuerySetOpenedToday(BaseOrganizationTestCase):
+
+    def test_opened_on_day(self):
+        opened = self.make_organization("Opened")
+        self.make_opening_hours(opened, "mon")
+        closed = self.make_organization("Closed")
+        self.make_opening_hours(closed, "tue")
+
+        self.assertEqual(list(Organization.objects.opened_today(day="mon")), [opened])
+
+    def test_update_opening_hours_daily_uses_today(self):
+        daily = self.make_organization("Daily", update_opening_hours_daily=True)
+        self.make_opening_hours(daily, "today")
+        ignored = self.make_organization("Daily without today", update_opening_hours_daily=True)
+        self.make_opening_hours(ignored, "mon")
+
+        self.assertEqual(list(Organization.objects.opened_today(day="mon")), [daily])
+
+    def test_filters_on_category(self):
+        opened = self.make_organization("Opened")
+        self.make_opening_hours(opened, "mon")
+        other = self.make_organization("Other category")
+        other.category = OrganizationCategory.objects.create(name="Restaurants")
+        self.make_opening_hours(other, "mon")
+
+        self.assertEqual(list(Organization.objects.opened_today(self.category, day="mon")), [opened])
+
+    def test_is_a_single_query(self):
+        for i in range(10):
+            self.make_opening_hours(self.make_organization("Hotel {}".format(i)), self.day)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(len(Organization.objects.opened_today()), 10)
+
+    def test_matches_open_today(self):
+        opened = self.make_organization("Opened")
+        self.make_opening_hours(opened, self.day)
+        self.make_organization("Closed")
+
+        for organization in Organization.objects.with_open_today(self.day):
+            self.assertEqual(organization.is_open_today, organization.open_today)
+
+
+class TestOrganizationCategoryCounts(BaseOrganizationTestCase):
+
+    def refresh_category(self) -> OrganizationCategory:
+        return OrganizationCategory.objects.get(pk=self.category.pk)
+
+    def test_saving_organization_updates_counts(self):
+        self.make_opening_hours(self.make_organization("Opened"), self.day)
+        self.make_organization("Closed")
+        self.make_organization("Blocked", is_blocked=True)
+
+        category = self.refresh_category()
+        self.assertEqual(category.active_organization_count, 2)
+        self.assertEqual(category.open_today_count, 1)
+
+    def test_moving_organization_updates_both_categories(self):
+        organization = self.make_organization()
+        other = OrganizationCategory.objects.create(name="Restaurants")
+
+        organization.category = other
+        organization.save()
+
+        self.assertEqual(self.refresh_category().active_organization_count, 0)
+        self.assertEqual(OrganizationCategory.objects.get(pk=other.pk).active_organization_count, 1)
+
+    def test_deleting_organization_updates_counts(self):
+        self.make_organization().delete()
+        self.assertEqual(self.refresh_category().active_organization_count, 0)
+
+    def test_saving_opening_hours_updates_open_today_count(self):
+        opening_hours = self.make_opening_hours(self.make_organization(), self.day)
+
+        opening_hours.open_first = None
+        opening_hours.close_first = None
+        opening_hours.save()
+
+        self.assertEqual(self.refresh_category().open_today_count, 0)
+
+    def test_saving_unchanged_organization_keeps_counts_without_recounting(self):
+        organization = self.make_organization()
+
+        organization.description = "By the lake"
+        with CaptureQueriesContext(connection) as queries:
+            organization.save()
+
+        self.assertFalse([query for query in queries if OrganizationCategory._meta.db_table in query["sql"]])
+        self.assertEqual(self.refresh_category().active_organization_count, 1)
+
+    def test_blocking_organization_decrements_counts(self):
+        organization = self.make_organization()
+        self.make_opening_hours(organization, self.day)
+
+        organization.is_blocked = True
+        organization.save()
+
+        category = self.refresh_category()
+        self.assertEqual((category.active_organization_count, category.open_today_count), (0, 0))
+
+    def test_update_counts_reconciles(self):
+        self.make_organization()
+        OrganizationCategory.objects.filter(pk=self.category.pk).update(active_organization_count=5)
+
+        self.assertEqual(OrganizationCategory.objects.update_counts(), 1)
+        self.assertEqual(self.refresh_category().active_organization_count, 1)
+        self.assertEqual(OrganizationCategory.objects.update_counts(), 0)
+
+    def test_has_active_organizations_is_a_single_query(self):
+        self.make_organization()
+        OrganizationCategory.objects.create(name="Empty")
+
+        with self.assertNumQueries(1):
+            self.assertEqual(list(OrganizationCategory.objects.has_active_organizations()), [self.category])
+
+    def test_saving_category_keeps_counts(self):
+        self.make_organization()
+
+        self.category.name = "Guesthouses"
+        self.category.save()
+
+        self.assertEqual(self.refresh_category().active_organization_count, 1)
+
+
+class TestOpeningHoursSummaries(BaseOrganizationTestCase):
+
+    def test_rendered_on_save(self):
+        organization = self.make_organization()
+        opening_hours = self.make_opening_hours(organization, "mon")
+
+        organization = Organization.objects.get(pk=organization.pk)
+        self.assertIn("09:00 to 17:00", organization.get_opening_hours_summary("mon"))
+        self.assertIn("Closed today", organization.get_opening_hours_summary("tue"))
+
+        opening_hours.close_first = datetime.time(18)
+        opening_hours.save()
+        self.assertIn("09:00 to 18:00", Organization.objects.get(pk=organization.pk).get_opening_hours_summary("mon"))
+
+    def test_rendered_on_the_fly_without_summaries(self):
+        organization = self.make_organization()
+        self.make_opening_hours(organization, "mon")
+        Organization.objects.update(summaries="")
+
+        organization = Organization.objects.get(pk=organization.pk)
+        self.assertIn("09:00 to 17:00", organization.get_opening_hours_summary("mon"))
+
+    def test_decoded_once_per_object(self):
+        organization = self.make_organization()
+        self.make_opening_hours(organization, "mon")
+        organization = Organization.objects.get(pk=organization.pk)
+
+        with mock.patch("oz_m_de.organizations.summaries.json.loads", wraps=json.loads) as loads:
+            decode_summaries.cache_clear()
+            organization.get_opening_hours_summary("mon")
+            organization.get_opening_hours_summary("tue")
+            # Other organizations with the same schedule share the decoded summaries
+            Organization.objects.get(pk=organization.pk).get_opening_hours_summary("mon")
+
+        self.assertEqual(loads.call_count, 1)
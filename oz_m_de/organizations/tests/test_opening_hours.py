@@ -0,0 +1,75 @@
+import datetime
+
+from django.core.cache import cache
+
+from oz_m_de.common.tests.transactions import run_commit_callbacks
+from ..intervals import VERSION_CACHE_KEY
+from ..models import DayOpeningHours, Organization, OrganizationCategory
+from ..opening_hours import apply_opening_hours, update_in_bulk
+from ..schedule import DayHours
+from .test_models import BaseOrganizationTestCase
+
+WINTER_HOURS = DayHours(datetime.time(10), datetime.time(16), None, None)
+
+
+class TestApplyOpeningHours(BaseOrganizationTestCase):
+
+    def test_updates_existing_and_creates_missing_days(self):
+        with_hours = self.make_organization("With hours")
+        self.make_opening_hours(with_hours, "mon")
+        without_hours = self.make_organization("Without hours")
+
+        changed = apply_opening_hours(Organization.objects.all(), {"mon": WINTER_HOURS})
+
+        # One updated and one new opening hours row, the new link and both schedules
+        self.assertEqual(changed, 5)
+        for organization in Organization.objects.select_related("mon"):
+            self.assertEqual(organization.mon.open_first, datetime.time(10))
+            self.assertEqual(organization.get_opening_hours("mon"), WINTER_HOURS)
+        self.assertEqual(DayOpeningHours.objects.count(), 2)
+        self.assertIsNone(Organization.objects.get(pk=without_hours.pk).get_opening_hours("tue"))
+
+    def test_clears_days(self):
+        organization = self.make_organization()
+        self.make_opening_hours(organization, "mon")
+
+        apply_opening_hours(Organization.objects.all(), {"mon": None, "tue": None})
+
+        organization.refresh_from_db()
+        self.assertIsNone(organization.get_opening_hours("mon"))
+        self.assertIsNone(organization.tue_id)
+
+    def test_updates_counts_and_index_version(self):
+        self.make_organization()
+        version = cache.get(VERSION_CACHE_KEY)
+
+        with run_commit_callbacks():
+            apply_opening_hours(Organization.objects.all(), {self.day: WINTER_HOURS})
+            self.assertEqual(cache.get(VERSION_CACHE_KEY), version)
+
+        self.assertEqual(OrganizationCategory.objects.get(pk=self.category.pk).open_today_count, 1)
+        self.assertNotEqual(cache.get(VERSION_CACHE_KEY), version)
+
+    def test_number_of_queries_does_not_grow_with_organizations(self):
+        for i in range(20):
+            organization = self.make_organization("Hotel {}".format(i))
+            self.make_opening_hours(organization, "mon")
+
+        # Savepoint, select, update of the opening hours, update of the schedules, release savepoint
+        # and the queries of the category counts
+        with self.assertNumQueries(5 + 5):
+            apply_opening_hours(Organization.objects.all(), {"mon": WINTER_HOURS})
+
+
+class TestUpdateInBulk(BaseOrganizationTestCase):
+
+    def test_writes_a_value_per_row(self):
+        first = DayOpeningHours.objects.create(open_first=datetime.time(9))
+        second = DayOpeningHours.objects.create(open_first=datetime.time(10))
+        first.open_first, second.open_first = datetime.time(11), None
+
+        with self.assertNumQueries(1):
+            self.assertEqual(update_in_bulk([first, second], ["open_first"]), 2)
+
+        self.assertEqual(DayOpeningHours.objects.get(pk=first.pk).open_first, datetime.time(11))
+        self.assertIsNone(DayOpeningHours.objects.get(pk=second.pk).open_first)
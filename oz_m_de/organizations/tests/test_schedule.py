@@ -0,0 +1,100 @@
+import datetime
+
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..models import DayOpeningHours, Organization
+from ..schedule import EMPTY_SCHEDULE, DayHours, format_day, pack_day, parse_day, unpack_day
+from .test_models import BaseOrganizationTestCase
+
+
+class TestPacking(SimpleTestCase):
+
+    def test_pack_day(self):
+        opening_hours = DayOpeningHours(open_first=datetime.time(9), close_first=datetime.time(12),
+                                        open_second=datetime.time(13, 30), close_second=datetime.time(17))
+        self.assertEqual(pack_day(opening_hours), "0900120013301700")
+
+    def test_pack_day_without_second_hours(self):
+        opening_hours = DayOpeningHours(open_first=datetime.time(9), close_first=datetime.time(12))
+        self.assertEqual(pack_day(opening_hours), "09001200--------")
+
+    def test_unpack_day(self):
+        schedule = EMPTY_SCHEDULE[:16] + "0900120013301700" + EMPTY_SCHEDULE[32:]
+        self.assertEqual(unpack_day(schedule, "mon"), DayHours(datetime.time(9), datetime.time(12),
+                                                               datetime.time(13, 30), datetime.time(17)))
+
+    def test_unpack_empty_day(self):
+        self.assertIsNone(unpack_day(EMPTY_SCHEDULE, "tue"))
+
+
+class TestScheduleSignals(BaseOrganizationTestCase):
+
+    def test_saving_organization_packs_schedule(self):
+        organization = self.make_organization()
+        self.make_opening_hours(organization, "wed")
+
+        organization.refresh_from_db()
+        self.assertEqual(organization.get_opening_hours("wed"), DayHours(datetime.time(9), datetime.time(17),
+                                                                         None, None))
+        self.assertIsNone(organization.get_opening_hours("thu"))
+
+    def test_saving_opening_hours_updates_schedule(self):
+        organization = self.make_organization()
+        opening_hours = self.make_opening_hours(organization, "today")
+
+        opening_hours.close_first = datetime.time(18, 15)
+        opening_hours.save()
+
+        organization = Organization.objects.get(pk=organization.pk)
+        self.assertEqual(organization.get_opening_hours("today").close_first, datetime.time(18, 15))
+
+    def test_saving_loaded_organization_keeps_changed_opening_hours(self):
+        organization = self.make_organization()
+        opening_hours = self.make_opening_hours(organization, "mon")
+        organization = Organization.objects.get(pk=organization.pk)
+
+        opening_hours.close_first = datetime.time(18)
+        opening_hours.save()
+        organization.description = "Am See"
+        organization.save()
+
+        self.assertEqual(organization.get_opening_hours("mon").close_first, datetime.time(18))
+        organization = Organization.objects.get(pk=organization.pk)
+        self.assertEqual(organization.get_opening_hours("mon").close_first, datetime.time(18))
+        self.assertIn("18:00", organization.summaries)
+
+    def test_saving_organization_without_new_opening_hours_does_not_load_them(self):
+        organization = self.make_organization()
+        self.make_opening_hours(organization, "mon")
+        organization = Organization.objects.get(pk=organization.pk)
+        schedule = organization.schedule
+
+        organization.name = "Hotel am See"
+        with CaptureQueriesContext(connection) as queries:
+            organization.save()
+
+        self.assertFalse([query for query in queries if DayOpeningHours._meta.db_table in query["sql"]])
+        self.assertEqual(Organization.objects.get(pk=organization.pk).schedule, schedule)
+
+    def test_reading_opening_hours_does_not_query(self):
+        organization = self.make_organization(update_opening_hours_daily=True)
+        self.make_opening_hours(organization, "today")
+        organization = Organization.objects.get(pk=organization.pk)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(organization.open_today)
+            self.assertEqual(organization.todays_opening_hours.open_first, datetime.time(9))
+
+
+class TestFormatDay(SimpleTestCase):
+
+    def test_round_trip(self):
+        for value in ("", "09:00-17:00", "09:00-12:00,13:00-17:30"):
+            self.assertEqual(format_day(parse_day(value)), value)
+
+    def test_invalid(self):
+        for value in ("09:00", "9-17", "09:00-12:00,13:00-14:00,15:00-16:00"):
+            with self.assertRaises(ValueError):
+                parse_day(value)
@@ -0,0 +1,42 @@
+from django.core.cache import cache
+
+from oz_m_de.common.fragments import fragment_key
+from oz_m_de.taskapp.celery import app
+from ..models import Organization, OrganizationCategory
+from ..schedule import EMPTY_DAY
+from ..tasks import roll_over_opening_hours
+from .test_models import BaseOrganizationTestCase
+
+
+class TestRollOverOpeningHours(BaseOrganizationTestCase):
+
+    def test_tasks_run_eagerly(self):
+        self.assertTrue(app.conf.task_always_eager)
+
+    def test_clears_todays_opening_hours_of_daily_organizations(self):
+        daily = self.make_organization("Daily", update_opening_hours_daily=True)
+        self.make_opening_hours(daily, "today")
+        self.make_opening_hours(daily, "mon")
+        weekly = self.make_organization("Weekly")
+        self.make_opening_hours(weekly, "today")
+
+        self.assertEqual(roll_over_opening_hours.delay().get(), 1)
+
+        daily = Organization.objects.select_related("today").get(pk=daily.pk)
+        self.assertIsNone(daily.today.open_first)
+        self.assertTrue(daily.schedule.startswith(EMPTY_DAY))
+        self.assertIsNotNone(daily.get_opening_hours("mon"))
+        self.assertFalse(Organization.objects.get(pk=weekly.pk).schedule.startswith(EMPTY_DAY))
+        self.assertEqual(OrganizationCategory.objects.get(pk=self.category.pk).open_today_count, 0)
+
+    def test_prewarms_home_page(self):
+        self.make_organization()
+        OrganizationCategory.objects.update_counts()
+        cache.clear()
+
+        roll_over_opening_hours.delay()
+
+        for category_id in (None, self.category.pk):
+            self.assertIsNotNone(cache.get(fragment_key(category_id, self.day, "de-de")))
+        with self.assertNumQueries(0):
+            self.get_check_200("home")
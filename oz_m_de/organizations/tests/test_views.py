@@ -0,0 +1,291 @@
+import datetime
+import json
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from oz_m_de.common.fragments import get_version
+from oz_m_de.common.memberships import ORGANIZATIONS_ADMIN_GROUP
+from oz_m_de.common.tests.transactions import run_commit_callbacks
+from ..forms import BulkOpeningHoursForm
+from ..models import DayOpeningHours, Organization, OrganizationCategory
+from ..views import OrganizationApiView, OrganizationListView
+from .test_models import BaseOrganizationTestCase
+
+
+class TestOrganizationApiView(BaseOrganizationTestCase):
+
+    def get_all(self, **params):
+        """Follow the cursors and return the names of all organizations"""
+        names = []
+        while True:
+            response = self.get("organizations:api", data=params)
+            self.response_200(response)
+            data = response.json()
+            names.extend(organization["name"] for organization in data["results"])
+            if not data["next"]:
+                return names
+            params["cursor"] = data["next"]
+
+    def test_pages_follow_listing_order(self):
+        self.make_organization("Zeta", order=1)
+        self.make_organization("Alpha", order=2)
+        self.make_organization("Beta", order=2)
+        self.make_organization("Member later", order=1, is_member=False)
+        self.make_organization("Blocked", is_blocked=True)
+
+        with mock.patch.object(OrganizationApiView, "paginate_by", 2):
+            names = self.get_all()
+
+        self.assertEqual(names, ["Zeta", "Alpha", "Beta", "Member later"])
+
+    def test_serializes_addresses_and_opening_hours(self):
+        organization = self.make_organization("Hotel")
+        self.make_opening_hours(organization, self.day)
+
+        data = self.get("organizations:api").json()
+
+        result = data["results"][0]
+        self.assertEqual(result["category"], {"id": self.category.pk, "name": "Hotels"})
+        self.assertEqual(result["addresses"][0]["city"], "Manderscheid")
+        self.assertEqual(result["opening_hours_today"], {"open_first": "09:00", "close_first": "17:00",
+                                                         "open_second": None, "close_second": None})
+        self.assertIsNone(data["next"])
+
+    def test_filters(self):
+        opened = self.make_organization("Opened")
+        self.make_opening_hours(opened, self.day)
+        self.make_organization("Closed")
+
+        self.assertEqual(self.get_all(open_today="1"), ["Opened"])
+        self.assertEqual(self.get_all(category=self.category.pk + 1), [])
+
+    def test_invalid_parameters(self):
+        self.get("organizations:api", data={"cursor": "nonsense"})
+        self.response_400()
+        self.get("organizations:api", data={"category": "x"})
+        self.response_400()
+
+    def test_query_count_does_not_grow_with_organizations(self):
+        for i in range(10):
+            self.make_organization("Hotel {}".format(i))
+
+        # Organizations and their addresses
+        with self.assertNumQueries(2):
+            self.get("organizations:api")
+
+    def test_not_modified(self):
+        self.make_organization()
+
+        response = self.get("organizations:api")
+        self.assertIn("public", response["Cache-Control"])
+
+        response = self.get("organizations:api", extra={"HTTP_IF_NONE_MATCH": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+    def test_keys_are_sorted(self):
+        # Every worker must build the same content, and so the same ETag, whatever the order of the dicts
+        self.make_organization()
+
+        response = self.get("organizations:api")
+
+        self.assertEqual(response.content.decode(), json.dumps(response.json(), sort_keys=True))
+
+
+class TestOrganizationOpeningHoursView(BaseOrganizationTestCase):
+
+    def setUp(self):
+        super(TestOrganizationOpeningHoursView, self).setUp()
+        self.organization = self.make_organization()
+
+    def test_get_does_not_write(self):
+        with self.login(self.user):
+            with CaptureQueriesContext(connection) as queries:
+                self.get_check_200("organizations:opening-hours", pk=self.organization.pk)
+
+        writes = [query["sql"] for query in queries if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))]
+        self.assertEqual(writes, [])
+        self.assertContains(self.last_response, 'name="mon-open_first"')
+        self.assertContains(self.last_response, 'name="sun-close_first"')
+
+    def test_days_in_the_order_of_the_week(self):
+        with self.login(self.user):
+            self.get_check_200("organizations:opening-hours", pk=self.organization.pk)
+
+        self.assertEqual([form.prefix for form in self.last_response.context["formset"]],
+                         ["mon", "tue", "wed", "thu", "fri", "sat", "sun"])
+
+    def test_post_creates_changed_days_only(self):
+        with self.login(self.user):
+            self.post("organizations:opening-hours", pk=self.organization.pk,
+                      data={"mon-open_first": "09:00", "mon-close_first": "17:00"})
+        self.response_200()
+
+        self.organization.refresh_from_db()
+        self.assertEqual(DayOpeningHours.objects.count(), 1)
+        self.assertEqual(self.organization.get_opening_hours("mon").close_first, datetime.time(17))
+        self.assertIsNone(self.organization.tue)
+
+    def test_post_updates_existing_days(self):
+        self.make_opening_hours(self.organization, "mon")
+        self.make_opening_hours(self.organization, "tue")
+
+        with self.login(self.user):
+            self.post("organizations:opening-hours", pk=self.organization.pk,
+                      data={"mon-open_first": "10:00", "mon-close_first": "17:00",
+                            "tue-open_first": "09:00", "tue-close_first": "18:00"})
+
+        self.organization.refresh_from_db()
+        self.assertEqual(DayOpeningHours.objects.get(pk=self.organization.mon_id).open_first, datetime.time(10))
+        self.assertEqual(self.organization.get_opening_hours("tue").close_first, datetime.time(18))
+
+    def test_invalid_post_does_not_write(self):
+        with self.login(self.user):
+            self.post("organizations:opening-hours", pk=self.organization.pk, data={"mon-open_first": "09:00"})
+
+        self.assertContains(self.last_response, "Opening time requires a closing time")
+        self.assertEqual(DayOpeningHours.objects.count(), 0)
+
+
+class TestOrganizationBulkOpeningHoursView(BaseOrganizationTestCase):
+
+    def setUp(self):
+        super(TestOrganizationBulkOpeningHoursView, self).setUp()
+        self.organization = self.make_organization()
+
+    def test_only_for_organizations_admins(self):
+        with self.login(self.user):
+            self.get("organizations:bulk-opening-hours")
+        self.response_403()
+
+    def test_days_in_the_order_of_the_week(self):
+        form = BulkOpeningHoursForm()
+
+        week = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+        self.assertEqual([day for day, _ in form.fields["days"].choices], week)
+        self.assertEqual([day_form.prefix for day_form in form.day_forms], week)
+
+    def test_applies_opening_hours_to_category(self):
+        Group.objects.create(name=ORGANIZATIONS_ADMIN_GROUP).user_set.add(self.user)
+        other = self.make_organization("Other")
+        other.category = OrganizationCategory.objects.create(name="Shops")
+        other.save()
+
+        with self.login(self.user):
+            self.get_check_200("organizations:bulk-opening-hours")
+            self.post("organizations:bulk-opening-hours",
+                      data={"category": self.category.pk, "days": ["mon", "tue"],
+                            "mon-open_first": "10:00", "mon-close_first": "16:00"})
+        self.assertContains(self.last_response, "3 rows changed")
+
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.get_opening_hours("mon").close_first, datetime.time(16))
+        self.assertIsNone(Organization.objects.get(pk=other.pk).get_opening_hours("mon"))
+
+
+class TestRoomsAvailable(BaseOrganizationTestCase):
+
+    def setUp(self):
+        super(TestRoomsAvailable, self).setUp()
+        self.organization = self.make_organization()
+
+    def toggle(self, user, **extra):
+        with self.login(user):
+            return self.post("organizations:rooms-available", pk=self.organization.pk, extra=extra)
+
+    def test_toggles_with_single_update(self):
+        with self.login(self.user):
+            with CaptureQueriesContext(connection) as queries:
+                self.post("organizations:rooms-available", pk=self.organization.pk,
+                          extra={"HTTP_X_REQUESTED_WITH": "XMLHttpRequest"})
+
+        self.assertEqual(self.last_response.json(), {"rooms_available": True})
+        self.assertEqual(len([query for query in queries if query["sql"].startswith("UPDATE")]), 1)
+
+        self.toggle(self.user, HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        self.assertEqual(self.last_response.json(), {"rooms_available": False})
+
+    def test_redirects_without_ajax(self):
+        self.toggle(self.user)
+        self.response_302()
+        self.assertTrue(Organization.objects.get(pk=self.organization.pk).rooms_available)
+
+    def test_get_is_not_allowed(self):
+        with self.login(self.user):
+            self.get("organizations:rooms-available", pk=self.organization.pk)
+        self.response_405()
+
+    def test_only_owner_or_admin(self):
+        other = self.make_user("other")
+        self.toggle(other)
+        self.response_403()
+        self.assertFalse(Organization.objects.get(pk=self.organization.pk).rooms_available)
+
+        with run_commit_callbacks():
+            Group.objects.create(name=ORGANIZATIONS_ADMIN_GROUP).user_set.add(other)
+        self.toggle(other)
+        self.assertTrue(Organization.objects.get(pk=self.organization.pk).rooms_available)
+
+    def test_invalidates_category_page_only(self):
+        category_version, categories_version = get_version(self.category.pk), get_version(None)
+
+        with run_commit_callbacks():
+            self.toggle(self.user)
+
+        self.assertNotEqual(get_version(self.category.pk), category_version)
+        self.assertEqual(get_version(None), categories_version)
+
+
+class TestOrganizationListView(BaseOrganizationTestCase):
+
+    def get_names(self, user, **params) -> list:
+        """Follow the next page links and return the names of all organizations"""
+        names = []
+        with self.login(user):
+            response = self.get("organizations:list", data=params)
+            while True:
+                self.assertEqual(response.status_code, 200)
+                names.extend(organization.name for organization in response.context["organization_list"])
+                if not response.context["next_page_url"]:
+                    return names
+                response = self.client.get(reverse("organizations:list") + response.context["next_page_url"])
+
+    def test_pages_of_owner_and_admin(self):
+        self.make_organization("Beta", order=1)
+        self.make_organization("Alpha", order=2)
+        admin = self.make_user("admin")
+        Group.objects.create(name=ORGANIZATIONS_ADMIN_GROUP).user_set.add(admin)
+        other = self.make_organization("Other", order=3)
+        other.owner = admin
+        other.save()
+
+        with mock.patch.object(OrganizationListView, "paginate_by", 1):
+            self.assertEqual(self.get_names(self.user), ["Alpha", "Beta"])
+            self.assertEqual(self.get_names(admin), ["Beta", "Alpha", "Other"])
+
+    def test_filters_are_kept_across_pages(self):
+        self.make_organization("Hotel Zur Post")
+        self.make_organization("Hotel Eifel", is_blocked=True)
+        self.make_organization("Hotel Maar", is_blocked=True)
+        self.make_organization("Pension Maar", is_blocked=True)
+
+        with mock.patch.object(OrganizationListView, "paginate_by", 1):
+            self.assertEqual(self.get_names(self.user, name="hotel", status="blocked"), ["Hotel Eifel", "Hotel Maar"])
+        self.assertEqual(self.get_names(self.user, category=OrganizationCategory.objects.create(name="Shops").pk), [])
+
+    def test_query_count_does_not_grow_with_organizations(self):
+        for i in range(10):
+            self.make_organization("Hotel {}".format(i))
+
+        with self.login(self.user):
+            # Session, user, roles, the organizations with their categories and the categories of the filter
+            with self.assertNumQueries(7):
+                self.get_check_200("organizations:list")
+
+    def test_invalid_cursor(self):
+        with self.login(self.user):
+            self.get("organizations:list", data={"cursor": "nonsense"})
+        self.response_404()
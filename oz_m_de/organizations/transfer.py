@@ -0,0 +1,273 @@
+"""Streaming export and import of organizations, used by the export_organizations and import_organizations
+commands.
+
+Every organization is a single flat row, with its category, owner, first address and the opening hours of every
+day formatted by schedule.format_day. Rows are read and written one at a time, so files of any size are handled
+in constant memory. The import writes a batch of rows with a few set-based statements, organizations are matched
+on their natural key (category, name): existing ones are updated, the others are created.
+"""
+import csv
+import json
+from collections import OrderedDict, namedtuple
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .models import Address, DayOpeningHours, Organization, OrganizationCategory
+from .opening_hours import create_opening_hours, update_in_bulk
+from .schedule import (DAY_WIDTH, EMPTY_SCHEDULE, SCHEDULE_DAYS, TIME_FIELDS, day_offset, format_day, pack_day,
+                       parse_day, unpack_day)
+from .signals import organizations_bulk_updated
+from .summaries import build_summaries
+
+ORGANIZATION_FIELDS = ["order", "phone_nr", "website", "description", "is_active", "is_approved", "is_blocked",
+                       "is_member", "rooms_available", "update_opening_hours_daily"]
+BOOLEAN_FIELDS = ["is_active", "is_approved", "is_blocked", "is_member", "rooms_available",
+                  "update_opening_hours_daily"]
+ADDRESS_FIELDS = ["address", "postal_code", "city", "country"]
+FIELDS = ["name", "category", "owner"] + ORGANIZATION_FIELDS + ADDRESS_FIELDS + list(SCHEDULE_DAYS)
+
+FORMATS = ("csv", "json")
+
+ImportResult = namedtuple("ImportResult", ["created", "updated", "skipped"])
+
+
+def export_rows():
+    """Generate a row for every organization, ordered by primary key, with a single query"""
+    values = ["pk", "name", "category__name", "owner__username", "schedule"] + ORGANIZATION_FIELDS + \
+        ["addresses__{}".format(field) for field in ADDRESS_FIELDS]
+    organizations = Organization.objects.order_by("pk", "addresses__pk").values_list(*values)
+
+    previous = None
+    for organization in organizations.iterator():
+        # Organizations with more than one address come back once per address, only the first is exported
+        if organization[0] == previous:
+            continue
+        previous = organization[0]
+
+        pk, name, category, owner, schedule, *values = organization
+        row = OrderedDict([("name", name), ("category", category), ("owner", owner)])
+        row.update(zip(ORGANIZATION_FIELDS + ADDRESS_FIELDS, values))
+        for day in SCHEDULE_DAYS:
+            row[day] = format_day(unpack_day(schedule, day))
+        yield row
+
+
+def write_rows(rows, stream, format: str):
+    if format == "csv":
+        writer = csv.DictWriter(stream, FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+    else:
+        # JSON lines, one object per line, so it can be read without loading the whole file
+        for row in rows:
+            stream.write(json.dumps(row, ensure_ascii=False))
+            stream.write("\n")
+
+
+def read_rows(stream, format: str):
+    if format == "csv":
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def to_boolean(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "y")
+    return bool(value)
+
+
+def clean_row(row: dict) -> dict:
+    """Convert the values of a row read from a file
+
+    :raises ValueError: When the row is not valid
+    :return: Dict with model values and DayHours, or None, per day
+    """
+    row = {field: row.get(field) for field in FIELDS}
+    for field in ("name", "category"):
+        row[field] = (row[field] or "").strip()
+        if not row[field]:
+            raise ValueError("{} is required".format(field))
+
+    for field in BOOLEAN_FIELDS:
+        if row[field] in (None, ""):
+            row[field] = Organization._meta.get_field(field).default
+        else:
+            row[field] = to_boolean(row[field])
+    if row["order"] in (None, ""):
+        row["order"] = Organization._meta.get_field("order").default
+    else:
+        row["order"] = int(row["order"])
+    for field in ("phone_nr", "address", "postal_code", "city"):
+        row[field] = row[field] or ""
+    for field in ("website", "description"):
+        row[field] = row[field] or None
+    row["country"] = row["country"] or "DE"
+    for day in SCHEDULE_DAYS:
+        row[day] = parse_day(row[day])
+    return row
+
+
+class Importer(object):
+    """Upsert rows in batches. Categories and owners are looked up once per import.
+    Existing organizations only get the values of the columns in the file, the columns of the first row.
+    """
+
+    def __init__(self, batch_size: int = 1000, default_owner=None, report=None):
+        """
+        :param batch_size: Number of rows written per batch
+        :param default_owner: User that owns the organizations of rows without a known owner
+        :param report: Function that is called with a message for every skipped row
+        """
+        self.batch_size = batch_size
+        self.default_owner_id = default_owner.pk if default_owner else None
+        self.report = report or (lambda message: None)
+        self.categories = dict(OrganizationCategory.objects.values_list("name", "pk"))
+        self.owners = {}
+        self.columns = None
+        self.category_ids = set()
+
+    def run(self, rows) -> ImportResult:
+        results = []
+        invalid = 0
+        batch = []
+        for number, row in enumerate(rows, start=1):
+            if self.columns is None:
+                self.columns = set(row)
+            try:
+                batch.append(clean_row(row))
+            except (TypeError, ValueError) as e:
+                self.report("Row {}: {}".format(number, e))
+                invalid += 1
+                continue
+
+            if len(batch) >= self.batch_size:
+                results.append(self.import_batch(batch))
+                batch = []
+        if batch:
+            results.append(self.import_batch(batch))
+
+        if self.category_ids:
+            organizations_bulk_updated.send(sender=Organization, category_ids=self.category_ids)
+        return ImportResult(sum(result.created for result in results), sum(result.updated for result in results),
+                            sum(result.skipped for result in results) + invalid)
+
+    def get_category_id(self, name: str) -> int:
+        if name not in self.categories:
+            self.categories[name] = OrganizationCategory.objects.create(name=name).pk
+        return self.categories[name]
+
+    def load_owners(self, usernames: set):
+        missing = usernames - set(self.owners)
+        if missing:
+            self.owners.update(get_user_model().objects.filter(username__in=missing).values_list("username", "pk"))
+
+    def import_batch(self, rows: list) -> ImportResult:
+        self.load_owners({row["owner"] for row in rows if row["owner"]})
+
+        skipped = 0
+        # Dedupe on the natural key, the last row wins
+        by_key = OrderedDict()
+        for row in rows:
+            owner_id = self.owners.get(row["owner"], self.default_owner_id)
+            if owner_id is None:
+                self.report("{}: unknown owner {!r}".format(row["name"], row["owner"]))
+                skipped += 1
+                continue
+            row["owner_id"] = owner_id
+            by_key[(self.get_category_id(row["category"]), row["name"])] = row
+
+        with transaction.atomic():
+            created, updated = self.write(by_key)
+        return ImportResult(created, updated, skipped)
+
+    def write(self, by_key: OrderedDict) -> tuple:
+        days = [day for day in SCHEDULE_DAYS if day in self.columns]
+        existing = {}
+        candidates = Organization.objects.filter(category__in={key[0] for key in by_key},
+                                                 name__in={key[1] for key in by_key})
+        for pk, category_id, name, schedule, *hours_ids in candidates.values_list(
+                "pk", "category_id", "name", "schedule", *["{}_id".format(day) for day in SCHEDULE_DAYS]):
+            existing[(category_id, name)] = (pk, schedule, dict(zip(SCHEDULE_DAYS, hours_ids)))
+
+        new_organizations, changed_organizations, addresses = [], [], {}
+        new_hours, changed_hours, links, linked_days = [], [], [], set()
+        for key, row in by_key.items():
+            organization = Organization(category_id=key[0], name=key[1], owner_id=row["owner_id"],
+                                        **{field: row[field] for field in ORGANIZATION_FIELDS})
+            pk, schedule, hours_ids = existing.get(key, (None, EMPTY_SCHEDULE, {}))
+            for day in SCHEDULE_DAYS:
+                setattr(organization, "{}_id".format(day), hours_ids.get(day))
+
+            for day in days:
+                hours = row[day]
+                values = {field: getattr(hours, field) if hours else None for field in TIME_FIELDS}
+                if hours_ids.get(day) is not None:
+                    changed_hours.append(DayOpeningHours(pk=hours_ids[day], **values))
+                elif hours:
+                    opening_hours = DayOpeningHours(**values)
+                    new_hours.append(opening_hours)
+                    links.append((organization, day, opening_hours))
+                    if pk is not None:
+                        linked_days.add(day)
+
+                offset = day_offset(day)
+                schedule = schedule[:offset] + pack_day(hours) + schedule[offset + DAY_WIDTH:]
+            organization.schedule = schedule
+            organization.summaries = build_summaries(schedule)
+
+            if pk is None:
+                new_organizations.append(organization)
+            else:
+                organization.pk = pk
+                changed_organizations.append(organization)
+            addresses[key] = Address(**{field: row[field] for field in ADDRESS_FIELDS})
+            self.category_ids.add(key[0])
+
+        create_opening_hours(new_hours)
+        for organization, day, opening_hours in links:
+            setattr(organization, day, opening_hours)
+        update_in_bulk(changed_hours, TIME_FIELDS)
+
+        Organization.objects.bulk_create(new_organizations)
+        if any(organization.pk is None for organization in new_organizations):
+            # Only PostgreSQL sets the primary keys of bulk inserted rows
+            pks = {(category_id, name): pk for pk, category_id, name in Organization.objects.filter(
+                category__in={o.category_id for o in new_organizations},
+                name__in={o.name for o in new_organizations}).values_list("pk", "category_id", "name")}
+            for organization in new_organizations:
+                organization.pk = pks[(organization.category_id, organization.name)]
+
+        fields = [field for field in ["owner"] + ORGANIZATION_FIELDS if field in self.columns]
+        if days:
+            # Only the days that got new opening hours are linked to other rows
+            fields += sorted(linked_days) + ["schedule", "summaries"]
+        update_in_bulk(changed_organizations, fields)
+
+        self.write_addresses(new_organizations, changed_organizations, addresses)
+        return len(new_organizations), len(changed_organizations)
+
+    def write_addresses(self, new_organizations: list, changed_organizations: list, addresses: dict):
+        """Update the first address of existing organizations, create the others"""
+        fields = [field for field in ADDRESS_FIELDS if field in self.columns]
+        if not fields:
+            changed_organizations = []
+
+        first_addresses = {}
+        for organization_id, pk in Address.objects.filter(organization__in=changed_organizations) \
+                .order_by("organization", "-pk").values_list("organization_id", "pk"):
+            first_addresses[organization_id] = pk
+
+        new_addresses, changed_addresses = [], []
+        for organization in new_organizations + changed_organizations:
+            address = addresses[(organization.category_id, organization.name)]
+            address.organization_id = organization.pk
+            address.pk = first_addresses.get(organization.pk)
+            (new_addresses if address.pk is None else changed_addresses).append(address)
+
+        Address.objects.bulk_create(new_addresses)
+        update_in_bulk(changed_addresses, fields)
@@ -17,28 +17,38 @@ urlpatterns = [
         name='create'
     ),
     url(
-        regex=r'^(?P<pk>[1-9]+)/$',
+        regex=r'^(?P<pk>[0-9]+)/$',
         view=views.OrganizationDetailView.as_view(),
         name='detail'
     ),
     url(
-        regex=r'^delete/(?P<pk>[1-9]+)',
+        regex=r'^delete/(?P<pk>[0-9]+)',
         view=views.OrganizationDeleteView.as_view(),
         name='delete'
     ),
     url(
-        regex=r'^update/(?P<pk>[1-9]+)/$',
+        regex=r'^update/(?P<pk>[0-9]+)/$',
         view=views.OrganizationUpdateView.as_view(),
         name='update'
     ),
     url(
-        regex=r'^opening-hours/(?P<pk>[1-9]+)/$',
+        regex=r'^opening-hours/bulk/$',
+        view=views.OrganizationBulkOpeningHoursView.as_view(),
+        name='bulk-opening-hours'
+    ),
+    url(
+        regex=r'^opening-hours/(?P<pk>[0-9]+)/$',
         view=views.OrganizationOpeningHoursView.as_view(),
         name='opening-hours'
     ),
     url(
-        regex=r'^rooms-available/(?P<pk>[1-9]+)/$',
+        regex=r'^rooms-available/(?P<pk>[0-9]+)/$',
         view=views.rooms_available,
         name='rooms-available'
+    ),
+    url(
+        regex=r'^api/$',
+        view=views.OrganizationApiView.as_view(),
+        name='api'
     )
 ]
@@ -1,17 +1,31 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
 
+import hashlib
+
 from django import http
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
-from django.shortcuts import redirect
+from django.db import models, transaction
+from django.db.models import Case, Value, When
+from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy
-from django.views.generic import DetailView, ListView, TemplateView, DeleteView
-
-from .forms import (OrganizationForm, AddressForm, OpeningHoursForm, DAYS,
-                    OrganizationAdminForm)
-from .models import Organization, DayOpeningHours
-from common.memberships import is_organizations_admin
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_POST
+from django.views.generic import DetailView, ListView, TemplateView, DeleteView, View
+
+from .forms import (OrganizationForm, AddressForm, BulkOpeningHoursForm, OpeningHoursFormSet,
+                    OrganizationAdminForm, OrganizationFilterForm)
+from .models import Address, Organization
+from .schedule import SCHEDULE_DAYS, TIME_FIELDS, unpack_day
+from oz_m_de.common.clock import get_clock
+from oz_m_de.common.fragments import bump_versions_on_commit
+from oz_m_de.common.memberships import is_organizations_admin
+from oz_m_de.common.pagination import paginate
 
 
 class OrganizationCreateView(LoginRequiredMixin, TemplateView):
@@ -148,18 +162,48 @@ class OrganizationDetailView(LoginRequiredMixin, DetailView):
 
 
 class OrganizationListView(LoginRequiredMixin, ListView):
+    """The organizations of the user, or all organizations for organizations admins, in pages of paginate_by.
+    The pages are navigated with a cursor, see common.pagination, so deep pages cost the same as the first.
+    """
     model = Organization
+    paginate_by = 50
 
     def get_queryset(self):
         user = self.request.user
 
         if is_organizations_admin(user):
-            return Organization.objects.sorted_by_order()
-        return Organization.objects.sorted_by_name_for_owner(user)
+            organizations = Organization.objects.all()
+        else:
+            organizations = Organization.objects.filter(owner=user)
+        self.filter_form = OrganizationFilterForm(data=self.request.GET)
+        return self.filter_form.filter(organizations.for_management())
+
+    def get_ordering(self) -> list:
+        if is_organizations_admin(self.request.user):
+            return ["order", "name", "id"]
+        return ["name", "id"]
+
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self.request.GET.get("cursor")
+        try:
+            organizations, self.next_cursor = paginate(queryset, self.get_ordering(), cursor, page_size)
+        except ValueError:
+            raise http.Http404("Invalid cursor")
+        return None, None, organizations, bool(cursor or self.next_cursor)
 
     def get_context_data(self, **kwargs):
         context = super(OrganizationListView, self).get_context_data(**kwargs)
         context["is_organization_admin"] = is_organizations_admin(self.request.user)
+        context["filter_form"] = self.filter_form
+
+        # Keep the filters when going to other pages
+        params = self.request.GET.copy()
+        params.pop("cursor", None)
+        context["first_page_url"] = "?" + params.urlencode() if self.request.GET.get("cursor") else None
+        context["next_page_url"] = None
+        if self.next_cursor:
+            params["cursor"] = self.next_cursor
+            context["next_page_url"] = "?" + params.urlencode()
         return context
 
 
@@ -173,70 +217,132 @@ class OrganizationDeleteView(LoginRequiredMixin, DeleteView):
 class OrganizationOpeningHoursView(LoginRequiredMixin, TemplateView):
     template_name = "organizations/organization_opening_hours.html"
 
+    def get_organization(self, pk) -> Organization:
+        # The opening hours are fetched along with the organization, they are needed for the forms and
+        # to repack the schedule
+        return get_object_or_404(Organization.objects.select_related(*SCHEDULE_DAYS), pk=pk)
+
     def get(self, request, *args, **kwargs):
         organization_pk = kwargs.get("pk")
-        organization = Organization.objects.get(pk=organization_pk)
-
-        ctx = {"pk": organization_pk}
-
-        if organization.update_opening_hours_daily:
-            if organization.today:
-                instance = organization.today
-            else:
-                instance = DayOpeningHours()
-                instance.save()
-                organization.today = instance
-                organization.save()
-            ctx["today_form"] = OpeningHoursForm(day="Today", instance=instance)
-
-        else:
-            for day, name in DAYS.items():
-                if getattr(organization, day):
-                    instance = getattr(organization, day)
-                else:
-                    instance = DayOpeningHours()
-                    instance.save()
-                    setattr(organization, day, instance)
-                    organization.save()
-                ctx["{}_form".format(day)] = OpeningHoursForm(prefix=day, instance=instance, day=name)
-        return self.render_to_response(ctx)
+        formset = OpeningHoursFormSet(self.get_organization(organization_pk))
+        return self.render_to_response({"pk": organization_pk, "formset": formset})
 
     def post(self, request, *args, **kwargs):
         organization_pk = kwargs.get("pk")
-        organization = Organization.objects.get(pk=organization_pk)
+        formset = OpeningHoursFormSet(self.get_organization(organization_pk), data=request.POST)
 
-        forms = {}
+        if formset.is_valid():
+            formset.save()
+        return self.render_to_response({"pk": organization_pk, "formset": formset})
 
-        if organization.update_opening_hours_daily:
-            instance = organization.today
-            forms["today_form"] = OpeningHoursForm(day="Today", data=request.POST, instance=instance)
-        else:
-            for day, name in DAYS.items():
-                instance = getattr(organization, day)
-                forms["{}_form".format(day)] = OpeningHoursForm(day=name, data=request.POST,
-                                                                instance=instance, prefix=day)
 
-        for form in forms.values():
-            if not form.is_valid():
-                return self.is_invalid(forms, organization_pk)
-        return self.is_valid(forms, organization_pk, organization)
+class OrganizationBulkOpeningHoursView(LoginRequiredMixin, TemplateView):
+    """Replace the opening hours of many organizations at once, for organizations admins"""
+    template_name = "organizations/organization_bulk_opening_hours.html"
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated and not is_organizations_admin(request.user):
+            raise PermissionDenied()
+        return super(OrganizationBulkOpeningHoursView, self).dispatch(request, *args, **kwargs)
 
-    def is_valid(self, forms, organization_pk, organization):
-        for form in forms.values():
-            form.save()
-        forms["pk"] = organization_pk
-        return self.render_to_response(forms)
+    def get(self, request, *args, **kwargs):
+        return self.render_to_response({"form": BulkOpeningHoursForm()})
 
-    def is_invalid(self, forms, organization_pk):
-        forms["pk"] = organization_pk
-        return self.render_to_response(forms)
+    def post(self, request, *args, **kwargs):
+        form = BulkOpeningHoursForm(data=request.POST)
+        ctx = {"form": form}
+        if form.is_valid():
+            ctx["changed"] = form.save()
+        return self.render_to_response(ctx)
 
 
+@login_required
+@require_POST
 def rooms_available(request, *args, **kwargs):
+    """Toggle rooms_available with a single UPDATE, so concurrent clicks can't overwrite each other.
+    Ajax requests get the new value as JSON, others are redirected to the list of organizations.
+    """
     pk = kwargs.get("pk")
 
-    organization = Organization.objects.get(pk=pk)
-    organization.rooms_available = not organization.rooms_available
-    organization.save()
+    organizations = Organization.objects.filter(pk=pk)
+    if not is_organizations_admin(request.user):
+        organizations = organizations.filter(owner=request.user)
+
+    toggled = Case(When(rooms_available=True, then=Value(False)), default=Value(True),
+                   output_field=models.BooleanField())
+    if not organizations.update(rooms_available=toggled):
+        if Organization.objects.filter(pk=pk).exists():
+            raise PermissionDenied()
+        raise http.Http404()
+
+    value, category_id = organizations.values_list("rooms_available", "category_id").get()
+    # Only the page of the category shows whether rooms are available
+    bump_versions_on_commit(category_id)
 
+    if request.is_ajax():
+        return http.JsonResponse({"rooms_available": value})
     return redirect(reverse_lazy("organizations:list"))
+
+
+# The API is read only, so it doesn't need a transaction
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+class OrganizationApiView(View):
+    """Read-only JSON list of the active organizations, with their addresses and today's opening hours.
+
+    Query parameters:
+
+    * ``category``: only organizations of this category
+    * ``open_today``: with value 1, only organizations that are opened today
+    * ``cursor``: the ``next`` value of the previous page
+
+    The rows are serialized straight from values(), no model instances are built.
+    """
+    paginate_by = 50
+    ordering = ["-is_member", "order", "name", "id"]
+    fields = ["id", "name", "category_id", "category__name", "order", "is_member", "phone_nr", "website",
+              "description", "rooms_available", "update_opening_hours_daily", "schedule"]
+    address_fields = ["organization_id", "address", "postal_code", "city", "country"]
+
+    def get(self, request, *args, **kwargs):
+        day = get_clock().day
+
+        organizations = Organization.objects.is_active()
+        category_id = request.GET.get("category")
+        if category_id:
+            if not category_id.isdigit():
+                return http.HttpResponseBadRequest("Invalid category")
+            organizations = organizations.filter(category_id=category_id)
+        if request.GET.get("open_today") == "1":
+            organizations = organizations.with_open_today(day).filter(is_open_today=True)
+
+        try:
+            rows, next_cursor = paginate(organizations.values(*self.fields), self.ordering,
+                                         request.GET.get("cursor"), self.paginate_by)
+        except ValueError:
+            return http.HttpResponseBadRequest("Invalid cursor")
+
+        addresses = {}
+        if rows:
+            for address in Address.objects.filter(organization__in=[row["id"] for row in rows]) \
+                    .order_by("pk").values(*self.address_fields):
+                addresses.setdefault(address.pop("organization_id"), []).append(address)
+
+        response = http.JsonResponse({
+            "results": [self.serialize(row, day, addresses.get(row["id"], [])) for row in rows],
+            "next": next_cursor,
+        }, json_dumps_params={"sort_keys": True})
+        # The keys are sorted, dicts are not ordered on Python 3.5 and every worker would have its own ETag
+        etag = hashlib.md5(response.content).hexdigest()
+        response["ETag"] = quote_etag(etag)
+        patch_cache_control(response, public=True, max_age=settings.API_CACHE_MAX_AGE)
+        return get_conditional_response(request, etag=etag, response=response)
+
+    def serialize(self, row: dict, day: str, addresses: list) -> dict:
+        opening_hours = unpack_day(row.pop("schedule"), "today" if row["update_opening_hours_daily"] else day)
+        row["category"] = {"id": row.pop("category_id"), "name": row.pop("category__name")}
+        row["addresses"] = addresses
+        row["opening_hours_today"] = None
+        if opening_hours:
+            row["opening_hours_today"] = {field: value.strftime("%H:%M") if value else None
+                                          for field, value in zip(TIME_FIELDS, opening_hours)}
+        return row
@@ -19,3 +19,33 @@ Issues with the above approach:
 4. Undocumented: No mention in the documentation, or it's too hard for me to find
 */
 $('.form-group').removeClass('row');
+
+/* Toggle rooms available without reloading the list of organizations */
+$('.rooms-available-form').on('submit', function (event) {
+    var form = this;
+    var button = $(form).find('button');
+    if (!window.fetch) {
+        return;
+    }
+    event.preventDefault();
+    button.prop('disabled', true);
+    fetch(form.action, {
+        method: 'POST',
+        body: new FormData(form),
+        credentials: 'same-origin',
+        headers: {'X-Requested-With': 'XMLHttpRequest'}
+    }).then(function (response) {
+        if (!response.ok) {
+            throw new Error(response.statusText);
+        }
+        return response.json();
+    }).then(function (data) {
+        button.toggleClass('btn-success', data.rooms_available)
+            .toggleClass('btn-warning', !data.rooms_available)
+            .text(button.data(data.rooms_available ? 'available-label' : 'unavailable-label'));
+    }).catch(function () {
+        form.submit();
+    }).then(function () {
+        button.prop('disabled', false);
+    });
+});
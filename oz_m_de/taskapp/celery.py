@@ -0,0 +1,26 @@
+import os
+
+from celery import Celery
+from django.apps import apps, AppConfig
+from django.conf import settings
+
+if not settings.configured:
+    # set the default Django settings module for the 'celery' program.
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.local')  # pragma: no cover
+
+
+app = Celery('oz_m_de')
+
+
+class CeleryConfig(AppConfig):
+    name = 'oz_m_de.taskapp'
+    verbose_name = 'Celery Config'
+
+    def ready(self):
+        # Using a string here means the worker will not have to
+        # pickle the object when using Windows.
+        # - namespace='CELERY' means all celery-related configuration keys
+        #   should have a `CELERY_` prefix.
+        app.config_from_object('django.conf:settings', namespace='CELERY')
+        installed_apps = [app_config.name for app_config in apps.get_app_configs()]
+        app.autodiscover_tasks(lambda: installed_apps, force=True)
@@ -10,4 +10,4 @@ class UsersConfig(AppConfig):
             Users system checks
             Users signal registration
         """
-        pass
+        from . import signals  # noqa
@@ -0,0 +1,89 @@
+from functools import partial
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+
+def user_key(user_id) -> str:
+    return "users:user:{}".format(user_id)
+
+
+def invalidate_user(user_id):
+    """Remove a user from the cache, after the user changed"""
+    invalidate_users([user_id])
+
+
+def invalidate_users(user_ids):
+    """Remove users from the cache, after they were changed. They are removed again once the transaction is
+    committed, because a request in the meantime still reads and caches the old rows.
+    """
+    keys = [user_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(partial(cache.delete_many, keys))
+
+
+def get_cached_fields() -> list:
+    """Fields of the user that are kept in the cache, all but the password hash"""
+    return [field.attname for field in auth.get_user_model()._meta.concrete_fields if field.attname != "password"]
+
+
+def cache_user(user):
+    """Keep the fields of the user and the hash its sessions are checked against in the cache"""
+    cache.set(user_key(user.pk), {
+        "fields": {field: getattr(user, field) for field in get_cached_fields()},
+        "session_auth_hash": user.get_session_auth_hash(),
+    }, settings.AUTH_USER_CACHE_TIMEOUT)
+
+
+def load_user(cached: dict):
+    """Make a user of cached fields. The password is loaded from the database when it is used"""
+    fields = get_cached_fields()
+    return auth.get_user_model().from_db(DEFAULT_DB_ALIAS, fields, [cached["fields"][field] for field in fields])
+
+
+def get_user(request):
+    """Get the signed in user like django.contrib.auth.get_user, from the cache when possible.
+    The session is checked against the cached hash the same way, so changing the password still ends the other
+    sessions of the user.
+    """
+    try:
+        user_id = auth._get_user_session_key(request)
+        backend_path = request.session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+
+    cached = cache.get(user_key(user_id))
+    if cached is None:
+        user = auth.get_user(request)
+        if user.is_authenticated:
+            cache_user(user)
+        return user
+
+    session_hash = request.session.get(auth.HASH_SESSION_KEY)
+    if not session_hash or not constant_time_compare(session_hash, cached["session_auth_hash"]):
+        request.session.flush()
+        return AnonymousUser()
+    user = load_user(cached)
+    if not user.is_active:
+        return AnonymousUser()
+    user.backend = backend_path
+    return user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware that keeps the users in the cache, so signed in requests don't query the user.
+    The cached user is removed when it is saved or deleted, see users.signals, and when it is changed with
+    User.objects.update().
+    """
+
+    def process_request(self, request):
+        super(CachedAuthenticationMiddleware, self).process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
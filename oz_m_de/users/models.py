@@ -1,9 +1,26 @@
+from django.contrib.auth import models as auth_models
 from django.contrib.auth.models import AbstractUser
 from django.core.urlresolvers import reverse
 from django.db import models
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _
 
+from .middleware import invalidate_users
+
+
+class UserQuerySet(models.QuerySet):
+    def update(self, **kwargs) -> int:
+        """Update the users and remove them from the cache, set-based updates don't send post_save"""
+        user_ids = list(self.values_list("pk", flat=True))
+        updated = super(UserQuerySet, self).update(**kwargs)
+        invalidate_users(user_ids)
+        return updated
+
+
+class UserManager(auth_models.UserManager):
+    def get_queryset(self) -> UserQuerySet:
+        return UserQuerySet(self.model, using=self._db)
+
 
 @python_2_unicode_compatible
 class User(AbstractUser):
@@ -12,6 +29,8 @@ class User(AbstractUser):
     # around the globe.
     name = models.CharField(_('Name of User'), blank=True, max_length=255)
 
+    objects = UserManager()
+
     def __str__(self):
         return self.username
 
@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from test_plus.test import TestCase
+
+from oz_m_de.common.tests.transactions import run_commit_callbacks
+from ..middleware import cache_user, user_key
+from ..models import User
+
+UNCACHED_MIDDLEWARE = [
+    'django.contrib.auth.middleware.AuthenticationMiddleware'
+    if path == 'oz_m_de.users.middleware.CachedAuthenticationMiddleware' else path
+    for path in settings.MIDDLEWARE
+]
+
+
+class TestCachedAuthenticationMiddleware(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = self.make_user()
+
+    def get_queries(self, url_name: str = "users:list") -> list:
+        with CaptureQueriesContext(connection) as queries:
+            self.get_check_200(url_name)
+        return [query["sql"] for query in queries]
+
+    def test_user_is_cached(self):
+        with self.login(self.user):
+            self.get_check_200("users:list")
+            self.assertFalse(any('FROM "users_user" WHERE "users_user"."id"' in sql for sql in self.get_queries()))
+
+    def test_changed_user_is_not_cached(self):
+        with self.login(self.user):
+            self.get_check_200("users:list")
+            self.user.name = "Changed"
+            self.user.save()
+
+            self.get_check_200("users:list")
+            self.assertEqual(self.last_response.context["user"].name, "Changed")
+
+    def test_user_cached_before_commit_is_removed(self):
+        old_user = User.objects.get(pk=self.user.pk)
+
+        with run_commit_callbacks():
+            self.user.name = "Changed"
+            self.user.save()
+            # A concurrent request still reads the old row
+            cache_user(old_user)
+
+        self.assertIsNone(cache.get(user_key(self.user.pk)))
+
+    def test_user_bulk_updated_before_commit_is_removed(self):
+        old_user = User.objects.get(pk=self.user.pk)
+
+        with run_commit_callbacks():
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+            cache_user(old_user)
+
+        self.assertIsNone(cache.get(user_key(self.user.pk)))
+
+    def test_changing_the_password_ends_the_session(self):
+        with self.login(self.user):
+            self.get_check_200("users:list")
+            self.user.set_password("changed")
+            self.user.save()
+
+            self.get("users:list")
+            self.response_302()
+
+    def test_password_hash_is_not_cached(self):
+        with self.login(self.user):
+            self.get_check_200("users:list")
+
+        self.assertNotIn(self.user.password, repr(cache.get(user_key(self.user.pk))))
+
+    def test_bulk_deactivated_user_is_signed_out(self):
+        with self.login(self.user):
+            self.get_check_200("users:list")
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+            self.get("users:list")
+            self.response_302()
+
+    def test_cached_sessions_and_users_save_queries(self):
+        """Compare a signed in page view with the database sessions and the uncached user to the cached ones"""
+        # The middleware is loaded by the first request of a client
+        with override_settings(SESSION_ENGINE="django.contrib.sessions.backends.db", MIDDLEWARE=UNCACHED_MIDDLEWARE):
+            self.client = self.client_class()
+            with self.login(self.user):
+                self.get_check_200("organizations:list")
+                before = self.get_queries("organizations:list")
+
+        cache.clear()
+        with override_settings(SESSION_ENGINE="django.contrib.sessions.backends.cache"):
+            self.client = self.client_class()
+            with self.login(self.user):
+                self.get_check_200("organizations:list")
+                after = self.get_queries("organizations:list")
+
+        self.assertLessEqual(len(after), len(before) - 2)
+        self.assertFalse(any("django_session" in sql for sql in after))